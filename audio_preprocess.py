@@ -0,0 +1,161 @@
+"""음성 인식 전 오디오 전처리 (업로드 크기 줄이기)
+
+마이크가 주는 오디오는 장치 기본 샘플레이트(보통 44.1/48kHz)에 앞뒤 무음(녹음 시작 전 pre-roll, 종료 판단용
+멈춤 1.5초 등)까지 들어 있어, 그대로 인식 엔진에 넘기면 필요 없는 바이트를 매번 업로드한다.
+인식 전에 다음을 거친다.
+
+1. 모노로 합치기 (sr.Microphone/sr.AudioFile이 만든 AudioData는 이미 모노이고, 다채널 원시 PCM만 해당)
+2. 16bit로 맞추고 16kHz로 낮추기 (음성 인식에는 16kHz면 충분하고, 원래 더 낮으면 그대로 둠)
+3. 앞뒤 무음 자르기 (말소리 앞뒤로 pad_seconds만큼은 남김)
+4. FLAC 인코딩 (한 번 만든 결과를 PreprocessedAudio에 두어 인식 엔진이 다시 인코딩하지 않음)
+
+보고(dict)에는 원본·결과 바이트 수, 자른 길이, 전처리 시간을 남긴다.
+"""
+import audioop
+import time
+
+import speech_recognition as sr
+
+TARGET_SAMPLE_RATE = 16000
+TARGET_SAMPLE_WIDTH = 2
+
+
+class PreprocessedAudio(sr.AudioData):
+    """FLAC 인코딩 결과를 변환 설정별로 한 번만 만들어 재사용하는 AudioData"""
+
+    def __init__(self, frame_data, sample_rate, sample_width):
+        super().__init__(frame_data, sample_rate, sample_width)
+        self._flac_data = {}
+
+    def get_flac_data(self, convert_rate=None, convert_width=None):
+        # 지금 형식과 같은 변환 요청은 변환 없음과 같은 키로 봄 (recognize_google은 convert_width=2로 부름)
+        key = (None if convert_rate in (None, self.sample_rate) else convert_rate,
+               None if convert_width in (None, self.sample_width) else convert_width)
+        if key not in self._flac_data:
+            self._flac_data[key] = super().get_flac_data(convert_rate, convert_width)
+        return self._flac_data[key]
+
+
+def to_mono(frame_data, sample_width, channels):
+    """인터리브된 다채널 PCM을 채널 평균 모노로"""
+    if channels == 1:
+        return frame_data
+    if channels == 2:
+        return audioop.tomono(frame_data, sample_width, 0.5, 0.5)
+    frame_size = sample_width * channels
+    usable = len(frame_data) - len(frame_data) % frame_size
+    mono = None
+    for channel in range(channels):
+        # 채널 하나씩 뽑아 1/channels 비율로 더함
+        samples = b"".join(frame_data[i:i + sample_width] for i in range(channel * sample_width, usable, frame_size))
+        scaled = audioop.mul(samples, sample_width, 1.0 / channels)
+        mono = scaled if mono is None else audioop.add(mono, scaled, sample_width)
+    return mono or b""
+
+
+def speech_bounds(frame_data, sample_rate, sample_width, energy_threshold=None, frame_seconds=0.02,
+                  pad_seconds=0.15, relative_threshold=0.1, min_threshold=100):
+    """말소리가 있는 구간의 (시작, 끝) 바이트 위치 (말소리가 없으면 None)
+
+    frame_seconds 단위 RMS가 임계값을 넘는 첫·마지막 프레임을 찾고 앞뒤로 pad_seconds를 붙인다.
+    energy_threshold(녹음할 때 보정한 값)가 없으면 가장 큰 프레임 RMS의 relative_threshold배를 쓴다.
+    """
+    frame_bytes = max(1, int(sample_rate * frame_seconds)) * sample_width
+    levels = [audioop.rms(frame_data[start:start + frame_bytes], sample_width)
+              for start in range(0, len(frame_data) - sample_width + 1, frame_bytes)]
+    if not levels:
+        return None
+    if energy_threshold is None:
+        energy_threshold = max(min_threshold, max(levels) * relative_threshold)
+    loud = [index for index, level in enumerate(levels) if level > energy_threshold]
+    if not loud:
+        return None
+    pad_frames = int(round(pad_seconds / frame_seconds))
+    start = max(0, loud[0] - pad_frames) * frame_bytes
+    end = min(len(frame_data), (loud[-1] + 1 + pad_frames) * frame_bytes)
+    return start, end
+
+
+def preprocess_audio(audio_data, energy_threshold=None, channels=1, sample_rate=TARGET_SAMPLE_RATE,
+                     pad_seconds=0.15, encode=True, measure_baseline=False):
+    """(PreprocessedAudio, 보고) 반환
+
+    energy_threshold는 원본 샘플 폭 기준 RMS 임계값이다 (녹음 때 쓴 말소리 판단 값을 그대로 넘기면 됨).
+    encode=True면 FLAC까지 만들어 업로드 바이트 수를 보고한다.
+    measure_baseline=True면 전처리 없이 인식 엔진이 올렸을 FLAC도 만들어 비교한다 (벤치마크용, 인코딩 한 번 추가).
+    """
+    started = time.perf_counter()
+    data = to_mono(audio_data.frame_data, audio_data.sample_width, channels)
+    width = audio_data.sample_width
+    rate = audio_data.sample_rate
+    input_seconds = len(data) / (rate * width) if data else 0.0
+    report = {"input_bytes": len(audio_data.frame_data), "input_rate": rate, "input_seconds": input_seconds}
+
+    if width != TARGET_SAMPLE_WIDTH:
+        if energy_threshold is not None:
+            energy_threshold *= 2 ** (8 * (TARGET_SAMPLE_WIDTH - width))
+        data = audioop.lin2lin(data, width, TARGET_SAMPLE_WIDTH)
+        width = TARGET_SAMPLE_WIDTH
+    if rate > sample_rate:
+        data, _ = audioop.ratecv(data, width, 1, rate, sample_rate, None)
+        rate = sample_rate
+
+    bounds = speech_bounds(data, rate, width, energy_threshold, pad_seconds=pad_seconds)
+    if bounds is not None:
+        data = data[bounds[0]:bounds[1]]
+    processed = PreprocessedAudio(data, rate, width)
+    output_seconds = len(data) / (rate * width) if data else 0.0
+    report.update({
+        "output_bytes": len(data),
+        "output_rate": rate,
+        "output_seconds": output_seconds,
+        "trimmed_seconds": max(0.0, input_seconds - output_seconds),
+        "speech_found": bounds is not None,
+    })
+    if encode and data:
+        report["upload_bytes"] = len(processed.get_flac_data())
+    report["seconds"] = time.perf_counter() - started
+    if measure_baseline and audio_data.frame_data:
+        encode_started = time.perf_counter()
+        report["baseline_upload_bytes"] = len(audio_data.get_flac_data(convert_width=TARGET_SAMPLE_WIDTH))
+        report["baseline_encode_seconds"] = time.perf_counter() - encode_started
+    return processed, report
+
+
+class AudioPreprocessor:
+    """preprocess_audio 설정 묶음 (RecordingController에 넘겨 인식 직전에 적용)
+
+    오디오를 올리지 않는 로컬 인식 엔진에는 encode=False로 FLAC 인코딩을 건너뛴다.
+    """
+
+    def __init__(self, sample_rate=TARGET_SAMPLE_RATE, pad_seconds=0.15, encode=True, measure_baseline=False):
+        self.sample_rate = sample_rate
+        self.pad_seconds = pad_seconds
+        self.encode = encode
+        self.measure_baseline = measure_baseline
+
+    def process(self, audio_data, energy_threshold=None):
+        return preprocess_audio(audio_data, energy_threshold, sample_rate=self.sample_rate,
+                                pad_seconds=self.pad_seconds, encode=self.encode,
+                                measure_baseline=self.measure_baseline)
+
+
+def format_preprocess_report(reports):
+    """발화별 전처리 보고를 디버깅 표시용 한 줄로 (여러 구간이면 합계)"""
+    if not reports:
+        return None
+    input_bytes = sum(report["input_bytes"] for report in reports)
+    upload_bytes = sum(report.get("upload_bytes", report["output_bytes"]) for report in reports)
+    trimmed = sum(report["trimmed_seconds"] for report in reports)
+    seconds = sum(report["seconds"] for report in reports)
+    first = reports[0]
+    saved = (1 - upload_bytes / input_bytes) * 100 if input_bytes else 0.0
+    encoding = " FLAC" if "upload_bytes" in first else ""
+    target = "업로드" if encoding else "인식 입력"
+    line = (f"원본 {input_bytes / 1024:.1f}KB ({first['input_rate'] / 1000:g}kHz) → {target} {upload_bytes / 1024:.1f}KB "
+            f"({first['output_rate'] / 1000:g}kHz{encoding}) · {saved:.0f}% 절감 · 앞뒤 무음 {trimmed:.1f}초 제거 · "
+            f"전처리 {seconds * 1000:.0f}ms")
+    baseline = [report["baseline_upload_bytes"] for report in reports if "baseline_upload_bytes" in report]
+    if len(baseline) == len(reports):
+        line += f" (전처리 없는 FLAC {sum(baseline) / 1024:.1f}KB 대비 {(1 - upload_bytes / sum(baseline)) * 100:.0f}% 절감)"
+    return line
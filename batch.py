@@ -0,0 +1,345 @@
+"""보관된 전사 텍스트 일괄 처리 (Streamlit 없이 실행)
+
+UI와 같은 검수 → TM → 번역 흐름을 CSV/JSONL 입력 전체에 적용한다.
+동시 요청 수와 초당 요청 수를 제한하고, 재시도 가능한 오류는 지수 백오프로 다시 시도한다.
+결과는 끝나는 대로 JSONL에 한 줄씩 기록하며, 같은 출력 파일로 다시 실행하면 이미 끝난 항목은 건너뛴다.
+
+    python batch.py transcripts.csv -o results.jsonl --tm tm.xlsx --concurrency 8 --rps 5
+    python batch.py transcripts.jsonl -o results.jsonl --base-url http://127.0.0.1:8000/v1  # 목 서버
+    python batch.py transcripts.csv -o fused.jsonl --tm tm.xlsx --fused  # 통합 모드 결과와 비교
+    python batch.py transcripts.csv -o results.jsonl --languages ja zh-Hans es  # 영어 외 언어도 동시에 번역
+    python batch.py transcripts.csv -o results.jsonl --tm tm.xlsx --routing  # 짧은 입력은 빠른 모델, TM으로 끝나면 생략
+    python batch.py transcripts.csv -o results.jsonl --tm tm.xlsx --fuzzy-distance 1  # UI처럼 TM 근사 일치도 적용
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+from fuzzy_matcher import FuzzyTMMatcher
+from glossary import GlossaryIndex, fill_glossary
+from llm import (DEFAULT_MODEL, FUSED_TOKEN_RATIO, JSON_RESPONSE_FORMAT, TRANSLATION_TOKEN_RATIO, adaptive_max_tokens,
+                 chat_completion_async)
+from llm_cache import LLMCache
+from llm_client import PoolConfig, SharedOpenAIClients
+from prompts import (DEFAULT_SYSTEM_PROMPT, DEFAULT_TRANSLATION_LANGUAGE, DEFAULT_USER_PROMPT_TEMPLATE,
+                     TRANSLATION_LANGUAGES, build_correction_messages, build_fused_messages, build_translation_messages,
+                     build_user_prompt, parse_fused_reply)
+from rate_limit import TokenBucket
+from request_policy import RETRYABLE_ERRORS, backoff_delay
+from routing import FAST_MODEL, RoutingPolicy, route_correction_async, tm_resolves
+from tm_matcher import TMMatcher, correct_with_tm, term_constraints
+
+
+def read_transcripts(path, text_column="text", id_column="id"):
+    """CSV/JSONL에서 (id, 텍스트) 순회. id 컬럼이 없으면 행 번호를 id로 사용"""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                yield str(record.get(id_column, line_number)), record.get(text_column) or ""
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for row_number, row in enumerate(csv.DictReader(f), start=1):
+                yield str(row.get(id_column) or row_number), row.get(text_column) or ""
+
+
+def load_completed_ids(output_path):
+    """이전 실행에서 이미 기록된 id 집합 (체크포인트)"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                completed.add(str(json.loads(line)["id"]))
+            except (ValueError, KeyError):
+                # 중단 시점에 덜 써진 마지막 줄은 무시하고 다시 처리
+                continue
+    return completed
+
+
+def load_tm(path, collection=None):
+    """TM 파일(xlsx/csv) 또는 TM 저장소(.sqlite3)의 모음 하나로 (치환 매처, 고유명사 검색 색인, 근사 일치 매처) 생성"""
+    from tm_store import TMLibrary, parse_tm_file
+
+    if path.endswith(".sqlite3"):
+        library = TMLibrary(path)
+        store = library.get(collection) if collection else None
+        if store is None:
+            names = ", ".join(library.names()) or "없음"
+            if not collection:
+                raise ValueError(f"TM 저장소에서 쓸 모음을 --tm-collection으로 지정하세요 (있는 모음: {names})")
+            raise ValueError(f"TM 모음을 찾을 수 없습니다: {collection} (있는 모음: {names})")
+        return store.tm_matcher, store.glossary, store.fuzzy_matcher
+    with open(path, "rb") as f:
+        tm_df = parse_tm_file(f.read(), path)
+    return TMMatcher.from_dataframe(tm_df), GlossaryIndex.from_dataframe(tm_df), FuzzyTMMatcher.from_dataframe(tm_df)
+
+
+class BatchProcessor:
+    """전사 텍스트 여러 건을 제한된 동시성으로 처리"""
+
+    def __init__(self, client, system_prompt=DEFAULT_SYSTEM_PROMPT, user_prompt_template=DEFAULT_USER_PROMPT_TEMPLATE,
+                 tm_matcher=None, model=DEFAULT_MODEL, concurrency=8, rate_limiter=None, max_retries=5,
+                 backoff_base=0.5, backoff_max=30.0, cache=None, glossary=None, fuzzy_matcher=None, fuzzy_distance=None,
+                 fused=False, extra_languages=(), routing=None):
+        self.client = client
+        self.system_prompt = system_prompt
+        self.user_prompt_template = user_prompt_template
+        self.tm_matcher = tm_matcher
+        self.glossary = glossary
+        self.fuzzy_matcher = fuzzy_matcher
+        self.fuzzy_distance = fuzzy_distance
+        # 검수와 번역을 한 번의 요청으로 받을지 (TM 용어는 요청에 제약으로 넣고, TM 치환은 그대로 적용)
+        self.fused = fused
+        # 영어 외에 함께 번역할 언어 코드 (언어별 요청을 동시에 보냄)
+        self.extra_languages = [language for language in extra_languages if language != DEFAULT_TRANSLATION_LANGUAGE]
+        # 모델 라우팅 규칙 (None이면 모든 요청을 model로)
+        self.routing = routing
+        self.model = model
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = cache
+        # 입력 행 수 = done + failed + skipped(이전 실행에서 완료) + empty(텍스트 없음)
+        self.stats = {"done": 0, "failed": 0, "skipped": 0, "empty": 0, "retries": 0}
+        if routing is not None:
+            # 검수 경로별 건수: TM으로 해결 / 캐시 / 빠른 모델 / 큰 모델, 빠른 모델 결과가 검사에 실패한 건수
+            self.stats["routes"] = {"tm": 0, "cache": 0, routing.fast_model: 0, routing.strong_model: 0}
+            self.stats["route_fallbacks"] = 0
+            # 빠른 모델 번역이 검사에 실패해 큰 모델로 다시 요청한 건수 (언어별 요청 단위)
+            self.stats["translation_fallbacks"] = 0
+        if glossary is not None:
+            # System Prompt 토큰 합계: TM 전체를 넣었을 때 / 관련 용어만 넣었을 때 (추정)
+            self.stats.update({"system_prompt_tokens_full_glossary": 0, "system_prompt_tokens": 0})
+
+    async def _call(self, messages, max_tokens, response_format=None, model=None):
+        """속도 제한 + 재시도를 거친 LLM 호출"""
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            try:
+                result = await chat_completion_async(self.client, messages, model=model or self.model, max_tokens=max_tokens,
+                                                     cache=self.cache, response_format=response_format)
+                return result.text
+            except RETRYABLE_ERRORS:
+                if attempt >= self.max_retries:
+                    raise
+                # 지수 백오프 + 전체 지터
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                attempt += 1
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+
+    async def process_one(self, record_id, text):
+        """한 건 처리: 검수 → TM → 번역"""
+        start = time.perf_counter()
+        user_prompt = build_user_prompt(self.user_prompt_template, text)
+        system_prompt, glossary_report = fill_glossary(self.system_prompt, self.glossary, text)
+        if glossary_report is not None:
+            self.stats["system_prompt_tokens_full_glossary"] += glossary_report["full_tokens"]
+            self.stats["system_prompt_tokens"] += glossary_report["tokens"]
+        translated_text = None
+        if self.fused:
+            term_pairs = term_constraints(text, self.tm_matcher, self.fuzzy_matcher, self.fuzzy_distance)
+            reply = await self._call(build_fused_messages(system_prompt, user_prompt, term_pairs),
+                                     adaptive_max_tokens(text, FUSED_TOKEN_RATIO), JSON_RESPONSE_FORMAT)
+            corrected_text, translated_text = parse_fused_reply(reply)
+        elif self.routing is not None:
+            corrected_text = await self._routed_correction(text, build_correction_messages(system_prompt, user_prompt))
+        else:
+            corrected_text = await self._call(build_correction_messages(system_prompt, user_prompt),
+                                              adaptive_max_tokens(text))
+        tm_corrected_text = self._apply_tm(corrected_text)
+        translations = {}
+        if tm_corrected_text:
+            languages = list(self.extra_languages)
+            if not self.fused:
+                languages.insert(0, DEFAULT_TRANSLATION_LANGUAGE)
+            max_tokens = adaptive_max_tokens(tm_corrected_text, TRANSLATION_TOKEN_RATIO)
+            model = self.routing.choose_model(tm_corrected_text)[0] if self.routing is not None else None
+            replies = await asyncio.gather(*(
+                self._translate(tm_corrected_text, language, max_tokens, model) for language in languages
+            ))
+            translations = dict(zip(languages, replies))
+            translated_text = translations.pop(DEFAULT_TRANSLATION_LANGUAGE, translated_text)
+        result = {
+            "id": record_id,
+            "text": text,
+            "corrected": corrected_text,
+            "tm_corrected": tm_corrected_text,
+            "translated": translated_text,
+            "elapsed": round(time.perf_counter() - start, 4),
+        }
+        if self.extra_languages:
+            result["translations"] = translations
+        return result
+
+    async def _translate(self, text, language, max_tokens, model=None):
+        """번역 하나 (라우팅 중 빠른 모델 결과가 검사에 실패하면 큰 모델로 다시 요청)"""
+        messages = build_translation_messages(text, language)
+        translated = await self._call(messages, max_tokens, model=model)
+        if self.routing is not None and model != self.routing.strong_model and \
+                self.routing.check_translation(text, translated):
+            self.stats["translation_fallbacks"] += 1
+            translated = await self._call(messages, max_tokens, model=self.routing.strong_model)
+        return translated
+
+    def _apply_tm(self, text):
+        return correct_with_tm(text, self.tm_matcher, self.fuzzy_matcher, self.fuzzy_distance)[0]
+
+    async def _routed_correction(self, text, messages):
+        """라우팅을 거친 검수 (TM이 입력 전체를 덮으면 LLM 생략, TM 교정은 process_one에서 한 번만)"""
+        resolved_text = text if tm_resolves(text, self.tm_matcher, self.fuzzy_matcher, self.fuzzy_distance) else None
+        max_tokens = adaptive_max_tokens(text)
+        corrected_text, decision = await route_correction_async(
+            self.client, messages, text, self.routing, resolved_text, max_tokens=max_tokens, cache=self.cache,
+            call=lambda messages, model: self._call(messages, max_tokens, model=model))
+        self.stats["routes"][decision.path if decision.path != "llm" else decision.model] += 1
+        if decision.fallback_reason:
+            self.stats["route_fallbacks"] += 1
+        return corrected_text
+
+    async def run(self, records, output_path, errors_path=None, progress_every=100):
+        """records((id, 텍스트) 순회)를 처리해 output_path에 이어 쓰기"""
+        completed = load_completed_ids(output_path)
+        errors_path = errors_path or output_path + ".errors.jsonl"
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        write_lock = asyncio.Lock()
+        start = time.perf_counter()
+
+        with open(output_path, "a", encoding="utf-8") as output, open(errors_path, "a", encoding="utf-8") as errors:
+
+            async def write(target, record):
+                async with write_lock:
+                    target.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    target.flush()
+
+            async def worker():
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        queue.task_done()
+                        return
+                    record_id, text = item
+                    try:
+                        await write(output, await self.process_one(record_id, text))
+                        self.stats["done"] += 1
+                    except Exception as e:
+                        await write(errors, {"id": record_id, "text": text, "error": f"{type(e).__name__}: {e}"})
+                        self.stats["failed"] += 1
+                    finally:
+                        queue.task_done()
+                    processed = self.stats["done"] + self.stats["failed"]
+                    if progress_every and processed % progress_every == 0:
+                        elapsed = time.perf_counter() - start
+                        print(f"진행: 완료 {self.stats['done']} / 실패 {self.stats['failed']} / "
+                              f"건너뜀 {self.stats['skipped']} ({processed / elapsed:.1f}건/초)", file=sys.stderr)
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            for record_id, text in records:
+                if record_id in completed:
+                    self.stats["skipped"] += 1
+                    continue
+                if not text.strip():
+                    self.stats["empty"] += 1
+                    continue
+                await queue.put((record_id, text.strip()))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+        self.stats["elapsed"] = round(time.perf_counter() - start, 3)
+        return self.stats
+
+
+def read_text_file(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="전사 텍스트 일괄 검수/번역")
+    parser.add_argument("input", help="입력 파일 (.csv 또는 .jsonl)")
+    parser.add_argument("-o", "--output", required=True, help="결과 JSONL (이미 있으면 이어서 처리)")
+    parser.add_argument("--errors", help="실패 항목 JSONL (기본: <output>.errors.jsonl)")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--id-column", default="id")
+    parser.add_argument("--tm", help="TM 파일 (.xlsx 또는 .csv) 또는 TM 저장소 (.sqlite3)")
+    parser.add_argument("--tm-collection", help="--tm이 TM 저장소일 때 쓸 모음 이름")
+    parser.add_argument("--system-prompt-file", help="System Prompt 파일 (기본: 예시 프롬프트)")
+    parser.add_argument("--user-prompt-file", help="User Prompt Template 파일 (기본: 예시 프롬프트)")
+    parser.add_argument("--fuzzy-distance", type=int, metavar="N",
+                        help="TM 근사 일치를 켜고 허용할 자모 편집 거리 (0: 발음이 같은 표기만, UI 기본값은 1, 기본: 끄기)")
+    parser.add_argument("--fused", action="store_true", help="검수와 번역을 한 번의 요청으로 (통합 모드)")
+    parser.add_argument("--languages", nargs="+", default=[], metavar="CODE",
+                        choices=[code for code in TRANSLATION_LANGUAGES if code != DEFAULT_TRANSLATION_LANGUAGE],
+                        help="영어 외에 함께 번역할 언어 코드 (예: ja zh-Hans es)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--routing", action="store_true",
+                        help="짧은 입력은 빠른 모델로 검수하고 검사에 실패하면 --model로 다시 요청 (TM으로 끝나면 생략)")
+    parser.add_argument("--fast-model", default=FAST_MODEL, help="--routing에서 짧은 입력에 쓸 모델")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시 처리 건수")
+    parser.add_argument("--rps", type=float, default=5.0, help="초당 최대 API 요청 수")
+    parser.add_argument("--burst", type=float, default=None, help="순간 허용 요청 수 (기본: rps)")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="요청당 타임아웃(초)")
+    parser.add_argument("--base-url", default=None, help="OpenAI 호환 서버 주소 (예: 목 서버)")
+    parser.add_argument("--cache", default=None, help="LLM 응답 캐시 SQLite 경로")
+    args = parser.parse_args(argv)
+    if args.fuzzy_distance is not None and args.fuzzy_distance < 0:
+        parser.error("--fuzzy-distance는 0 이상이어야 합니다")
+
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        if not args.base_url:
+            parser.error("OPENAI_API_KEY 환경 변수가 필요합니다")
+        api_key = "mock"
+
+    # 동시 처리 건수만큼 연결을 유지하고, 재시도는 BatchProcessor가 직접 관리
+    pool_config = PoolConfig(
+        max_connections=args.concurrency,
+        max_keepalive_connections=args.concurrency,
+        read_timeout=args.timeout,
+        max_retries=0
+    )
+    clients = SharedOpenAIClients(api_key, base_url=args.base_url, config=pool_config)
+    try:
+        tm_matcher, glossary, fuzzy_matcher = load_tm(args.tm, args.tm_collection) if args.tm else (None, None, None)
+    except ValueError as e:
+        parser.error(str(e))
+    processor = BatchProcessor(
+        clients.async_,
+        system_prompt=read_text_file(args.system_prompt_file) if args.system_prompt_file else DEFAULT_SYSTEM_PROMPT,
+        user_prompt_template=read_text_file(args.user_prompt_file) if args.user_prompt_file else DEFAULT_USER_PROMPT_TEMPLATE,
+        tm_matcher=tm_matcher,
+        glossary=glossary,
+        fuzzy_matcher=fuzzy_matcher,
+        fuzzy_distance=args.fuzzy_distance,
+        fused=args.fused,
+        extra_languages=args.languages,
+        routing=RoutingPolicy(fast_model=args.fast_model, strong_model=args.model) if args.routing else None,
+        model=args.model,
+        concurrency=args.concurrency,
+        rate_limiter=TokenBucket(args.rps, args.burst),
+        max_retries=args.max_retries,
+        cache=LLMCache(args.cache) if args.cache else None,
+    )
+    records = read_transcripts(args.input, args.text_column, args.id_column)
+    stats = asyncio.run(processor.run(records, args.output, args.errors))
+    stats["connections"] = clients.stats.snapshot()
+    print(json.dumps(stats, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""벤치마크 공용 도구: 지연시간 요약과 JSON 결과 기록
+
+결과 파일은 버전 간 비교가 쉽도록 실행 환경(커밋, 파이썬 버전)과 설정값을 함께 기록한다.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from metrics import percentile
+
+
+def summarize(samples):
+    """초 단위 측정값 목록 -> ms 단위 요약 (평균, p50/p95/p99, 최소/최대)"""
+    values = sorted(samples)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 4),
+        "p50_ms": round(percentile(values, 0.5) * 1000, 4),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 4),
+        "min_ms": round(values[0] * 1000, 4),
+        "max_ms": round(values[-1] * 1000, 4),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def write_results(path, benchmark, params, results):
+    """{"benchmark", "environment", "params", "results"} 형태의 JSON 기록 (path가 "-"면 표준 출력)"""
+    document = {
+        "benchmark": benchmark,
+        "environment": environment(),
+        "params": params,
+        "results": results,
+    }
+    text = json.dumps(document, ensure_ascii=False, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return document
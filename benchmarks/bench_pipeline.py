@@ -0,0 +1,155 @@
+"""전체 처리 흐름(process_text_input) 벤치마크
+
+로컬 목 서버(지연시간·흔들림 설정 가능)를 OpenAI API 대신 띄우고, Streamlit AppTest로 prompt.py를
+헤드리스로 실행해 "처리하기" 버튼을 누른 것과 같은 흐름(검수 → TM → 번역)을 반복한다.
+요청마다 앱이 남긴 단계별 Trace(METRICS_JSONL_PATH)를 모아 단계별 분위수로 요약한다.
+
+    python benchmarks/bench_pipeline.py --latency 0.4 --jitter 0.15 --repeat 20
+    python benchmarks/bench_pipeline.py --modes 순차 파이프라인 --no-streaming --json pipeline.json
+    python benchmarks/bench_pipeline.py --modes 순차 통합 --json fused-ab.json  # 두 번 호출 vs 한 번 호출
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench_common import ROOT_DIR, summarize, write_results
+from mock_openai_server import MockSettings, start_server
+
+SAMPLE_TEXTS = [
+    "안녕하세요 오늘 회의는 삼십 분 정도 진행하겠습니다.",
+    "지난주에 말씀드린 일정은 다음 달로 미뤄졌습니다. 자세한 내용은 메일로 공유드리겠습니다.",
+    "새 버전은 로그인 속도가 빨라졌고 오류가 줄었습니다. 배포는 금요일 오후에 합니다. 질문 있으시면 말씀해 주세요.",
+]
+
+
+def make_inputs(repeat, use_cache):
+    """반복 횟수만큼의 입력 (캐시를 재지 않을 때는 매번 다른 문장이 되도록 번호를 붙임)"""
+    inputs = []
+    for i in range(repeat):
+        text = SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]
+        inputs.append(text if use_cache else f"{text} ({i + 1}번째)")
+    return inputs
+
+
+def read_traces(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def stage_summaries(traces):
+    """Trace 목록 -> 단계별 (요청당 합계 기준) 요약"""
+    per_stage = collections.defaultdict(list)
+    for trace in traces:
+        totals = collections.Counter()
+        for span in trace["spans"]:
+            if span.get("duration_ms") is not None:
+                totals[span["stage"]] += span["duration_ms"] / 1000
+        for stage, seconds in totals.items():
+            per_stage[stage].append(seconds)
+    return {stage: summarize(samples) for stage, samples in per_stage.items()}
+
+
+def run_mode(base_url, work_dir, execution_mode, streaming, inputs, timeout):
+    """한 실행 모드로 입력들을 처리하고 (요청별 소요 시간, Trace 목록) 반환"""
+    from streamlit.testing.v1 import AppTest
+
+    traces_path = os.path.join(work_dir, f"traces-{execution_mode}-{int(streaming)}.jsonl")
+    os.environ.update({
+        "OPENAI_BASE_URL": base_url,
+        "METRICS_JSONL_PATH": traces_path,
+        "LLM_CACHE_PATH": os.path.join(work_dir, "llm_cache.sqlite3"),
+        "STT_BACKEND": "stub",
+    })
+
+    app = AppTest.from_file(os.path.join(ROOT_DIR, "prompt.py"), default_timeout=timeout)
+    app.secrets["OPENAI_API_KEY"] = "mock"
+    app.run()
+    app.toggle(key="streaming_enabled").set_value(streaming)
+    app.radio(key="execution_mode").set_value(execution_mode)
+    app.run()
+
+    durations = []
+    for text in inputs:
+        app.text_area(key="text_input").input(text)
+        app.button(key="text_input_button").click()
+        start = time.perf_counter()
+        app.run()
+        # 처리는 작업 스레드에서 진행되므로 끝날 때까지 기다렸다가 결과 영역을 다시 그림
+        if not app.session_state["processing_job"].wait(timeout):
+            raise RuntimeError("처리가 제한 시간 안에 끝나지 않았습니다")
+        app.run()
+        durations.append(time.perf_counter() - start)
+        if app.exception:
+            raise RuntimeError(f"앱 실행 오류: {app.exception[0].value}")
+        if not app.session_state["translated_text"]:
+            raise RuntimeError("번역 결과가 없습니다")
+    return durations, read_traces(traces_path)
+
+
+def run(modes, streaming_options, repeat=10, latency=0.3, jitter=0.1, first_token_latency=None, seed=0,
+        use_cache=False, timeout=120.0):
+    """실행 모드 × 스트리밍 여부별 측정 결과 목록"""
+    settings = MockSettings(latency, jitter, first_token_latency=first_token_latency, seed=seed)
+    server, base_url = start_server(settings=settings)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for execution_mode in modes:
+                for streaming in streaming_options:
+                    durations, traces = run_mode(base_url, work_dir, execution_mode, streaming,
+                                                 make_inputs(repeat, use_cache), timeout)
+                    results.append({
+                        "execution_mode": execution_mode,
+                        "streaming": streaming,
+                        # 스크립트 재실행(화면 갱신)까지 포함한 버튼 클릭 ~ 결과 표시
+                        "end_to_end": summarize(durations),
+                        "trace": summarize([trace["duration_ms"] / 1000 for trace in traces]),
+                        "stages": stage_summaries(traces),
+                    })
+    finally:
+        server.shutdown()
+        server.server_close()
+    results.append({"mock_requests": settings.request_count})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="목 서버 기반 전체 처리 흐름 벤치마크")
+    parser.add_argument("--modes", nargs="+", default=["순차", "파이프라인", "병렬", "통합"],
+                        help="실행 모드 (순차/파이프라인/병렬/통합)")
+    parser.add_argument("--no-streaming", action="store_true", help="일괄 응답만 측정")
+    parser.add_argument("--repeat", type=int, default=10, help="모드별 요청 수")
+    parser.add_argument("--latency", type=float, default=0.3, help="목 서버 평균 응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="목 서버 지연 흔들림 폭(초, ±)")
+    parser.add_argument("--first-token-latency", type=float, default=None, help="스트리밍 첫 토큰 지연(초)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="같은 입력을 반복해 LLM 캐시 적중을 포함")
+    parser.add_argument("--timeout", type=float, default=120.0, help="요청 하나의 최대 실행 시간(초)")
+    parser.add_argument("--json", help="결과 JSON 경로 (\"-\"면 표준 출력)")
+    args = parser.parse_args()
+
+    streaming_options = [False] if args.no_streaming else [False, True]
+    results = run(args.modes, streaming_options, args.repeat, args.latency, args.jitter,
+                  args.first_token_latency, args.seed, args.cache, args.timeout)
+
+    out = sys.stderr if args.json == "-" else sys.stdout
+    print(f"{'모드':>8} {'스트리밍':>6} {'전체 p50(ms)':>12} {'전체 p95(ms)':>12}  단계별 p50(ms)", file=out)
+    for result in results:
+        if "execution_mode" not in result:
+            continue
+        stages = " ".join(f"{stage}={summary['p50_ms']:.0f}" for stage, summary in result["stages"].items())
+        print(f"{result['execution_mode']:>8} {str(result['streaming']):>6} {result['end_to_end']['p50_ms']:12.1f} "
+              f"{result['end_to_end']['p95_ms']:12.1f}  {stages}", file=out)
+
+    if args.json:
+        write_results(args.json, "pipeline", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
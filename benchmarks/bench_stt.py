@@ -0,0 +1,267 @@
+"""음성 인식 경로 벤치마크 (마이크 대신 WAV 파일)
+
+RecordingController에 sr.Microphone 대신 sr.AudioFile을 끼워 일괄/스트리밍 인식을 같은 녹음으로 비교한다.
+--recognizer에 엔진을 여러 개 주면(예: google whisper) 같은 WAV를 엔진마다 돌려 지연시간과 정확도를 비교한다.
+WAV 옆에 같은 이름의 .txt(정답 전사)가 있으면 글자 오류율(CER, 공백·문장 부호 제외)을 함께 기록한다.
+--realtime이면 파일을 실제 재생 속도로 읽어 마이크 녹음처럼 흘려보내므로,
+녹음이 끝난 뒤 최종 결과까지 걸린 시간(tail)을 두 방식 사이에서 비교할 수 있다.
+
+WAV를 주지 않으면 말소리 대신 톤 구간과 묵음을 섞은 합성 녹음을 만들어 쓴다 (마이크처럼 48kHz).
+--preprocess both(기본)면 오디오 전처리를 끈 경우와 켠 경우를 모두 재고, 켠 경우에는 전처리 없이 올렸을 FLAC
+크기도 함께 만들어 업로드 바이트와 --uplink-kbps 기준 예상 업로드 시간 절감을 보여준다.
+(비교용 FLAC 인코딩이 인식 경로 안에서 돌므로 전처리를 켠 행의 tail에는 그 시간도 들어간다.)
+
+    python benchmarks/bench_stt.py --realtime --stub-delay 0.4
+    python benchmarks/bench_stt.py --preprocess on --uplink-kbps 500
+    python benchmarks/bench_stt.py --wav fixtures/meeting.wav --recognizer google --json stt.json
+    python benchmarks/bench_stt.py --wav fixtures/*.wav --recognizer google whisper --preprocess on
+"""
+import argparse
+import math
+import os
+import struct
+import sys
+import tempfile
+import time
+import wave
+
+import speech_recognition as sr
+
+from bench_common import summarize, write_results  # 저장소 루트를 sys.path에 넣으므로 먼저 가져옴
+from audio_preprocess import AudioPreprocessor
+from fuzzy_matcher import bounded_edit_distance
+from hangul import normalize_text
+from recording import RecordingController
+from stt import RECOGNIZER_BACKENDS, SpeechSegmenter, create_recognizer
+
+# 합성 녹음: (초, 소리 여부) — 짧은 멈춤(구간 분리)과 긴 멈춤(녹음 종료)을 포함
+SYNTHETIC_PATTERN = [(0.3, False), (1.2, True), (0.7, False), (0.8, True), (0.6, False), (1.5, True), (2.0, False)]
+
+
+def write_synthetic_wav(path, pattern=SYNTHETIC_PATTERN, sample_rate=16000, frequency=220.0, amplitude=8000):
+    """톤 구간과 묵음으로 된 16bit 모노 WAV 생성"""
+    frames = bytearray()
+    for seconds, loud in pattern:
+        for i in range(int(seconds * sample_rate)):
+            value = int(amplitude * math.sin(2 * math.pi * frequency * i / sample_rate)) if loud else 0
+            frames += struct.pack("<h", value)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(bytes(frames))
+    return path
+
+
+class FixedThreshold:
+    """소음 보정 없이 고정 임계값 사용 (파일 앞부분 1초를 보정에 쓰지 않도록)"""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def get_threshold(self, device_index, source):
+        return self.threshold
+
+
+class _RealtimeStream:
+    def __init__(self, stream, seconds_per_frame):
+        self.stream = stream
+        self.seconds_per_frame = seconds_per_frame
+        self.started = None
+        self.frames_read = 0
+
+    def read(self, size):
+        if self.started is None:
+            self.started = time.perf_counter()
+        data = self.stream.read(size)
+        self.frames_read += size
+        # 실제 녹음처럼 읽은 만큼의 시간이 지나야 다음 청크를 돌려줌
+        delay = self.started + self.frames_read * self.seconds_per_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return data
+
+
+class RealtimeAudioFile:
+    """sr.AudioFile을 재생 속도로 읽는 소스"""
+
+    def __init__(self, path):
+        self.audio_file = sr.AudioFile(path)
+
+    def __enter__(self):
+        source = self.audio_file.__enter__()
+        self.SAMPLE_RATE = source.SAMPLE_RATE
+        self.SAMPLE_WIDTH = source.SAMPLE_WIDTH
+        self.CHUNK = source.CHUNK
+        self.stream = _RealtimeStream(source.stream, 1.0 / source.SAMPLE_RATE)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self.audio_file.__exit__(exc_type, exc, tb)
+
+
+def audio_seconds(path):
+    with wave.open(path, "rb") as f:
+        return f.getnframes() / f.getframerate()
+
+
+def reference_transcript(path):
+    """WAV 옆 .txt 정답 전사 (없으면 None)"""
+    reference_path = os.path.splitext(path)[0] + ".txt"
+    if not os.path.exists(reference_path):
+        return None
+    with open(reference_path, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def character_error_rate(reference, hypothesis):
+    """글자 오류율 (공백·문장 부호를 뺀 편집 거리 / 정답 글자 수)"""
+    reference = normalize_text(reference)
+    hypothesis = normalize_text(hypothesis)
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    distance = bounded_edit_distance(reference, hypothesis, max(len(reference), len(hypothesis)))
+    return distance / len(reference)
+
+
+def run_once(path, recognizer, streaming, realtime, threshold, preprocessor=None):
+    controller = RecordingController(
+        recognizer,
+        FixedThreshold(threshold),
+        segmenter_factory=lambda: SpeechSegmenter(split_pause=0.5, end_pause=1.5),
+        source_factory=(lambda: RealtimeAudioFile(path)) if realtime else (lambda: sr.AudioFile(path))
+    )
+    start = time.perf_counter()
+    controller.start(streaming=streaming, preprocessor=preprocessor)
+    controller.wait()
+    if controller.error is not None:
+        raise controller.error
+    return {
+        "total": time.perf_counter() - start,
+        "capture": controller.capture_seconds,
+        # 녹음이 끝난 뒤 최종 인식 결과까지
+        "tail": controller.finished_at - controller.capture_ended_at,
+        "recognize": [end - begin for begin, end in controller.recognition_spans],
+        "transcript": controller.transcript,
+        "preprocess": [report for _, _, report in controller.preprocess_spans],
+    }
+
+
+def upload_summary(runs, uplink_kbps):
+    """마지막 실행의 전처리 보고로 업로드 바이트와 예상 업로드 시간(전처리 전/후) 계산"""
+    reports = runs[-1]["preprocess"]
+    if not reports:
+        return {}
+    upload_bytes = sum(report.get("upload_bytes", 0) for report in reports)
+    baseline_bytes = sum(report.get("baseline_upload_bytes", 0) for report in reports)
+    bytes_per_second = uplink_kbps * 1000 / 8
+    return {
+        "input_bytes": sum(report["input_bytes"] for report in reports),
+        "upload_bytes": upload_bytes,
+        "baseline_upload_bytes": baseline_bytes,
+        "trimmed_seconds": round(sum(report["trimmed_seconds"] for report in reports), 3),
+        "upload_seconds_est": round(upload_bytes / bytes_per_second, 4),
+        "baseline_upload_seconds_est": round(baseline_bytes / bytes_per_second, 4),
+        "preprocess": summarize([report["seconds"] for r in runs for report in r["preprocess"]]),
+        "baseline_encode": summarize([report["baseline_encode_seconds"] for r in runs for report in r["preprocess"]
+                                      if "baseline_encode_seconds" in report]),
+    }
+
+
+PREPROCESS_MODES = {"off": (False,), "on": (True,), "both": (False, True)}
+
+
+def load_recognizer(name, stub_delay=0.3, whisper_model="small"):
+    """엔진 생성과 불러오기 시간(초). 오프라인 모델은 여기서 한 번 불러오고 측정 내내 재사용"""
+    kwargs = {"stub": {"delay": stub_delay}, "whisper": {"model_size": whisper_model}}.get(name, {})
+    start = time.perf_counter()
+    recognizer = create_recognizer(name, **kwargs)
+    return recognizer, time.perf_counter() - start
+
+
+def run(paths, recognizer_names=("stub",), stub_delay=0.3, repeat=3, realtime=False, threshold=300,
+        preprocess="both", uplink_kbps=1000, whisper_model="small"):
+    """엔진 × WAV 파일 × 인식 방식 × 전처리 여부별 측정 결과 목록"""
+    # 벤치마크에서는 전처리 없이 올렸을 FLAC도 만들어 비교
+    preprocessor = AudioPreprocessor(measure_baseline=True)
+    results = []
+    for recognizer_name in recognizer_names:
+        recognizer, load_seconds = load_recognizer(recognizer_name, stub_delay, whisper_model)
+        for path in paths:
+            reference = reference_transcript(path)
+            for streaming in (False, True):
+                for preprocessed in PREPROCESS_MODES[preprocess]:
+                    runs = [run_once(path, recognizer, streaming, realtime, threshold,
+                                     preprocessor if preprocessed else None) for _ in range(repeat)]
+                    results.append(dict({
+                        "recognizer": recognizer_name,
+                        "load_seconds": round(load_seconds, 3),
+                        "fixture": os.path.basename(path),
+                        "audio_seconds": round(audio_seconds(path), 3),
+                        "mode": "streaming" if streaming else "batch",
+                        "preprocessed": preprocessed,
+                        "total": summarize([r["total"] for r in runs]),
+                        "capture": summarize([r["capture"] for r in runs]),
+                        "tail": summarize([r["tail"] for r in runs]),
+                        "recognize": summarize([seconds for r in runs for seconds in r["recognize"]]),
+                        "recognize_calls_per_run": len(runs[-1]["recognize"]),
+                        "transcript": runs[-1]["transcript"],
+                        "reference": reference,
+                        "cer": None if reference is None else round(
+                            character_error_rate(reference, runs[-1]["transcript"]), 4),
+                    }, **upload_summary(runs, uplink_kbps)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WAV 파일 기반 음성 인식 경로 벤치마크")
+    parser.add_argument("--wav", nargs="+", help="WAV 파일 (없으면 합성 녹음 사용)")
+    parser.add_argument("--recognizer", nargs="+", default=["stub"], choices=sorted(RECOGNIZER_BACKENDS),
+                        help="비교할 인식 엔진 (여러 개 가능)")
+    parser.add_argument("--whisper-model", default="small", help="whisper 엔진의 모델 크기 또는 경로")
+    parser.add_argument("--stub-delay", type=float, default=0.3, help="stub 인식기의 호출당 지연(초)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--realtime", action="store_true", help="파일을 실제 재생 속도로 읽기")
+    parser.add_argument("--threshold", type=float, default=300, help="말소리 판단 에너지 임계값")
+    parser.add_argument("--preprocess", default="both", choices=sorted(PREPROCESS_MODES),
+                        help="오디오 전처리 (both면 끈 경우와 켠 경우를 모두 측정)")
+    parser.add_argument("--uplink-kbps", type=float, default=1000, help="예상 업로드 시간 계산에 쓸 업로드 대역폭")
+    parser.add_argument("--sample-rate", type=int, default=48000, help="합성 녹음의 샘플레이트")
+    parser.add_argument("--json", help="결과 JSON 경로 (\"-\"면 표준 출력)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = args.wav or [write_synthetic_wav(os.path.join(temp_dir, "synthetic.wav"),
+                                                 sample_rate=args.sample_rate)]
+        results = run(paths, args.recognizer, args.stub_delay, args.repeat, args.realtime, args.threshold,
+                      args.preprocess, args.uplink_kbps, args.whisper_model)
+
+    out = sys.stderr if args.json == "-" else sys.stdout
+    print(f"{'엔진':>8} {'파일':>16} {'방식':>10} {'전처리':>6} {'전체 p50(ms)':>12} {'tail p50(ms)':>12} "
+          f"{'인식 p50(ms)':>12} {'인식 호출':>8} {'CER':>6}", file=out)
+    for result in results:
+        cer = "-" if result["cer"] is None else f"{result['cer']:.3f}"
+        print(f"{result['recognizer']:>8} {result['fixture']:>16} {result['mode']:>10} "
+              f"{'on' if result['preprocessed'] else 'off':>6} {result['total']['p50_ms']:12.1f} "
+              f"{result['tail']['p50_ms']:12.1f} {result['recognize'].get('p50_ms', 0.0):12.1f} "
+              f"{result['recognize_calls_per_run']:>8} {cer:>6}", file=out)
+    for name in dict.fromkeys(result["recognizer"] for result in results):
+        load_seconds = next(result["load_seconds"] for result in results if result["recognizer"] == name)
+        print(f"{name} 엔진 불러오기: {load_seconds * 1000:.0f}ms (한 번만)", file=out)
+    uploads = [result for result in results if "upload_bytes" in result]
+    if uploads:
+        print(f"\n{'엔진':>8} {'파일':>16} {'방식':>10} {'원본(KB)':>10} {'FLAC 전(KB)':>11} {'FLAC 후(KB)':>11} "
+              f"{'업로드 절감(ms)':>14} {'전처리 p50(ms)':>14}", file=out)
+        for result in uploads:
+            saved_ms = (result["baseline_upload_seconds_est"] - result["upload_seconds_est"]) * 1000
+            print(f"{result['recognizer']:>8} {result['fixture']:>16} {result['mode']:>10} "
+                  f"{result['input_bytes'] / 1024:10.1f} "
+                  f"{result['baseline_upload_bytes'] / 1024:11.1f} {result['upload_bytes'] / 1024:11.1f} "
+                  f"{saved_ms:14.1f} {result['preprocess']['p50_ms']:14.1f}", file=out)
+
+    if args.json:
+        write_results(args.json, "stt", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""TM 치환 지연시간 벤치마크
+
+apply_tm_corrections가 쓰는 TMMatcher.replace를 TM 크기(1천~50만 행)와 입력 길이별로 재고,
+기존 방식(행마다 str.replace)과 비교한다. 요청당 지연시간이 TM 크기와 무관하게 평평한지 확인하는 용도다.
+--fuzzy-distance를 주면 근사 일치(FuzzyTMMatcher) 조회 시간도 함께 잰다.
+--store를 주면 TM 저장소(메모리 SQLite)에 통째로 가져오는 시간과, 항목 하나를 추가/삭제할 때
+(DB와 세 색인에 바뀐 행만 반영) 걸리는 시간을 잰다. 색인을 다시 만드는 비용(색인 열)과 비교하는 용도다.
+
+    python benchmarks/bench_tm_matcher.py
+    python benchmarks/bench_tm_matcher.py --sizes 1000 50000 200000 --text-lengths 100 1000 --json tm.json
+    python benchmarks/bench_tm_matcher.py --sizes 10000 100000 --store
+"""
+import argparse
+import random
+import sys
+import time
+
+from bench_common import summarize, write_results
+from fuzzy_matcher import FuzzyTMMatcher
+from tm_matcher import TMMatcher
+from tm_store import TMLibrary
+
+HANGUL_START = 0xAC00
+HANGUL_COUNT = 11172
+
+
+def make_term(rng, min_length=2, max_length=8):
+    """임의의 한글 용어 생성"""
+    length = rng.randint(min_length, max_length)
+    return "".join(chr(HANGUL_START + rng.randrange(HANGUL_COUNT)) for _ in range(length))
+
+
+def make_tm_pairs(size, seed=0):
+    """(원본, 교정) 쌍으로 된 합성 TM 생성"""
+    rng = random.Random(seed)
+    pairs = {}
+    while len(pairs) < size:
+        pairs[make_term(rng)] = make_term(rng)
+    return list(pairs.items())
+
+
+def make_text(pairs, length, hit_ratio=0.2, seed=1):
+    """일부 TM 용어가 섞인 합성 입력 텍스트 생성"""
+    rng = random.Random(seed)
+    words = []
+    total = 0
+    while total < length:
+        if rng.random() < hit_ratio:
+            word = rng.choice(pairs)[0]
+        else:
+            word = make_term(rng, 1, 4)
+        words.append(word)
+        total += len(word) + 1
+    return " ".join(words)[:length]
+
+
+def legacy_replace(text, pairs):
+    """기존 apply_tm_corrections의 행 순회 방식"""
+    for source_text, target_text in pairs:
+        text = text.replace(source_text, target_text)
+    return text
+
+
+def time_calls(func, repeat):
+    """호출별 소요 시간(초) 목록"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def measure_store(pairs, edits=100):
+    """TM 저장소 가져오기 시간(ms)과 항목 하나 추가·삭제 시간 요약"""
+    store = TMLibrary().create("bench")
+    start = time.perf_counter()
+    store.import_pairs(pairs)
+    import_ms = (time.perf_counter() - start) * 1000
+    new_pairs = [pair for pair in make_tm_pairs(edits, seed=2) if store.get(pair[0]) is None]
+    upserts = [time_calls(lambda: store.upsert(*pair), 1)[0] for pair in new_pairs]
+    deletes = [time_calls(lambda: store.delete(pair[0]), 1)[0] for pair in new_pairs]
+    return {"store_import_ms": round(import_ms, 3), "store_upsert": summarize(upserts),
+            "store_delete": summarize(deletes)}
+
+
+def run(sizes, text_lengths, repeat=100, legacy_max_size=50000, fuzzy_distance=None, store=False):
+    """TM 크기 × 입력 길이별 측정 결과 목록"""
+    results = []
+    for size in sizes:
+        pairs = make_tm_pairs(size)
+        store_result = measure_store(pairs) if store else {}
+
+        build_start = time.perf_counter()
+        matcher = TMMatcher(pairs)
+        build_ms = (time.perf_counter() - build_start) * 1000
+
+        fuzzy_matcher = None
+        if fuzzy_distance is not None:
+            build_start = time.perf_counter()
+            fuzzy_matcher = FuzzyTMMatcher(pairs)
+            fuzzy_build_ms = (time.perf_counter() - build_start) * 1000
+
+        for text_length in text_lengths:
+            text = make_text(pairs, text_length)
+            result = {
+                "tm_size": size,
+                "text_length": text_length,
+                "build_ms": round(build_ms, 3),
+                "matcher": summarize(time_calls(lambda: matcher.replace(text), repeat)),
+            }
+            if fuzzy_matcher is not None:
+                result["fuzzy_build_ms"] = round(fuzzy_build_ms, 3)
+                result["fuzzy"] = summarize(time_calls(lambda: fuzzy_matcher.find_matches(text, fuzzy_distance), repeat))
+            if size <= legacy_max_size:
+                result["legacy"] = summarize(time_calls(lambda: legacy_replace(text, pairs), max(1, repeat // 20)))
+            result.update(store_result)
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TM 치환 지연시간 벤치마크")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000, 100000, 200000, 500000])
+    parser.add_argument("--text-lengths", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--legacy-max-size", type=int, default=50000,
+                        help="이 크기를 넘는 TM은 기존 방식 측정을 생략")
+    parser.add_argument("--fuzzy-distance", type=int, default=None, help="근사 일치 조회도 측정 (자모 편집 거리)")
+    parser.add_argument("--store", action="store_true", help="TM 저장소 가져오기·항목 편집 시간도 측정")
+    parser.add_argument("--json", help="결과 JSON 경로 (\"-\"면 표준 출력)")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.text_lengths, args.repeat, args.legacy_max_size, args.fuzzy_distance, args.store)
+
+    out = sys.stderr if args.json == "-" else sys.stdout
+    print(f"{'TM 크기':>10} {'입력 길이':>8} {'색인(ms)':>10} {'매처 p50(ms)':>12} {'매처 p99(ms)':>12} {'근사 p50(ms)':>12} {'기존(ms)':>10}", file=out)
+    for result in results:
+        legacy_column = f"{result['legacy']['mean_ms']:10.3f}" if "legacy" in result else f"{'-':>10}"
+        fuzzy_column = f"{result['fuzzy']['p50_ms']:12.4f}" if "fuzzy" in result else f"{'-':>12}"
+        print(f"{result['tm_size']:>10} {result['text_length']:>8} {result['build_ms']:10.1f} "
+              f"{result['matcher']['p50_ms']:12.4f} {result['matcher']['p99_ms']:12.4f} {fuzzy_column} {legacy_column}", file=out)
+
+    if args.store:
+        print(f"\n{'TM 크기':>10} {'가져오기(ms)':>12} {'추가 p50(ms)':>12} {'추가 p99(ms)':>12} {'삭제 p50(ms)':>12}",
+              file=out)
+        for result in {result["tm_size"]: result for result in results}.values():
+            print(f"{result['tm_size']:>10} {result['store_import_ms']:12.1f} {result['store_upsert']['p50_ms']:12.4f} "
+                  f"{result['store_upsert']['p99_ms']:12.4f} {result['store_delete']['p50_ms']:12.4f}", file=out)
+
+    if args.json:
+        write_results(args.json, "tm_matcher", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""두 벤치마크 결과 JSON 비교 (버전 간 회귀 확인)
+
+같은 조건(TM 크기·입력 길이, 파일·인식 방식, 실행 모드 등)의 측정값끼리 p50/p95를 비교하고,
+기준보다 threshold배 이상 느려진 항목이 있으면 종료 코드 1을 돌려준다.
+
+    python benchmarks/compare.py before/pipeline.json after/pipeline.json --threshold 1.2
+"""
+import argparse
+import json
+import sys
+
+QUANTILES = ("p50_ms", "p95_ms")
+
+
+def flatten(document):
+    """결과 JSON -> {(조건, 측정 경로, 분위수): 값}"""
+    values = {}
+    for result in document["results"]:
+        # 측정값(*_ms)과 인식 결과 텍스트를 뺀 스칼라 값들이 측정 조건
+        condition = ", ".join(f"{key}={value}" for key, value in result.items()
+                              if not isinstance(value, (dict, list)) and not key.endswith("_ms") and key != "transcript")
+        for key, value in result.items():
+            if key.endswith("_ms") and isinstance(value, (int, float)):
+                values[(condition, key, "value")] = value
+
+        def visit(node, path):
+            for key, value in node.items():
+                if not isinstance(value, dict):
+                    continue
+                if "count" in value:
+                    for quantile in QUANTILES:
+                        if value.get(quantile) is not None:
+                            values[(condition, "/".join(path + [key]), quantile)] = value[quantile]
+                else:
+                    visit(value, path + [key])
+
+        visit(result, [])
+    return values
+
+
+def compare(baseline, candidate, threshold=1.2):
+    """(행 목록, 회귀 개수). 행: (조건, 측정, 분위수, 기준값, 비교값, 배율)"""
+    baseline_values = flatten(baseline)
+    candidate_values = flatten(candidate)
+    rows = []
+    regressions = 0
+    for key in sorted(baseline_values.keys() & candidate_values.keys()):
+        before = baseline_values[key]
+        after = candidate_values[key]
+        ratio = after / before if before else None
+        if ratio is not None and ratio >= threshold:
+            regressions += 1
+        rows.append(key + (before, after, ratio))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벤치마크 결과 JSON 비교")
+    parser.add_argument("baseline", help="기준 결과 JSON")
+    parser.add_argument("candidate", help="비교할 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="이 배율 이상 느려지면 회귀로 표시")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    if baseline["benchmark"] != candidate["benchmark"]:
+        parser.error(f"다른 벤치마크 결과입니다: {baseline['benchmark']} / {candidate['benchmark']}")
+
+    print(f"기준 {baseline['environment'].get('revision')} → 비교 {candidate['environment'].get('revision')}")
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    for condition, metric, quantile, before, after, ratio in rows:
+        mark = " ⚠️" if ratio is not None and ratio >= args.threshold else ""
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"[{condition}] {metric} {quantile}: {before:.3f} → {after:.3f} ({ratio_text}){mark}")
+    print(f"회귀 {regressions}건 (기준 {args.threshold}배)")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
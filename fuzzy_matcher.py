@@ -0,0 +1,264 @@
+"""TM 근사 일치 교정 (음성 인식 오인식용)
+
+TMMatcher는 TM 원본 표기와 글자까지 똑같을 때만 치환한다. 인식 오류는 "거북썬", "한산노"처럼
+한두 자모만 다른 경우가 많으므로, 원본 표기를 자모(기본: 발음 정규화 자모)로 풀어 편집 거리로 비교한다.
+
+- 후보: 음절 단위 n-gram 역색인에서 입력과 n-gram을 충분히 공유하는 표기만 고른다.
+  자모 편집 하나는 음절 하나만 바꾸므로, 편집 거리 k 이내라면 n-gram을 최소 (n-gram 수 - n*k)개
+  공유해야 한다(q-gram 보조정리). 나머지 표기는 보지 않는다.
+- 검증: 공유 n-gram이 나온 위치 주변의 구간만 편집 거리 상한을 두고 계산한다.
+
+따라서 조회 비용은 TM 크기가 아니라 입력 길이와 후보 수에 비례한다.
+"""
+from hangul import is_ignored, jamo_unit, ngrams, normalize_text, phonetic_unit
+from tm_matcher import tm_pairs
+
+
+def bounded_edit_distance(a, b, max_distance):
+    """레벤슈타인 거리 (max_distance를 넘으면 max_distance + 1)
+
+    대각선에서 max_distance보다 먼 칸은 답이 될 수 없으므로 그 띠 안만 계산하고,
+    한 행이 모두 상한을 넘으면 바로 멈춘다.
+    """
+    limit = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return limit
+    if a == b:
+        return 0
+    previous = [min(j, limit) for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [limit] * (len(b) + 1)
+        current[0] = min(i, limit)
+        char_a = a[i - 1]
+        row_min = current[0] if low == 1 else limit
+        for j in range(low, high + 1):
+            value = min(previous[j - 1] + (char_a != b[j - 1]), previous[j] + 1, current[j - 1] + 1, limit)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min >= limit:
+            return limit
+        previous = current
+    return previous[len(b)]
+
+
+class _Form:
+    __slots__ = ("key", "units", "target", "grams")
+
+    def __init__(self, key, units, target, grams):
+        self.key = key  # 자모 문자열 (편집 거리 비교용)
+        self.units = units  # 글자(음절) 수
+        self.target = target
+        self.grams = grams
+
+
+class FuzzyTMMatcher:
+    """음절 n-gram 역색인 + 자모 편집 거리 검증으로 TM 원본 표기와 비슷한 구간을 찾아 교정
+
+    허용 거리는 min(max_distance, 표기 자모 수 * max_ratio)이다. phonetic=True면 발음이 같은 자모를
+    하나로 모아 비교하므로 "거북썬"처럼 소리가 같은 표기는 거리 0으로 찾는다.
+    min_length보다 짧은 표기(글자 수)는 잘못 고칠 위험이 커서 근사 일치에 쓰지 않는다.
+    """
+
+    def __init__(self, pairs=(), n=2, phonetic=True, min_length=3, max_distance=1, max_ratio=0.2,
+                 require_word_start=True):
+        self.n = n
+        self.phonetic = phonetic
+        self.min_length = min_length
+        self.max_distance = max_distance
+        self.max_ratio = max_ratio
+        # 고유명사는 보통 어절 처음에 오므로 어절 중간에서 시작하는 구간은 보지 않음 (조사·어미는 뒤에 붙음)
+        self.require_word_start = require_word_start
+        self._forms = {}  # 원본 표기 키 -> _Form
+        self._form_sources = {}  # 원본 표기 키 -> {원본: 교정} (그 키가 되는 원본들, 넣은 순서)
+        self._sources = {}  # 원본 표기 -> (키, 정규화한 교정 표기)
+        self._targets = {}  # 정규화한 교정 표기 -> 참조 수 (이미 올바른 구간은 건드리지 않음)
+        self._index = {}  # 음절 n-gram -> 표기 키 집합
+        for source_text, target_text in pairs:
+            self.add(source_text, target_text)
+
+    @classmethod
+    def from_dataframe(cls, tm_df, **kwargs):
+        return cls(tm_pairs(tm_df), **kwargs)
+
+    def __len__(self):
+        return len(self._forms)
+
+    def _unit(self, char):
+        return phonetic_unit(char) if self.phonetic else jamo_unit(char)
+
+    def add(self, source_text, target_text):
+        """용어 추가 (같은 원본이 이미 있으면 교정값만 갱신)"""
+        if not source_text or not target_text:
+            return
+        self.remove(source_text)
+        units = [self._unit(char) for char in source_text if not is_ignored(char)]
+        key = "".join(units)
+        target = normalize_text(target_text)
+        self._targets[target] = self._targets.get(target, 0) + 1
+        self._sources[source_text] = (key, target)
+        if len(units) < self.min_length:
+            return
+        self._form_sources.setdefault(key, {})[source_text] = target_text
+        if key in self._forms:
+            # 발음이 같은 원본이 이미 있으면 나중 행의 교정값을 씀
+            self._forms[key].target = target_text
+            return
+        form = _Form(key, len(units), target_text, ngrams(units, self.n))
+        self._forms[key] = form
+        for gram in form.grams:
+            self._index.setdefault(gram, set()).add(key)
+
+    def remove(self, source_text):
+        """용어 삭제 (없으면 무시)"""
+        keys = self._sources.pop(source_text, None)
+        if keys is None:
+            return
+        key, target = keys
+        count = self._targets[target] - 1
+        if count:
+            self._targets[target] = count
+        else:
+            del self._targets[target]
+        sources = self._form_sources.get(key)
+        if sources is None:
+            return
+        sources.pop(source_text, None)
+        # 같은 키를 만드는 다른 원본이 남아 있으면 유지하고, 남은 것 중 나중 행의 교정값으로 되돌림
+        if sources:
+            self._forms[key].target = next(reversed(sources.values()))
+            return
+        del self._form_sources[key]
+        form = self._forms.pop(key)
+        for gram in form.grams:
+            keys_for_gram = self._index.get(gram)
+            if keys_for_gram is not None:
+                keys_for_gram.discard(key)
+                if not keys_for_gram:
+                    del self._index[gram]
+
+    def find_matches(self, text, max_distance=None, exclude=()):
+        """(시작, 끝, 구간 텍스트, 교정, 거리) 목록을 겹치지 않게 왼쪽부터 반환
+
+        이미 교정 표기와 같은 구간과 exclude((시작, 끝) 목록, 정확 일치가 덮은 구간 등)에 걸치는 구간은 건드리지 않는다.
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        if not text or not self._forms or max_distance < 0:
+            return []
+
+        # 비교 대상 글자(공백·문장 부호 제외)의 원문 위치, 발음 단위, 어절 시작 여부
+        positions = []
+        chars = []
+        units = []
+        word_starts = []
+        previous_ignored = True
+        for position, char in enumerate(text):
+            if is_ignored(char):
+                previous_ignored = True
+                continue
+            positions.append(position)
+            chars.append(char.lower())
+            units.append(self._unit(char))
+            word_starts.append(previous_ignored)
+            previous_ignored = False
+        if not units:
+            return []
+        taken = [False] * len(units)
+        spans = iter(sorted(exclude))
+        span = next(spans, None)
+        for index, position in enumerate(positions):
+            while span is not None and span[1] <= position:
+                span = next(spans, None)
+            if span is not None and span[0] <= position:
+                taken[index] = True
+
+        # 1) 후보 표기: 입력과 공유하는 n-gram 수와, 공유 n-gram이 시작하는 글자 위치
+        gram_starts = {}
+        if len(units) <= self.n:
+            gram_starts[tuple(units)] = [0]
+        else:
+            for start in range(len(units) - self.n + 1):
+                gram_starts.setdefault(tuple(units[start:start + self.n]), []).append(start)
+        shared = {}
+        for gram, starts in gram_starts.items():
+            # 다른 스레드가 TM을 고치는 중에도 검색할 수 있도록 집합은 사본으로 훑음 (tuple()은 한 번에 복사)
+            for form_key in tuple(self._index.get(gram, ())):
+                entry = shared.get(form_key)
+                if entry is None:
+                    shared[form_key] = [1, list(starts)]
+                else:
+                    entry[0] += 1
+                    entry[1].extend(starts)
+
+        # 2) 검증: 후보마다 공유 n-gram 주변 구간의 편집 거리
+        best = {}  # (시작, 끝 글자 인덱스) -> (거리, 표기)
+        protected = set()  # 이미 교정 표기와 같은 구간
+        for form_key, (count, hits) in shared.items():
+            form = self._forms.get(form_key)
+            if form is None:
+                continue
+            allowed = min(max_distance, int(len(form.key) * self.max_ratio))
+            if count < max(1, len(form.grams) - self.n * allowed):
+                continue
+            window_starts = set()
+            for hit in hits:
+                window_starts.update(range(max(0, hit - form.units + 1), hit + 1))
+            # 교정 표기가 원본보다 길면(한국은행 → 한국은행(BOK)) 원본 길이 창으로는 교정 표기를 알아볼 수 없으므로
+            # 교정 표기 자신의 길이로도 확인
+            target_units = len(normalize_text(form.target))
+            for start in window_starts:
+                if self.require_word_start and not word_starts[start]:
+                    continue
+                target_end = start + target_units
+                if target_end <= len(units) and "".join(chars[start:target_end]) in self._targets:
+                    protected.add((start, target_end))
+                    continue
+                for length in (form.units, form.units - 1, form.units + 1):
+                    end = start + length
+                    if length < 1 or end > len(units):
+                        continue
+                    if "".join(chars[start:end]) in self._targets:
+                        protected.add((start, end))
+                        continue
+                    window = "".join(units[start:end])
+                    distance = bounded_edit_distance(window, form.key, allowed)
+                    if distance > allowed:
+                        continue
+                    previous = best.get((start, end))
+                    if previous is None or distance < previous[0]:
+                        best[(start, end)] = (distance, form)
+
+        # 3) 겹치는 구간은 거리가 작은 것, 같으면 긴 것, 같으면 왼쪽 것 우선 (올바른 구간이 가장 먼저)
+        for start, end in protected:
+            for index in range(start, end):
+                taken[index] = True
+        chosen = []
+        ranked = sorted(best.items(), key=lambda item: (item[1][0], -(item[0][1] - item[0][0]), item[0][0]))
+        for (start, end), (distance, form) in ranked:
+            if any(taken[start:end]):
+                continue
+            for index in range(start, end):
+                taken[index] = True
+            text_start = positions[start]
+            text_end = positions[end - 1] + 1
+            chosen.append((text_start, text_end, text[text_start:text_end], form.target, distance))
+        chosen.sort()
+        return chosen
+
+    def replace(self, text, max_distance=None, matches=None):
+        """비슷한 구간을 교정 표기로 치환 (이미 구한 find_matches 결과를 넘기면 재사용)"""
+        if matches is None:
+            matches = self.find_matches(text, max_distance)
+        if not matches:
+            return text
+
+        parts = []
+        last_end = 0
+        for start, end, _, target_text, _ in matches:
+            parts.append(text[last_end:start])
+            parts.append(target_text)
+            last_end = end
+        parts.append(text[last_end:])
+        return "".join(parts)
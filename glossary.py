@@ -0,0 +1,184 @@
+"""입력과 관련 있는 고유명사만 골라 프롬프트에 넣기
+
+System Prompt의 {{고유단어리스트}} 자리에 TM 전체를 넣으면 요청마다 수천 토큰이 붙는다.
+TM의 용어(교정 컬럼의 표준 표기와 원본 컬럼의 오인식 표기)를 글자 n-gram과 발음 n-gram으로 색인해 두고,
+인식된 텍스트마다 그 안에 나올 법한 용어만 골라 목록을 만든다. 발음 n-gram은 음절 단위로 정규화한
+자모 묶음(hangul.phonetic_syllables)의 n-gram이라 "한산노"처럼 받침·자음이 헷갈린 표기도 찾는다.
+
+점수는 용어의 n-gram 중 입력에 들어 있는 비율(포함도)이며, 글자 기준과 발음 기준 중 큰 값을 쓴다.
+"""
+from collections import defaultdict
+
+from hangul import ngrams, normalize_text, phonetic_syllables
+from llm import estimate_tokens
+from tm_matcher import tm_pairs
+
+GLOSSARY_PLACEHOLDER = "{{고유단어리스트}}"
+
+
+def format_glossary(terms):
+    """프롬프트에 넣을 목록 문자열"""
+    return "\n".join(f"- {term}" for term in terms)
+
+
+class GlossaryIndex:
+    """TM 용어 관련도 검색 색인
+
+    용어마다 표기(표준/오인식) 여러 개를 두고, 표기별 글자 n-gram·발음 n-gram을 역색인한다.
+    검색 비용은 TM 크기가 아니라 입력 길이와, 입력과 n-gram을 공유하는 표기 수에 비례한다.
+    지운 용어·표기는 None으로 표시만 하고 역색인 목록은 고치지 않으므로, 다른 스레드가 검색하는 중에 지워도 된다.
+    """
+
+    def __init__(self, pairs=(), char_n=2, phonetic_n=2, min_score=0.6, max_terms=30):
+        self.char_n = char_n
+        self.phonetic_n = phonetic_n
+        self.min_score = min_score
+        self.max_terms = max_terms
+        self._terms = []  # 용어 id -> 표준 표기 (지웠으면 None)
+        self._term_ids = {}
+        self._term_refs = []  # 용어 id -> 그 용어를 쓰는 TM 행 수
+        self._forms = {}  # (표기, 용어 id) -> 표기 id
+        self._form_refs = {}  # (표기, 용어 id) -> 그 표기를 쓰는 TM 행 수
+        self._form_terms = []  # 표기 id -> 용어 id (지웠으면 None)
+        self._form_sizes = []  # 표기 id -> (글자 n-gram 수, 발음 n-gram 수)
+        self._char_index = defaultdict(list)
+        self._phonetic_index = defaultdict(list)
+        self._full_list_tokens = None
+        for source_text, target_text in pairs:
+            self.add(source_text, target_text)
+
+    @classmethod
+    def from_dataframe(cls, tm_df, **kwargs):
+        return cls(tm_pairs(tm_df), **kwargs)
+
+    def __len__(self):
+        return len(self._term_ids)
+
+    @property
+    def terms(self):
+        """전체 표준 표기 목록 (TM 순서)"""
+        return [term for term in self._terms if term is not None]
+
+    def add(self, source_text, target_text):
+        """TM 한 행 추가: 교정 표기를 용어로, 원본·교정 표기를 검색 대상으로 등록"""
+        if not target_text:
+            return
+        term_id = self._term_ids.get(target_text)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._terms.append(target_text)
+            self._term_refs.append(0)
+            self._term_ids[target_text] = term_id
+            self._full_list_tokens = None
+        self._term_refs[term_id] += 1
+        for form in (target_text, source_text):
+            if form:
+                self._add_form(form, term_id)
+
+    def remove(self, source_text, target_text):
+        """add로 넣은 TM 한 행 삭제 (같은 표기·용어를 쓰는 다른 행이 남아 있으면 그대로 둠)"""
+        term_id = self._term_ids.get(target_text)
+        if term_id is None:
+            return
+        for form in (target_text, source_text):
+            if form:
+                self._remove_form(form, term_id)
+        self._term_refs[term_id] -= 1
+        if not self._term_refs[term_id]:
+            del self._term_ids[target_text]
+            self._terms[term_id] = None
+            self._full_list_tokens = None
+
+    def _add_form(self, form, term_id):
+        # 같은 표기가 여러 용어에 쓰이면 용어마다 따로 색인해, 한 행을 지워도 다른 용어의 표기는 남게 함
+        normalized = normalize_text(form)
+        if not normalized:
+            return
+        key = (normalized, term_id)
+        if key in self._forms:
+            self._form_refs[key] += 1
+            return
+        self._form_refs[key] = 1
+        form_id = len(self._form_terms)
+        self._form_terms.append(term_id)
+        char_grams = ngrams(normalized, self.char_n)
+        phonetic_grams = ngrams(phonetic_syllables(normalized), self.phonetic_n)
+        self._form_sizes.append((len(char_grams), len(phonetic_grams)))
+        for gram in char_grams:
+            self._char_index[gram].append(form_id)
+        for gram in phonetic_grams:
+            self._phonetic_index[gram].append(form_id)
+        self._forms[key] = form_id
+
+    def _remove_form(self, form, term_id):
+        key = (normalize_text(form), term_id)
+        if key not in self._forms:
+            return
+        self._form_refs[key] -= 1
+        if not self._form_refs[key]:
+            del self._form_refs[key]
+            self._form_terms[self._forms.pop(key)] = None
+
+    @staticmethod
+    def _query_grams(units, n):
+        # n보다 짧은 표기는 통째로 색인돼 있으므로 짧은 조각도 함께 조회
+        grams = set()
+        for size in range(1, min(n, len(units)) + 1):
+            grams |= ngrams(units, size)
+        return grams
+
+    def _scores(self, index, grams, size_position, scores):
+        shared = defaultdict(int)
+        for gram in grams:
+            for form_id in index.get(gram, ()):
+                shared[form_id] += 1
+        for form_id, count in shared.items():
+            term_id = self._form_terms[form_id]
+            if term_id is None:
+                continue
+            score = count / self._form_sizes[form_id][size_position]
+            if score > scores.get(term_id, 0.0):
+                scores[term_id] = score
+
+    def select(self, text, max_terms=None, min_score=None):
+        """입력에 나올 법한 용어 [(표준 표기, 점수)] (점수 높은 순)"""
+        if not text or not self._terms:
+            return []
+        normalized = normalize_text(text)
+        scores = {}
+        self._scores(self._char_index, self._query_grams(normalized, self.char_n), 0, scores)
+        self._scores(self._phonetic_index, self._query_grams(phonetic_syllables(normalized), self.phonetic_n), 1, scores)
+
+        min_score = self.min_score if min_score is None else min_score
+        max_terms = self.max_terms if max_terms is None else max_terms
+        ranked = sorted(((score, term_id) for term_id, score in scores.items() if score >= min_score),
+                        key=lambda item: (-item[0], item[1]))
+        selected = [(self._terms[term_id], round(score, 3)) for score, term_id in ranked[:max_terms]]
+        return [(term, score) for term, score in selected if term is not None]
+
+    def full_list_tokens(self):
+        """전체 용어 목록을 그대로 넣었을 때의 토큰 수 (한 번만 계산)"""
+        if self._full_list_tokens is None:
+            self._full_list_tokens = estimate_tokens(format_glossary(self.terms))
+        return self._full_list_tokens
+
+
+def fill_glossary(system_prompt, glossary, text):
+    """System Prompt의 고유명사 자리에 관련 용어만 넣고 (프롬프트, 보고) 반환
+
+    보고: {"terms": 선택 용어 수, "total_terms": 전체 용어 수,
+           "full_tokens": 전체 목록을 넣었을 때 System Prompt 토큰, "tokens": 선택 목록을 넣은 System Prompt 토큰}
+    glossary가 없거나 프롬프트에 자리가 없으면 프롬프트를 그대로 돌려주고 보고는 None.
+    """
+    if glossary is None or GLOSSARY_PLACEHOLDER not in system_prompt:
+        return system_prompt, None
+    terms = [term for term, _ in glossary.select(text)]
+    filled = system_prompt.replace(GLOSSARY_PLACEHOLDER, format_glossary(terms))
+    base_tokens = estimate_tokens(system_prompt.replace(GLOSSARY_PLACEHOLDER, ""))
+    report = {
+        "terms": len(terms),
+        "total_terms": len(glossary),
+        "full_tokens": base_tokens + glossary.full_list_tokens(),
+        "tokens": base_tokens + estimate_tokens(format_glossary(terms)),
+    }
+    return filled, report
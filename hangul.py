@@ -0,0 +1,122 @@
+"""한글 자모 분해와 발음 기반 정규화
+
+음성 인식 오류는 글자 단위보다 소리 단위로 비슷한 경우가 많으므로(예: 한산도/한산노, 셔틀/서틀),
+음절을 초성·중성·종성 자모로 풀고 소리가 비슷한 자모를 하나로 모아 비교한다.
+"""
+import re
+
+HANGUL_BASE = 0xAC00
+HANGUL_END = 0xD7A3
+
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSEONG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSEONG = ["", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ",
+             "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+
+# 된소리·거센소리는 예사소리로 (인식기가 자주 헷갈리는 쌍)
+PHONETIC_CHOSEONG = str.maketrans("ㄲㅋㄸㅌㅃㅍㅆㅉㅊ", "ㄱㄱㄷㄷㅂㅂㅅㅈㅈ")
+# 소리가 거의 같은 모음
+PHONETIC_JUNGSEONG = str.maketrans("ㅐㅒㅙㅚ", "ㅔㅖㅞㅞ")
+# 받침은 대표음 7개로 (표준 발음법 제8~11항)
+PHONETIC_JONGSEONG = {
+    "": "", "ㄱ": "ㄱ", "ㄲ": "ㄱ", "ㅋ": "ㄱ", "ㄳ": "ㄱ", "ㄺ": "ㄱ",
+    "ㄴ": "ㄴ", "ㄵ": "ㄴ", "ㄶ": "ㄴ",
+    "ㄷ": "ㄷ", "ㅅ": "ㄷ", "ㅆ": "ㄷ", "ㅈ": "ㄷ", "ㅊ": "ㄷ", "ㅌ": "ㄷ", "ㅎ": "ㄷ",
+    "ㄹ": "ㄹ", "ㄼ": "ㄹ", "ㄽ": "ㄹ", "ㄾ": "ㄹ", "ㅀ": "ㄹ",
+    "ㅁ": "ㅁ", "ㄻ": "ㅁ",
+    "ㅂ": "ㅂ", "ㅍ": "ㅂ", "ㅄ": "ㅂ", "ㄿ": "ㅂ",
+    "ㅇ": "ㅇ",
+}
+# 받침은 초성과 구분되도록 다른 기호로 표시 (받침 ㄴ + 초성 ㅇ 과 초성 ㄴ 을 구분)
+FINAL_MARK = "_"
+
+_IGNORED = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def is_hangul_syllable(char):
+    return HANGUL_BASE <= ord(char) <= HANGUL_END
+
+
+def split_syllable(char):
+    """완성형 음절 -> (초성, 중성, 종성) 자모 (음절이 아니면 None)"""
+    code = ord(char) - HANGUL_BASE
+    if code < 0 or code > HANGUL_END - HANGUL_BASE:
+        return None
+    return CHOSEONG[code // 588], JUNGSEONG[(code % 588) // 28], JONGSEONG[code % 28]
+
+
+def decompose(text):
+    """한글 음절을 자모로 풀어 쓴 문자열 (그 밖의 글자는 그대로)"""
+    parts = []
+    for char in text:
+        jamo = split_syllable(char)
+        if jamo is None:
+            parts.append(char)
+        else:
+            parts.append("".join(jamo))
+    return "".join(parts)
+
+
+def _phonetic_unit(char):
+    jamo = split_syllable(char)
+    if jamo is None:
+        return char
+    initial, medial, final = jamo
+    initial = "" if initial == "ㅇ" else initial.translate(PHONETIC_CHOSEONG)
+    final = PHONETIC_JONGSEONG[final]
+    return initial + medial.translate(PHONETIC_JUNGSEONG) + (FINAL_MARK + final if final else "")
+
+
+# 글자 -> 발음 단위 (음절 종류가 유한하므로 한 번 계산한 값을 재사용)
+_PHONETIC_UNITS = {}
+
+
+def phonetic_unit(char):
+    """글자 하나의 발음 단위 (한글 음절은 정규화한 자모 묶음, 그 밖의 글자는 소문자 그대로)"""
+    unit = _PHONETIC_UNITS.get(char)
+    if unit is None:
+        unit = _PHONETIC_UNITS[char] = _phonetic_unit(char.lower())
+    return unit
+
+
+def jamo_unit(char):
+    """글자 하나의 자모 분해 (한글 음절이 아니면 소문자 그대로)"""
+    jamo = split_syllable(char)
+    return "".join(jamo) if jamo is not None else char.lower()
+
+
+def is_ignored(char):
+    """비교할 때 버리는 글자 (공백·문장 부호)"""
+    return _IGNORED.fullmatch(char) is not None
+
+
+def phonetic_syllables(text):
+    """음절마다 발음이 비슷하면 같아지도록 정규화한 자모 묶음 목록
+
+    공백·문장 부호는 버리고 영문은 소문자로 맞춘다. 초성 ㅇ(소리 없음)은 생략하고,
+    받침은 초성과 구분되도록 FINAL_MARK를 붙인다. 한글이 아닌 글자는 한 글자가 한 단위다.
+    """
+    return [phonetic_unit(char) for char in _IGNORED.sub("", text)]
+
+
+def phonetic_key(text):
+    """phonetic_syllables를 이어 붙인 문자열 (발음이 비슷한 표기끼리 같아짐)"""
+    return "".join(phonetic_syllables(text))
+
+
+def normalize_text(text):
+    """공백·문장 부호를 뺀 소문자 문자열 (띄어쓰기만 다른 인식 결과를 같게 봄)"""
+    return _IGNORED.sub("", text).lower()
+
+
+def ngrams(units, n):
+    """겹치는 n-gram 집합 (n보다 짧으면 전체 하나). 문자열이면 부분 문자열, 목록이면 튜플"""
+    if not units:
+        return set()
+    if isinstance(units, str):
+        if len(units) <= n:
+            return {units}
+        return {units[i:i + n] for i in range(len(units) - n + 1)}
+    if len(units) <= n:
+        return {tuple(units)}
+    return {tuple(units[i:i + n]) for i in range(len(units) - n + 1)}
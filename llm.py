@@ -0,0 +1,261 @@
+"""OpenAI Chat Completions 호출 공통부
+
+Streamlit에 의존하지 않으므로 UI(prompt.py)와 다른 실행 경로에서 같이 쓴다.
+"""
+import math
+import threading
+import time
+
+from llm_cache import make_cache_key
+from request_policy import run_with_policy
+
+try:
+    import tiktoken
+except ImportError:  # 선택 의존성: 없으면 글자 수로 어림
+    tiktoken = None
+
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_MAX_TOKENS = 100
+DEFAULT_TEMPERATURE = 0.3
+
+# 출력 토큰 한도 = 입력 토큰 추정치 × 배수 + 여유 (검수는 입력과 거의 같은 길이, 번역은 조금 더 여유)
+CORRECTION_TOKEN_RATIO = 1.3
+TRANSLATION_TOKEN_RATIO = 1.6
+# 통합 모드는 검수문과 번역문을 JSON 하나에 담아 받음
+FUSED_TOKEN_RATIO = CORRECTION_TOKEN_RATIO + TRANSLATION_TOKEN_RATIO
+# 통합 모드 응답 형식 (JSON 객체만 생성)
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+MIN_MAX_TOKENS = 64
+MAX_MAX_TOKENS = 4096
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """토큰 수 (tiktoken이 있으면 o200k_base로 세고, 없으면 글자 수로 어림)"""
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    # 영문·숫자는 약 4글자, 한글 등은 약 1글자당 1토큰
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def adaptive_max_tokens(text, ratio=CORRECTION_TOKEN_RATIO, minimum=MIN_MAX_TOKENS, maximum=MAX_MAX_TOKENS):
+    """입력 길이에 맞춘 max_tokens (긴 입력이 고정 한도에서 잘리지 않도록)"""
+    return max(minimum, min(maximum, math.ceil(estimate_tokens(text) * ratio) + 16))
+
+
+class ChatResult:
+    """응답 텍스트와 지연시간(초)"""
+
+    def __init__(self, text, first_token_seconds, total_seconds, cache_source=None, prompt_tokens=None,
+                 completion_tokens=None):
+        self.text = text
+        # 첫 토큰 도착까지 걸린 시간 (비스트리밍이면 전체 시간과 같음)
+        self.first_token_seconds = first_token_seconds
+        self.total_seconds = total_seconds
+        # 캐시에서 받은 경우 "memory"/"disk"/"coalesced", API를 직접 호출했으면 None
+        self.cache_source = cache_source
+        # API 사용량 (캐시 응답이면 None)
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        # 요청 정책을 거쳤으면 재시도 횟수·헤징 여부·스케줄러 대기 시간 (request_policy.run_with_policy의 report)
+        self.request_stats = {}
+
+    def timing(self):
+        timing = {
+            "ttft": self.first_token_seconds,
+            "total": self.total_seconds,
+            "cache": self.cache_source,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+        timing.update(self.request_stats)
+        return timing
+
+
+def _usage(response):
+    """응답의 (prompt_tokens, completion_tokens). 없으면 (None, None)"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None, None
+    return usage.prompt_tokens, usage.completion_tokens
+
+
+def _message_text(response):
+    """응답 본문 (거절·도구 호출만 있는 응답처럼 content가 None이면 빈 문자열)"""
+    return (response.choices[0].message.content or "").strip()
+
+
+def chat_completion(client, messages, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS,
+                    temperature=DEFAULT_TEMPERATURE, on_delta=None, cache=None, response_format=None, policy=None,
+                    context=None):
+    """채팅 완성 요청
+
+    on_delta가 주어지면 스트리밍으로 받으며, 토큰이 도착할 때마다 지금까지 누적된 텍스트로 호출한다.
+    cache(LLMCache)가 주어지면 같은 요청의 저장된 응답을 쓰고, 동시에 들어온 같은 요청은 한 번만 호출한다.
+    response_format(예: JSON_RESPONSE_FORMAT)은 그대로 API에 전달한다. 형식 지시는 메시지에도 들어 있으므로
+    캐시 키는 메시지로 구분된다.
+    policy(RequestPolicy)가 주어지면 마감 시간·재시도·헤징을 적용한다 (캐시 안쪽에서 적용하므로 헤징 요청이
+    같은 키의 다른 요청에 합류하지 않음). context는 요청을 실행하는 작업 스레드에서 먼저 부르는 함수다.
+    """
+    if cache is None:
+        return _request_with_policy(client, messages, model, max_tokens, temperature, on_delta, response_format,
+                                    policy, context)
+
+    start = time.perf_counter()
+    key = make_cache_key(model, messages, max_tokens, temperature)
+    fresh = []
+
+    def compute():
+        result = _request_with_policy(client, messages, model, max_tokens, temperature, on_delta, response_format,
+                                      policy, context)
+        fresh.append(result)
+        return result.text
+
+    text, cache_source = cache.get_or_compute(key, compute)
+    if fresh:
+        return fresh[0]
+
+    # 캐시에서 받은 응답은 한 번에 전달
+    if on_delta is not None and text:
+        on_delta(text)
+    elapsed = time.perf_counter() - start
+    return ChatResult(text, elapsed, elapsed, cache_source=cache_source)
+
+
+def _request_with_policy(client, messages, model, max_tokens, temperature, on_delta, response_format, policy, context):
+    """요청 정책을 적용한 API 호출 (정책이 없으면 바로 호출)"""
+    if policy is None:
+        return _request(client, messages, model, max_tokens, temperature, on_delta, response_format)
+
+    def send(timeout, attempt):
+        # 남은 마감 시간을 요청 타임아웃으로 (같은 연결 풀을 쓰는 복사본)
+        request_client = client.with_options(timeout=timeout) if timeout is not None else client
+        # 헤징용 중복 요청은 부분 결과를 내보내지 않음
+        return _request(request_client, messages, model, max_tokens, temperature,
+                        None if attempt.hedge else on_delta, response_format, attempt=attempt)
+
+    def request(timeout, attempt):
+        if policy.admission is None:
+            return send(timeout, attempt)
+        # 공용 스케줄러의 슬롯을 받은 뒤 남은 시간으로 요청 (대기 시간은 재시도·헤징 요청까지 합산)
+        with policy.admission.slot(timeout, attempt.cancelled) as waited:
+            with lock:
+                report["queue_wait"] = report.get("queue_wait", 0.0) + waited
+            return send(max(0.01, timeout - waited) if timeout is not None else None, attempt)
+
+    report = {}
+    lock = threading.Lock()
+    result = run_with_policy(request, policy, report, context)
+    if on_delta is not None and report.get("hedge_won") and result.text:
+        on_delta(result.text)
+    result.request_stats = report
+    return result
+
+
+def _request(client, messages, model, max_tokens, temperature, on_delta, response_format=None, attempt=None):
+    """캐시 없이 API 호출
+
+    attempt(request_policy의 요청 시도)가 취소되면 스트리밍 응답은 다음 청크에서 닫고 멈춘다.
+    응답을 기다리며 막혀 있는 시간은 client에 건 타임아웃(남은 마감 시간)까지로 제한된다.
+    """
+    start = time.perf_counter()
+    extra = {"response_format": response_format} if response_format is not None else {}
+
+    if on_delta is None:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **extra
+        )
+        elapsed = time.perf_counter() - start
+        prompt_tokens, completion_tokens = _usage(response)
+        return ChatResult(_message_text(response), elapsed, elapsed, prompt_tokens=prompt_tokens,
+                          completion_tokens=completion_tokens)
+
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+        stream_options={"include_usage": True},
+        **extra
+    )
+    parts = []
+    first_token_seconds = None
+    prompt_tokens = completion_tokens = None
+    for chunk in stream:
+        if attempt is not None and attempt.cancelled.is_set():
+            # 진 요청·마감을 넘긴 요청은 연결을 닫고 멈춤
+            stream.close()
+            break
+        if getattr(chunk, "usage", None) is not None:
+            # 사용량은 마지막 청크(choices 없음)에 담겨 옴
+            prompt_tokens, completion_tokens = _usage(chunk)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        if first_token_seconds is None:
+            first_token_seconds = time.perf_counter() - start
+        parts.append(delta)
+        if on_delta is not None:
+            on_delta("".join(parts))
+
+    total_seconds = time.perf_counter() - start
+    if first_token_seconds is None or on_delta is None:
+        first_token_seconds = total_seconds
+    return ChatResult("".join(parts).strip(), first_token_seconds, total_seconds,
+                      prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+async def chat_completion_async(client, messages, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS,
+                                temperature=DEFAULT_TEMPERATURE, cache=None, response_format=None):
+    """AsyncOpenAI 클라이언트용 비스트리밍 요청 (배치 처리용)
+
+    cache가 주어지면 저장된 응답을 먼저 찾고, 동시에 들어온 같은 요청은 한 번만 호출한다 (동기 경로와 같음).
+    """
+    if cache is None:
+        return await _request_async(client, messages, model, max_tokens, temperature, response_format)
+
+    start = time.perf_counter()
+    key = make_cache_key(model, messages, max_tokens, temperature)
+    fresh = []
+
+    async def compute():
+        result = await _request_async(client, messages, model, max_tokens, temperature, response_format)
+        fresh.append(result)
+        return result.text
+
+    text, cache_source = await cache.get_or_compute_async(key, compute)
+    if fresh:
+        return fresh[0]
+    elapsed = time.perf_counter() - start
+    return ChatResult(text, elapsed, elapsed, cache_source=cache_source)
+
+
+async def _request_async(client, messages, model, max_tokens, temperature, response_format=None):
+    """캐시 없이 비동기 API 호출"""
+    start = time.perf_counter()
+    extra = {"response_format": response_format} if response_format is not None else {}
+    response = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        **extra
+    )
+    elapsed = time.perf_counter() - start
+    prompt_tokens, completion_tokens = _usage(response)
+    return ChatResult(_message_text(response), elapsed, elapsed, prompt_tokens=prompt_tokens,
+                      completion_tokens=completion_tokens)
@@ -0,0 +1,288 @@
+"""LLM 응답 캐시
+
+(모델, 메시지, max_tokens, temperature)가 같은 요청은 저장해 둔 응답을 돌려준다.
+메모리 LRU를 먼저 보고, 없으면 SQLite 파일을 본다. 두 계층 모두 TTL과 개수 한도로 정리되며,
+같은 요청이 동시에 여러 세션에서 들어오면 API 호출은 한 번만 하고 결과를 나눠 갖는다(single-flight).
+배치 처리(asyncio)는 get_or_compute_async로 같은 이벤트 루프 안에서 같은 방식으로 합류한다.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def make_cache_key(model, messages, max_tokens, temperature):
+    """요청 파라미터의 SHA-256 해시"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature},
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """메모리 LRU + SQLite 2계층 응답 캐시 (스레드 안전)
+
+    락은 메모리 LRU·진행 중인 요청·카운터만 지키고, SQLite는 스레드마다 따로 연 연결로 락 밖에서 읽고 쓴다.
+    그래서 한 세션의 디스크 조회가 다른 세션의 메모리 적중을 막지 않는다.
+    """
+
+    def __init__(self, path=None, max_memory_entries=1024, max_disk_entries=100000, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()  # key -> (value, 저장 시각)
+        self._inflight = {}  # key -> Future
+        self._async_inflight = {}  # key -> asyncio.Future (get_or_compute_async용)
+        self._lock = threading.Lock()
+        self._local = threading.local()  # 스레드별 SQLite 연결
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0,
+                         "memory_evictions": 0, "disk_evictions": 0}
+
+        self._disk_entries = 0
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = self._connection()
+            # 읽는 연결이 쓰는 연결을 기다리지 않도록 WAL 모드 (파일에 남는 설정)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache(last_access)")
+            db.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - ttl_seconds,))
+            self._disk_entries = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def _connection(self):
+        """이 스레드의 SQLite 연결 (자동 커밋, 여러 문장을 묶을 때만 트랜잭션을 직접 염)"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.db = db
+        return db
+
+    def _is_expired(self, created_at, now):
+        return now - created_at > self.ttl_seconds
+
+    def _memory_lookup_locked(self, key):
+        """메모리에서 값 조회 (없거나 만료됐으면 None)"""
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        value, created_at = entry
+        if self._is_expired(created_at, time.time()):
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        self.counters["memory_hits"] += 1
+        return value
+
+    def _read_disk(self, key):
+        """디스크에서 (값, 저장 시각) 조회 (락 밖에서 호출). 없거나 만료됐으면 None"""
+        if not self.path:
+            return None
+        db = self._connection()
+        row = db.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if self._is_expired(row[1], now):
+            deleted = db.execute("DELETE FROM llm_cache WHERE key = ?", (key,)).rowcount
+            with self._lock:
+                self._disk_entries -= deleted
+            return None
+        db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        return row
+
+    def _write_disk(self, key, value, created_at):
+        """디스크에 저장하고 개수 한도를 넘으면 가장 오래 안 쓴 항목부터 정리 (락 밖에서 호출)"""
+        if not self.path:
+            return
+        db = self._connection()
+        # 다른 연결이 같은 키를 동시에 쓰더라도 개수가 맞도록 확인과 저장을 한 트랜잭션으로
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            existed = db.execute("SELECT 1 FROM llm_cache WHERE key = ?", (key,)).fetchone() is not None
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, created_at, created_at)
+            )
+            with self._lock:
+                if not existed:
+                    self._disk_entries += 1
+                overflow = max(0, self._disk_entries - self.max_disk_entries)
+                self._disk_entries -= overflow
+                self.counters["disk_evictions"] += overflow
+            if overflow > 0:
+                db.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _remember_locked(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.counters["memory_evictions"] += 1
+
+    def _remember_disk_hit_locked(self, key, row):
+        value, created_at = row
+        self._remember_locked(key, value, created_at)
+        self.counters["disk_hits"] += 1
+        return value
+
+    def _claim(self, key, inflight, create_future):
+        """캐시를 조회하고, 없으면 진행 중인 같은 요청에 합류하거나 직접 계산할 차례를 잡음
+
+        (값, 출처, future, owner)를 반환한다. 캐시에 있으면 출처가 "memory"/"disk"이고,
+        없으면 future를 기다리거나(owner=False) 직접 계산해 결과를 넣는다(owner=True).
+        디스크는 락을 놓은 채로 읽으므로, 읽는 사이 다른 요청이 저장·시작했는지 락을 다시 잡고 확인한다.
+        """
+        with self._lock:
+            value = self._memory_lookup_locked(key)
+            if value is not None:
+                return value, "memory", None, False
+            future = inflight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                return None, None, future, False
+
+        row = self._read_disk(key)
+
+        with self._lock:
+            if row is not None:
+                return self._remember_disk_hit_locked(key, row), "disk", None, False
+            value = self._memory_lookup_locked(key)
+            if value is not None:
+                return value, "memory", None, False
+            future = inflight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                return None, None, future, False
+            self.counters["misses"] += 1
+            future = create_future()
+            inflight[key] = future
+            return None, None, future, True
+
+    def _finish(self, key, value, future, inflight):
+        """직접 계산한 값을 메모리에 넣고 기다리던 요청에 넘긴 뒤 디스크에 저장
+
+        디스크 저장이 끝날 때까지는 진행 중 목록에 남겨 두어, 그 사이 들어온 같은 요청이 디스크를 못 보고
+        다시 계산하지 않고 이미 끝난 future에서 바로 값을 받게 한다.
+        """
+        created_at = time.time()
+        with self._lock:
+            self._remember_locked(key, value, created_at)
+        future.set_result(value)
+        try:
+            self._write_disk(key, value, created_at)
+        finally:
+            with self._lock:
+                del inflight[key]
+
+    def lookup(self, key):
+        """(캐시된 값, 출처 "memory"/"disk"). 없으면 (None, None)"""
+        with self._lock:
+            value = self._memory_lookup_locked(key)
+            if value is not None:
+                return value, "memory"
+        row = self._read_disk(key)
+        if row is None:
+            return None, None
+        with self._lock:
+            return self._remember_disk_hit_locked(key, row), "disk"
+
+    def get(self, key):
+        """캐시된 값 (없으면 None)"""
+        return self.lookup(key)[0]
+
+    def set(self, key, value):
+        created_at = time.time()
+        with self._lock:
+            self._remember_locked(key, value, created_at)
+        self._write_disk(key, value, created_at)
+
+    def get_or_compute(self, key, compute):
+        """캐시된 값이 있으면 반환하고, 없으면 compute()로 만들어 저장
+
+        (값, 출처)를 반환한다. 출처는 "memory"/"disk"/"coalesced"(다른 요청의 결과를 기다림)/None(직접 호출).
+        compute에서 난 예외는 기다리던 요청들에도 그대로 전달되며 캐시에는 남지 않는다.
+        """
+        value, source, future, owner = self._claim(key, self._inflight, Future)
+        if source is not None:
+            return value, source
+        if not owner:
+            return future.result(), "coalesced"
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        self._finish(key, value, future, self._inflight)
+        return value, None
+
+    async def get_or_compute_async(self, key, compute):
+        """get_or_compute의 asyncio 버전 (compute는 인자 없는 코루틴 함수)
+
+        같은 이벤트 루프에서 동시에 들어온 같은 요청은 첫 요청의 결과를 기다린다 (출처 "coalesced").
+        """
+        def create_future():
+            future = asyncio.get_running_loop().create_future()
+            # 기다리는 요청이 없을 때 "exception was never retrieved" 경고가 나지 않도록 결과를 읽어 둠
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            return future
+
+        value, source, future, owner = self._claim(key, self._async_inflight, create_future)
+        if source is not None:
+            return value, source
+        if not owner:
+            # 기다리던 쪽이 취소돼도 첫 요청은 계속 진행
+            return await asyncio.shield(future), "coalesced"
+
+        try:
+            value = await compute()
+        except Exception as e:
+            with self._lock:
+                del self._async_inflight[key]
+            future.set_exception(e)
+            raise
+        except BaseException:
+            with self._lock:
+                del self._async_inflight[key]
+            future.cancel()
+            raise
+        self._finish(key, value, future, self._async_inflight)
+        return value, None
+
+    def stats(self):
+        """적중/미스 카운터와 크기"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._disk_entries
+            stats["inflight"] = len(self._inflight) + len(self._async_inflight)
+            return stats
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._disk_entries = 0
+        if self.path:
+            self._connection().execute("DELETE FROM llm_cache")
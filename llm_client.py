@@ -0,0 +1,145 @@
+"""연결 풀을 재사용하는 OpenAI 클라이언트
+
+Streamlit은 재실행마다 스크립트를 처음부터 다시 실행하므로, 클라이언트를 매번 만들면
+HTTP 연결 풀이 버려지고 TLS 핸드셰이크를 다시 하게 된다. 여기서 만든 클라이언트를
+프로세스 단위로 한 번만 만들어 공유하고, 새 연결/핸드셰이크 횟수를 세어 재사용 여부를 확인한다.
+"""
+import threading
+
+import httpx
+import openai
+
+
+class PoolConfig:
+    """연결 풀 한도와 타임아웃(초)"""
+
+    def __init__(self, max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0,
+                 connect_timeout=5.0, read_timeout=60.0, write_timeout=10.0, pool_timeout=10.0, max_retries=2):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.pool_timeout = pool_timeout
+        self.max_retries = max_retries
+
+    def limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def timeout(self):
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout
+        )
+
+
+class ConnectionStats:
+    """요청 수 대비 새 TCP 연결/TLS 핸드셰이크 횟수 (httpcore trace 이벤트 기준)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self._lock = threading.Lock()
+
+    def record(self, event_name):
+        with self._lock:
+            if event_name == "connection.connect_tcp.started":
+                self.new_connections += 1
+            elif event_name == "connection.start_tls.started":
+                self.tls_handshakes += 1
+
+    def trace(self, event_name, info):
+        self.record(event_name)
+
+    async def trace_async(self, event_name, info):
+        self.record(event_name)
+
+    def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def on_request_async(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace_async
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused_requests": reused,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+            }
+
+
+class SharedOpenAIClients:
+    """같은 풀 설정을 쓰는 동기/비동기 OpenAI 클라이언트 묶음
+
+    동기 클라이언트는 여러 스레드에서 같이 써도 된다. 비동기 클라이언트의 연결은 처음 사용한
+    이벤트 루프에 묶이므로 한 루프(예: 배치 실행) 안에서만 쓴다.
+    """
+
+    def __init__(self, api_key, base_url=None, config=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.config = config or PoolConfig()
+        self.stats = ConnectionStats()
+        self._sync_client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    @property
+    def sync(self):
+        with self._lock:
+            if self._sync_client is None:
+                http_client = httpx.Client(
+                    limits=self.config.limits(),
+                    timeout=self.config.timeout(),
+                    follow_redirects=True,
+                    event_hooks={"request": [self.stats.on_request]}
+                )
+                self._sync_client = openai.OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    http_client=http_client,
+                    max_retries=self.config.max_retries
+                )
+            return self._sync_client
+
+    @property
+    def async_(self):
+        with self._lock:
+            if self._async_client is None:
+                http_client = httpx.AsyncClient(
+                    limits=self.config.limits(),
+                    timeout=self.config.timeout(),
+                    follow_redirects=True,
+                    event_hooks={"request": [self.stats.on_request_async]}
+                )
+                self._async_client = openai.AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    http_client=http_client,
+                    max_retries=self.config.max_retries
+                )
+            return self._async_client
+
+    def close(self):
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+            # 비동기 클라이언트는 자신의 루프에서 aclose()로 닫아야 하므로 참조만 해제
+            self._async_client = None
@@ -0,0 +1,398 @@
+"""단계별 지연시간 추적과 내보내기
+
+요청 하나를 Trace로, 그 안의 단계(녹음, 오디오 전처리, STT, 검수, TM, 번역)를 perf_counter 기반 Span으로 기록한다.
+MetricsRegistry는 단계별 최근 지연시간을 모아 p50/p95/p99를 계산하고 JSONL·Prometheus 텍스트로 내보낸다.
+ScriptRunStats는 세션 하나의 Streamlit 스크립트 실행(전체/fragment) 횟수와 시간을 센다.
+"""
+import collections
+import json
+import math
+import threading
+import time
+import uuid
+
+# 단계 이름 -> 화면 표시 이름
+STAGE_LABELS = {
+    "audio_capture": "🎙️ 녹음",
+    "audio_preprocess": "🎛️ 오디오 전처리",
+    "stt": "🗣️ 음성 인식",
+    "llm_correction": "🔍 검수 LLM",
+    "tm": "📊 TM 교정",
+    "translation": "🌐 번역 LLM",
+    "fused": "🔀 검수+번역 LLM",
+}
+
+# 실행 모드별 처리 시간에서 빼는 단계 (입력이 들어오기 전 구간)
+INPUT_STAGES = ("audio_capture", "audio_preprocess", "stt")
+
+
+class Span:
+    """한 단계의 실행 구간
+
+    attributes에 prompt_tokens/completion_tokens/ttft 등을 채우면 함께 기록된다.
+    """
+
+    def __init__(self, stage, start=None):
+        self.stage = stage
+        self.start = start if start is not None else time.perf_counter()
+        self.end = None
+        self.attributes = {}
+
+    @property
+    def duration(self):
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def finish(self, end=None):
+        self.end = end if end is not None else time.perf_counter()
+        return self
+
+    def to_dict(self, origin):
+        record = {
+            "stage": self.stage,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+        }
+        record.update({key: value for key, value in self.attributes.items() if value is not None})
+        return record
+
+
+class Trace:
+    """요청 하나의 단계별 Span 모음 (여러 스레드에서 기록해도 됨)"""
+
+    def __init__(self, name="request", attributes=None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.wall_time = time.time()
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def span(self, stage):
+        """with trace.span("tm") as span: ... 형태로 쓰는 구간 기록기"""
+        return _SpanContext(self, stage)
+
+    def add_span(self, stage, duration, end=None, **attributes):
+        """이미 측정된 구간(예: 다른 스레드에서 잰 녹음 시간)을 추가"""
+        end = end if end is not None else time.perf_counter()
+        span = Span(stage, start=end - duration).finish(end)
+        span.attributes.update(attributes)
+        self._append(span)
+        return span
+
+    def _append(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def stage_totals(self):
+        """단계별 (횟수, 합계 초, 최대 초, 토큰 합계) — 파이프라인 모드처럼 같은 단계가 여러 번일 때 요약용"""
+        totals = collections.OrderedDict()
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        for span in spans:
+            if span.duration is None:
+                continue
+            count, total, longest, prompt_tokens, completion_tokens = totals.get(span.stage, (0, 0.0, 0.0, 0, 0))
+            totals[span.stage] = (
+                count + 1,
+                total + span.duration,
+                max(longest, span.duration),
+                prompt_tokens + (span.attributes.get("prompt_tokens") or 0),
+                completion_tokens + (span.attributes.get("completion_tokens") or 0),
+            )
+        return totals
+
+    @property
+    def duration(self):
+        return self._duration(())
+
+    @property
+    def processing_duration(self):
+        """녹음·음성 인식을 뺀 처리(검수 → 번역) 구간 시간 (실행 모드끼리 비교용)"""
+        return self._duration(INPUT_STAGES)
+
+    def _duration(self, excluded_stages):
+        with self._lock:
+            spans = [span for span in self.spans if span.stage not in excluded_stages]
+        ends = [span.end for span in spans if span.end is not None]
+        if not ends:
+            return 0.0
+        return max(ends) - min(span.start for span in spans)
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        # 녹음처럼 Trace 생성 전에 시작한 구간이 있으면 가장 이른 시작을 기준(0)으로
+        origin = min([self.origin] + [span.start for span in spans])
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.wall_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "spans": [span.to_dict(origin) for span in spans],
+        }
+
+
+class _SpanContext:
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.span = Span(stage)
+
+    def __enter__(self):
+        self.span.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.finish()
+        if exc_type is not None:
+            self.span.attributes["error"] = exc_type.__name__
+        self.trace._append(self.span)
+        return False
+
+
+def percentile(sorted_values, fraction):
+    """정렬된 값의 백분위수 (선형 보간)"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return sorted_values[lower]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class MetricsRegistry:
+    """단계별 최근 지연시간(롤링 윈도)과 누적 카운터 (프로세스 공용)"""
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, window=1000, jsonl_path=None, max_recent_traces=50):
+        self.window = window
+        self.jsonl_path = jsonl_path
+        self._durations = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._counts = collections.Counter()
+        self._sums = collections.Counter()
+        self._tokens = collections.Counter()  # (stage, "prompt"/"completion") -> 합계
+        self._mode_durations = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._recent = collections.deque(maxlen=max_recent_traces)
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        """끝난 Trace를 집계에 반영하고, 설정돼 있으면 JSONL 파일에 한 줄 추가"""
+        record = trace.to_dict()
+        with self._lock:
+            for span in trace.spans:
+                if span.duration is None:
+                    continue
+                self._durations[span.stage].append(span.duration)
+                self._counts[span.stage] += 1
+                self._sums[span.stage] += span.duration
+                self._tokens[(span.stage, "prompt")] += span.attributes.get("prompt_tokens") or 0
+                self._tokens[(span.stage, "completion")] += span.attributes.get("completion_tokens") or 0
+            mode = trace.attributes.get("execution_mode")
+            if mode and trace.processing_duration:
+                self._mode_durations[mode].append(trace.processing_duration)
+            self._recent.append(record)
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    def stage_percentiles(self):
+        """단계 -> {"count", "p50", "p95", "p99"} (초, 최근 window개 기준)"""
+        with self._lock:
+            snapshot = {stage: sorted(values) for stage, values in self._durations.items()}
+            counts = dict(self._counts)
+        result = {}
+        for stage, values in snapshot.items():
+            result[stage] = {"count": counts.get(stage, 0)}
+            for quantile in self.QUANTILES:
+                result[stage][f"p{int(quantile * 100)}"] = percentile(values, quantile)
+        return result
+
+    def mode_percentiles(self):
+        """실행 모드 -> {"count", "p50", "p95", "p99"} (요청당 처리 시간, 초)
+
+        같은 입력을 모드만 바꿔 보내면 순차/통합처럼 요청 구성이 다른 경로의 지연시간을 A/B로 비교할 수 있다.
+        """
+        with self._lock:
+            snapshot = {mode: sorted(values) for mode, values in self._mode_durations.items()}
+        result = {}
+        for mode, values in snapshot.items():
+            result[mode] = {"count": len(values)}
+            for quantile in self.QUANTILES:
+                result[mode][f"p{int(quantile * 100)}"] = percentile(values, quantile)
+        return result
+
+    def export_jsonl(self):
+        """최근 Trace들을 JSONL 문자열로"""
+        with self._lock:
+            records = list(self._recent)
+        return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+    def export_prometheus(self, prefix="stt_pipeline"):
+        """Prometheus 텍스트 노출 형식"""
+        percentiles = self.stage_percentiles()
+        with self._lock:
+            sums = dict(self._sums)
+            tokens = dict(self._tokens)
+
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds 단계별 지연시간 (최근 {self.window}건 기준 분위수)",
+            f"# TYPE {prefix}_stage_duration_seconds summary",
+        ]
+        for stage in sorted(percentiles):
+            values = percentiles[stage]
+            for quantile in self.QUANTILES:
+                value = values[f"p{int(quantile * 100)}"]
+                if value is not None:
+                    lines.append(f'{prefix}_stage_duration_seconds{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {sums.get(stage, 0.0):.6f}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {values["count"]}')
+
+        lines.append(f"# HELP {prefix}_tokens_total 단계별 누적 토큰 수")
+        lines.append(f"# TYPE {prefix}_tokens_total counter")
+        for (stage, kind), value in sorted(tokens.items()):
+            if not value:
+                continue
+            lines.append(f'{prefix}_tokens_total{{stage="{stage}",kind="{kind}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class ScriptRunStats:
+    """세션 하나의 스크립트 실행 횟수와 실행 시간 (종류별: "app"은 전체 실행, 그 밖은 fragment 이름)
+
+    mark()로 상호작용(버튼 클릭 등)이 시작될 때의 누적값을 남겨 두면 since(mark)로 그 뒤의 실행만 볼 수 있다.
+    상호작용이 끝날 때 finish_interaction(mark)을 부르면 그 상호작용의 실행 횟수·시간이 표본으로 남아
+    interaction_percentiles()로 상호작용당 분포를 볼 수 있다.
+    """
+
+    def __init__(self, window=200):
+        self._counts = collections.Counter()
+        self._seconds = collections.Counter()
+        self._durations = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._interactions = collections.deque(maxlen=window)  # 상호작용별 (실행 횟수, 합계 초)
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds):
+        with self._lock:
+            self._counts[kind] += 1
+            self._seconds[kind] += seconds
+            self._durations[kind].append(seconds)
+
+    def mark(self):
+        with self._lock:
+            return dict(self._counts), dict(self._seconds)
+
+    def since(self, mark):
+        """종류 -> (실행 횟수, 합계 초, 가장 긴 실행 초) (mark 이후)"""
+        counts, seconds = mark
+        with self._lock:
+            runs = {}
+            for kind, count in self._counts.items():
+                new_runs = count - counts.get(kind, 0)
+                if new_runs <= 0:
+                    continue
+                recent = list(self._durations[kind])[-new_runs:]
+                runs[kind] = (new_runs, self._seconds[kind] - seconds.get(kind, 0.0), max(recent))
+            return runs
+
+    def finish_interaction(self, mark):
+        """mark 이후의 실행을 상호작용 하나의 표본으로 남기고 since(mark) 결과를 반환"""
+        runs = self.since(mark)
+        with self._lock:
+            self._interactions.append((sum(count for count, _, _ in runs.values()),
+                                       sum(seconds for _, seconds, _ in runs.values())))
+        return runs
+
+    def interaction_percentiles(self):
+        """상호작용당 {"count", "runs_p50", "runs_p95", "seconds_p50", "seconds_p95"} (표본이 없으면 None)"""
+        with self._lock:
+            samples = list(self._interactions)
+        if not samples:
+            return None
+        runs = sorted(count for count, _ in samples)
+        seconds = sorted(total for _, total in samples)
+        return {"count": len(samples), "runs_p50": percentile(runs, 0.5), "runs_p95": percentile(runs, 0.95),
+                "seconds_p50": percentile(seconds, 0.5), "seconds_p95": percentile(seconds, 0.95)}
+
+    def percentiles(self):
+        """종류 -> {"count", "p50", "p95", "p99"} (실행 한 번의 시간, 초)"""
+        with self._lock:
+            snapshot = {kind: sorted(values) for kind, values in self._durations.items()}
+            counts = dict(self._counts)
+        result = {}
+        for kind, values in snapshot.items():
+            result[kind] = {"count": counts[kind]}
+            for quantile in MetricsRegistry.QUANTILES:
+                result[kind][f"p{int(quantile * 100)}"] = percentile(values, quantile)
+        return result
+
+
+def format_script_runs(runs):
+    """ScriptRunStats.since() 결과를 "전체 실행 1회 (35ms) · workspace 조각 12회 (48ms, 최대 9ms)" 형식으로"""
+    if not runs:
+        return "스크립트 실행 없음"
+    parts = []
+    for kind, (count, seconds, longest) in sorted(runs.items(), key=lambda item: item[0] != "app"):
+        label = "전체 실행" if kind == "app" else f"{kind} 조각"
+        parts.append(f"{label} {count}회 ({seconds * 1000:.0f}ms, 최대 {longest * 1000:.0f}ms)")
+    count = sum(count for count, _, _ in runs.values())
+    total = sum(seconds for _, seconds, _ in runs.values())
+    return " · ".join(parts) + f" · 합계 {count}회 {total * 1000:.0f}ms"
+
+
+def format_script_run_percentiles(stats):
+    """세션 전체 기준 상호작용당 실행 횟수·시간 p50/p95와 실행 종류별 p50/p95 (실행 한 번의 시간)"""
+    lines = []
+    interactions = stats.interaction_percentiles()
+    if interactions is not None:
+        lines.append(f"상호작용당 (n={interactions['count']}): 실행 p50 {interactions['runs_p50']:.0f}회 / "
+                     f"p95 {interactions['runs_p95']:.0f}회 · 스크립트 시간 p50 {interactions['seconds_p50'] * 1000:.0f}ms / "
+                     f"p95 {interactions['seconds_p95'] * 1000:.0f}ms")
+    for kind, values in sorted(stats.percentiles().items(), key=lambda item: item[0] != "app"):
+        label = "전체 실행" if kind == "app" else f"{kind} 조각"
+        lines.append(f"{label} (n={values['count']}): p50 {values['p50'] * 1000:.0f}ms / p95 {values['p95'] * 1000:.0f}ms")
+    return "\n".join(lines)
+
+
+def format_trace_breakdown(trace):
+    """Trace를 디버깅 패널용 단계별 지연시간 문자열로"""
+    lines = []
+    with trace._lock:
+        spans = list(trace.spans)
+    for stage, (count, total, longest, prompt_tokens, completion_tokens) in trace.stage_totals().items():
+        label = STAGE_LABELS.get(stage, stage)
+        if count == 1:
+            span = next(s for s in spans if s.stage == stage and s.end is not None)
+            line = f"{label}: {total * 1000:.1f}ms"
+            if span.attributes.get("cache"):
+                line += f" (캐시: {span.attributes['cache']})"
+            elif span.attributes.get("ttft") is not None and span.attributes.get("ttft") < total:
+                line += f" (첫 토큰 {span.attributes['ttft'] * 1000:.1f}ms)"
+        else:
+            line = f"{label} ×{count}: 합계 {total * 1000:.1f}ms (최대 {longest * 1000:.1f}ms)"
+        if prompt_tokens or completion_tokens:
+            line += f" · 토큰 {prompt_tokens}→{completion_tokens}"
+        lines.append(line)
+    lines.append(f"⏱️ 전체: {trace.duration * 1000:.1f}ms")
+    return "\n".join(lines)
+
+
+def format_stage_percentiles(registry):
+    """단계별 p50/p95/p99 문자열"""
+    lines = []
+    for stage, values in registry.stage_percentiles().items():
+        if not values["count"]:
+            continue
+        label = STAGE_LABELS.get(stage, stage)
+        lines.append(f"{label} (n={values['count']}): p50 {values['p50'] * 1000:.0f}ms / "
+                     f"p95 {values['p95'] * 1000:.0f}ms / p99 {values['p99'] * 1000:.0f}ms")
+    for mode, values in registry.mode_percentiles().items():
+        lines.append(f"⏱️ {mode} 모드 처리 (n={values['count']}): p50 {values['p50'] * 1000:.0f}ms / "
+                     f"p95 {values['p95'] * 1000:.0f}ms / p99 {values['p99'] * 1000:.0f}ms")
+    return "\n".join(lines)
@@ -0,0 +1,195 @@
+"""로컬 테스트용 OpenAI 호환 Chat Completions 목 서버
+
+실제 API 대신 정해진 지연시간(+흔들림)과 오류율로 응답한다. 검수 요청은 입력 텍스트를 그대로,
+번역 요청은 "[EN] <텍스트>"(다른 언어는 "[Japanese] <텍스트>"처럼 언어 이름)를 돌려주므로 결과 흐름만 확인할 수 있다. stream=True도 지원한다.
+response_format이 JSON이면(통합 모드) {"corrected": 입력, "translation": "[EN] 입력"}을 돌려준다.
+
+    python mock_openai_server.py --port 8000 --latency 0.5 --jitter 0.2 --error-rate 0.05
+    python batch.py transcripts.csv -o results.jsonl --base-url http://127.0.0.1:8000/v1
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRANSLATION_PATTERN = re.compile(r"^Translate the following text to ([^:]+): ", re.DOTALL)
+TRANSCRIPTION_MARKER = "## Origin Transcription:\n"
+
+
+def mock_reply(messages, response_format=None):
+    """요청 메시지에서 결정적인 응답 텍스트 생성"""
+    user_content = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    translation = TRANSLATION_PATTERN.match(user_content)
+    if translation:
+        language = translation.group(1)
+        return f"[{'EN' if language == 'English' else language}] " + user_content[translation.end():]
+    if TRANSCRIPTION_MARKER in user_content:
+        user_content = user_content.split(TRANSCRIPTION_MARKER, 1)[1].split("\n\n##", 1)[0].strip()
+    if (response_format or {}).get("type") == "json_object":
+        return json.dumps({"corrected": user_content, "translation": "[EN] " + user_content}, ensure_ascii=False)
+    return user_content
+
+
+class MockSettings:
+    """서버 동작 설정 (요청 스레드들이 공유)"""
+
+    def __init__(self, latency=0.3, jitter=0.1, error_rate=0.0, first_token_latency=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # 스트리밍 시 첫 토큰까지의 지연 (없으면 전체 지연의 30%)
+        self.first_token_latency = first_token_latency
+        self.request_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """(이번 요청의 지연시간, 오류 여부)"""
+        with self._lock:
+            self.request_count += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+        return delay, failed
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = MockSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+
+        delay, failed = self.settings.sample()
+        if failed:
+            time.sleep(delay / 2)
+            self._send_json(503, {"error": {"message": "mock overloaded", "type": "server_error"}})
+            return
+
+        model = request.get("model", "mock")
+        text = mock_reply(request.get("messages", []), request.get("response_format"))
+        prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 2
+        completion_tokens = max(1, len(text) // 2)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not request.get("stream"):
+            time.sleep(delay)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+            return
+
+        first_token_delay = self.settings.first_token_latency
+        if first_token_delay is None:
+            first_token_delay = delay * 0.3
+        pieces = [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+        per_piece_delay = max(0.0, delay - first_token_delay) / len(pieces)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            time.sleep(first_token_delay)
+            for index, piece in enumerate(pieces):
+                if index:
+                    time.sleep(per_piece_delay)
+                self._write_event({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                })
+            self._write_event({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            })
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self._write_event({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens},
+                })
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 먼저 끊은 요청 (헤징에서 진 요청, 마감 초과 등)
+            pass
+
+    def _write_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def start_server(host="127.0.0.1", port=0, settings=None):
+    """백그라운드 스레드로 서버 시작. (서버, base_url) 반환"""
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"settings": settings or MockSettings()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 호환 목 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.3, help="평균 응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="지연 흔들림 폭(초, ±)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 응답 비율 (0~1)")
+    parser.add_argument("--first-token-latency", type=float, default=None, help="스트리밍 첫 토큰 지연(초)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.jitter, args.error_rate, args.first_token_latency, args.seed)
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"settings": settings})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    print(f"목 서버 실행 중: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""검수 → TM → 번역 파이프라인 실행 방식
+
+Streamlit에 의존하지 않으며, 각 단계 함수는 호출하는 쪽에서 넘겨준다.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 문장 부호(또는 줄바꿈)까지를 한 문장으로 본다
+# 마침표·물음표·느낌표는 뒤에 공백이나 텍스트 끝이 와야 문장 끝으로 본다 ("3.5조원", "v1.2"는 나누지 않음)
+SENTENCE_PATTERN = re.compile(r'\S.*?(?:[。！？]+["\'”’)\]]*|[.!?]+["\'”’)\]]*(?=\s|$)|(?=\n)|$)')
+
+
+def split_sentences(text, with_separators=False):
+    """텍스트를 문장 단위 구간으로 분리 (빈 구간 제외)
+
+    with_separators=True면 (구간 목록, 구간마다 뒤따르던 원래 구분자 목록)을 반환한다.
+    구분자 목록을 join_segments에 넘기면 원래 띄어쓰기·줄바꿈대로 다시 이어 붙인다.
+    """
+    matches = list(SENTENCE_PATTERN.finditer(text or ""))
+    segments = [match.group().rstrip() for match in matches]
+    # 구간 끝부터 다음 구간 시작까지가 구분자 (마지막 구간 뒤는 없음)
+    separators = [text[match.start() + len(segment):following.start()]
+                  for match, segment, following in zip(matches, segments, matches[1:])]
+    separators += [""] * (len(segments) - len(separators))
+    return (segments, separators) if with_separators else segments
+
+
+def chunk_sentences(text, max_chars=200, with_separators=False):
+    """문장 단위로 나눈 뒤 이웃 문장을 max_chars 글자까지 묶은 구간 목록
+
+    문장마다 요청을 보내면 요청 수와 프롬프트 반복이 늘어나므로 적당한 크기로 묶는다.
+    max_chars보다 긴 문장은 자르지 않고 그대로 한 구간이 된다. 묶인 문장 사이는 원래 구분자를 유지하며,
+    with_separators=True면 split_sentences처럼 구간 사이 구분자 목록도 함께 반환한다.
+    """
+    chunks = []
+    chunk_separators = []
+    current = ""
+    for sentence, separator in zip(*split_sentences(text, with_separators=True)):
+        if current and len(current) + len(chunk_separators[-1]) + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        if current:
+            current += chunk_separators.pop() + sentence
+        else:
+            current = sentence
+        chunk_separators.append(separator)
+    if current:
+        chunks.append(current)
+    return (chunks, chunk_separators) if with_separators else chunks
+
+
+def join_segments(segments, separators=None):
+    """구간 결과를 원래 순서대로 이어 붙임 (실패한 구간은 건너뜀)
+
+    separators(split_sentences의 구분자 목록)가 주어지면 구간 뒤에 원래 구분자를, 없으면 공백을 붙인다.
+    """
+    parts = []
+    separator = ""
+    for index, segment in enumerate(segments):
+        if segment:
+            parts.append(separator + segment if parts else segment)
+            separator = separators[index] if separators is not None else " "
+    return "".join(parts)
+
+
+class SegmentResult:
+    """문장 구간 하나의 단계별 결과"""
+
+    def __init__(self, source):
+        self.source = source
+        self.corrected = None
+        self.tm_corrected = None
+        self.translated = None
+        self.translations = {}  # 추가 언어 번역 {언어 코드: 번역}
+
+
+def run_pipelined(segments, correct, translate, apply_tm=None, max_translation_workers=4,
+                  thread_initializer=None, on_segment=None, translate_extra=None):
+    """문장 구간을 단계별로 흘려보내며 처리
+
+    검수는 호출한 스레드에서 구간 순서대로 진행하고, 검수가 끝난 구간은 곧바로 번역 스레드로 넘긴다.
+    따라서 k번째 구간의 번역과 k+1번째 구간의 검수가 겹쳐서 실행된다.
+    translate_extra(텍스트)가 주어지면 추가 언어 번역({언어 코드: 번역})도 같은 번역 스레드에서 동시에 구해
+    result.translations에 담는다.
+    결과는 입력 순서대로 반환하며, on_segment(index, result)는 항상 호출한 스레드에서 불린다.
+    segments는 제너레이터여도 되므로, 음성 인식 구간처럼 도착하는 대로 흘려보낼 수 있다.
+    """
+    results = []
+    pending = {}
+
+    def drain(block):
+        # 끝난 번역 결과를 수거해 알림 (block=True면 남은 것을 순서대로 모두 기다림)
+        for index in sorted(pending):
+            futures = pending[index]
+            if not block and not all(future.done() for future in futures):
+                continue
+            results[index].translated = futures[0].result()
+            if len(futures) > 1:
+                results[index].translations = futures[1].result()
+            del pending[index]
+            if on_segment:
+                on_segment(index, results[index])
+
+    with ThreadPoolExecutor(max_workers=max_translation_workers, initializer=thread_initializer) as executor:
+        for index, segment in enumerate(segments):
+            result = SegmentResult(segment)
+            results.append(result)
+            result.corrected = correct(result.source)
+            if result.corrected:
+                result.tm_corrected = apply_tm(result.corrected) if apply_tm else result.corrected
+                pending[index] = [executor.submit(translate, result.tm_corrected)]
+                if translate_extra is not None:
+                    pending[index].append(executor.submit(translate_extra, result.tm_corrected))
+            if on_segment:
+                on_segment(index, result)
+            drain(block=False)
+        drain(block=True)
+
+    return results
+
+
+def fan_out(items, func, max_workers=8, thread_initializer=None, on_result=None):
+    """items마다 func(item)을 동시에 실행해 {item: 결과}를 items 순서대로 반환
+
+    여러 언어 번역처럼 서로 독립인 요청을 한꺼번에 보내므로 전체 지연시간은 가장 느린 항목 수준이 된다.
+    on_result(item, result)는 끝나는 순서대로 호출한 스레드에서 불린다.
+    """
+    items = list(items)
+    results = {}
+    if not items:
+        return results
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items)), initializer=thread_initializer) as executor:
+        futures = {executor.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            results[item] = future.result()
+            if on_result:
+                on_result(item, results[item])
+    return {item: results[item] for item in items}
+
+
+def run_concurrent(segments, correct, translate, apply_tm=None, max_workers=4, thread_initializer=None,
+                   on_segment=None):
+    """구간마다 검수 → TM → 번역을 독립적으로 동시에 처리 (동시 실행 수는 max_workers로 제한)
+
+    구간끼리 기다리지 않으므로 전체 지연시간은 구간별 지연의 합이 아니라 가장 느린 구간 수준이 된다.
+    결과는 입력 순서대로 반환하며, on_segment(index, result)는 구간이 끝나는 순서대로 호출한 스레드에서 불린다.
+    """
+    results = [SegmentResult(segment) for segment in segments]
+
+    def process(result):
+        result.corrected = correct(result.source)
+        if result.corrected:
+            result.tm_corrected = apply_tm(result.corrected) if apply_tm else result.corrected
+            result.translated = translate(result.tm_corrected)
+        return result
+
+    if not results:
+        return results
+    with ThreadPoolExecutor(max_workers=max_workers, initializer=thread_initializer) as executor:
+        futures = {executor.submit(process, result): index for index, result in enumerate(results)}
+        for future in as_completed(futures):
+            future.result()
+            if on_segment:
+                on_segment(futures[future], results[futures[future]])
+
+    return results
+
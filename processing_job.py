@@ -0,0 +1,91 @@
+"""세션별 검수/번역 작업
+
+검수 → TM → 번역은 작업 스레드에서 진행하고, 스크립트 스레드는 작업을 시작만 한 뒤 진행 상황을 다시 그린다.
+작업은 중간 결과를 update()로 남기고, 화면 쪽은 작업이 도는 동안 주기적으로 snapshot()을 그린다.
+그래서 처리하는 동안 스크립트 전체를 다시 실행하지 않고 결과 영역만 갱신할 수 있다.
+"""
+import threading
+import time
+
+
+class ProcessingJob:
+    """세션 하나의 검수/번역 작업 상태 (한 번에 하나만 실행)
+
+    start(work)는 작업 스레드에서 work(job)을 실행하고 바로 반환한다. 반환값은 result, 예외는 error에 남는다.
+    version은 중간 결과가 바뀌거나 작업이 끝날 때마다 1씩 늘어난다.
+    """
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._done_event = threading.Event()
+        self._done_event.set()
+        self._thread = None
+        self.run_id = 0
+        self._reset()
+
+    def _reset(self):
+        self.partials = {}  # 키("correction", "translation", 언어 코드) -> 지금까지의 결과
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+
+    @property
+    def is_active(self):
+        return not self._done_event.is_set()
+
+    @property
+    def seconds(self):
+        """시작 ~ 끝 (진행 중이면 지금까지, 초)"""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def start(self, work, initializer=None):
+        """작업 시작 (이미 실행 중이면 무시하고 False). initializer는 작업 스레드에서 work보다 먼저 호출"""
+        with self._changed:
+            if self.is_active:
+                return False
+            self._reset()
+            self.run_id += 1
+            self.started_at = time.perf_counter()
+            self._done_event.clear()
+            self._thread = threading.Thread(target=self._run, args=(work, initializer), daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, work, initializer):
+        try:
+            if initializer is not None:
+                initializer()
+            self.result = work(self)
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._changed:
+                self.finished_at = time.perf_counter()
+                self.version += 1
+                self._done_event.set()
+                self._changed.notify_all()
+
+    def update(self, key, text):
+        """중간 결과 갱신 (작업 스레드에서 호출)"""
+        with self._changed:
+            self.partials[key] = text
+            self.version += 1
+            self._changed.notify_all()
+
+    def snapshot(self):
+        """(version, 중간 결과 사본)"""
+        with self._changed:
+            return self.version, dict(self.partials)
+
+    def wait_for_update(self, version, timeout=None):
+        """version 이후 바뀐 것이 있을 때까지 대기. 바뀌었으면 True"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.version != version, timeout)
+
+    def wait(self, timeout=None):
+        """작업이 끝날 때까지 대기. 끝났으면 True"""
+        return self._done_event.wait(timeout)
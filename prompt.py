@@ -1,15 +1,66 @@
 import streamlit as st
-import pandas as pd
 import speech_recognition as sr
-import openai
 import threading
 import time
 import json
+import os
+from contextlib import contextmanager
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+from audio_preprocess import AudioPreprocessor, format_preprocess_report
+from glossary import fill_glossary
+from llm import (DEFAULT_MODEL, FUSED_TOKEN_RATIO, JSON_RESPONSE_FORMAT, TRANSLATION_TOKEN_RATIO,
+                 adaptive_max_tokens, chat_completion)
+from llm_cache import LLMCache
+from llm_client import PoolConfig, SharedOpenAIClients
+from metrics import (MetricsRegistry, ScriptRunStats, Trace, format_script_run_percentiles, format_script_runs,
+                     format_stage_percentiles, format_trace_breakdown)
+from pipeline import chunk_sentences, fan_out, join_segments, run_concurrent, run_pipelined, split_sentences
+from processing_job import ProcessingJob
+from prompts import (DEFAULT_SYSTEM_PROMPT, DEFAULT_TRANSLATION_LANGUAGE, DEFAULT_USER_PROMPT_TEMPLATE,
+                     TRANSLATION_LANGUAGES, build_correction_messages, build_fused_messages, build_translation_messages,
+                     build_user_prompt, parse_fused_reply)
+from recording import NoiseCalibrationCache, RecordingController
+from request_policy import DeadlineExceeded, RequestPolicy
+from routing import RoutingPolicy, route_correction, tm_resolves
+from scheduler import (FairScheduler, QueueTimeout, SchedulerOverloaded, export_scheduler_prometheus,
+                       format_scheduler_stats)
+from stt import create_recognizer, recognizer_available
+from tm_matcher import TMMatcher, correct_with_tm, term_constraints
+from tm_store import TMLibrary
+
+# OpenAI 연결 풀 설정 (모든 세션이 같은 풀을 공유)
+OPENAI_POOL_CONFIG = PoolConfig(
+    max_connections=20,
+    max_keepalive_connections=10,
+    keepalive_expiry=60.0,
+    connect_timeout=5.0,
+    read_timeout=60.0,
+    # 재시도는 요청 정책(get_request_policy)이 마감 시간 안에서 직접 관리
+    max_retries=0
+)
+
+
+# 처리 작업 스레드에서도 부르는 공용 자원은 로딩 표시(spinner)를 끔 (스크립트 실행 밖에서 빈 요소를 그리지 않도록)
+@st.cache_resource(show_spinner=False)
+def get_openai_clients(api_key):
+    """재실행·세션 간에 공유하는 OpenAI 클라이언트 (프로세스당 1개, 연결 풀 유지)"""
+    return SharedOpenAIClients(api_key, config=OPENAI_POOL_CONFIG)
+
+
+def format_connection_stats():
+    """연결 재사용 통계를 디버깅 표시용 문자열로 변환"""
+    stats = get_openai_clients(api_key).stats.snapshot()
+    return (f"요청 {stats['requests']}회 · 새 TCP 연결 {stats['new_connections']}회 · "
+            f"TLS 핸드셰이크 {stats['tls_handshakes']}회 · 연결 재사용률 {stats['reuse_rate'] * 100:.1f}%")
+
 
 # OpenAI API 키를 Streamlit Secrets에서 안전하게 가져오기
 try:
     api_key = st.secrets["OPENAI_API_KEY"]
-    client = openai.OpenAI(api_key=api_key)
+    client = get_openai_clients(api_key).sync
 except KeyError:
     st.error("🔑 OpenAI API 키가 설정되지 않았습니다. Streamlit Secrets에 'OPENAI_API_KEY'를 추가해주세요.")
     st.info("💡 **설정 방법:**\n1. Streamlit Cloud 대시보드에서 앱 설정으로 이동\n2. Secrets 탭에서 다음과 같이 추가:\n```\nOPENAI_API_KEY = \"your-api-key-here\"\n```")
@@ -18,176 +69,823 @@ except Exception as e:
     st.error(f"API 키 설정 중 오류 발생: {e}")
     st.stop()
 
-# 전역 변수로 녹음 상태 관리
-recording_audio = None
-stop_recording = False
+# TM 모음 저장소 (SQLite 파일에 영속, 세션은 고른 모음의 이름만 보관)
+TM_STORE_PATH = os.environ.get("TM_STORE_PATH", os.path.join(".cache", "tm_store.sqlite3"))
+TM_IMPORT_MERGE = "병합"
+TM_IMPORT_REPLACE = "교체"
+TM_IMPORT_MODES = [TM_IMPORT_MERGE, TM_IMPORT_REPLACE]
 
-def recognize_speech_with_interrupt():
-    """자동 종료 + 수동 종료 가능한 음성 인식"""
-    global recording_audio, stop_recording
-    recording_audio = None  # 초기화
-    stop_recording = False  # 초기화
-    recognizer = sr.Recognizer()
-    
-    # 음성 인식 설정 조정 (말 끝남 감지 개선)
-    recognizer.pause_threshold = 1.5  # 1.5초 정도 멈추면 종료
-    recognizer.energy_threshold = 300  # 소음 임계값 조정
-    recognizer.non_speaking_duration = 0.8  # 말하지 않는 시간 조정 (더 짧게)
-    
-    def listen_in_background():
-        global recording_audio, stop_recording
-        try:
-            with sr.Microphone() as source:
-                recognizer.adjust_for_ambient_noise(source, duration=1)
-                try:
-                    # 자동 종료 모드로 녹음 (말 끝남 감지 개선)
-                    recording_audio = recognizer.listen(source, timeout=3, phrase_time_limit=30)
-                except sr.WaitTimeoutError:
-                    # 타임아웃 발생 시 수동 종료 모드로 전환
-                    try:
-                        recording_audio = recognizer.listen(source, timeout=30, phrase_time_limit=60)
-                    except Exception as e:
-                        pass
-        except Exception as e:
-            pass
+
+@st.cache_resource(show_spinner=False)
+def get_tm_library():
+    """TM 모음 저장소 (프로세스당 1개, 모음별 색인은 처음 쓸 때만 만들고 이후에는 바뀐 항목만 반영)"""
+    return TMLibrary(TM_STORE_PATH)
+
+
+def get_active_tm():
+    """현재 세션이 고른 TM 모음 (고르지 않았거나 비었거나 이 세션에서 TM 교정을 껐으면 None)"""
+    collection = st.session_state.get('tm_collection')
+    if collection is None or not st.session_state.get('tm_enabled', True):
+        return None
+    store = get_tm_library().get(collection)
+    return store if store is not None and len(store) else None
+
+
+# TM 근사 일치 교정 허용 거리 (자모 편집 거리, 0이면 발음이 같은 표기만)
+FUZZY_TM_OFF = "끄기"
+FUZZY_TM_DISTANCES = [FUZZY_TM_OFF, 0, 1, 2]
+FUZZY_TM_DEFAULT_DISTANCE = 1
+
+
+# LLM 응답 캐시 설정 (모든 세션 공유, SQLite 파일에 영속)
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+LLM_CACHE_MAX_MEMORY_ENTRIES = 1024
+LLM_CACHE_MAX_DISK_ENTRIES = 100000
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_cache():
+    """모든 세션이 공유하는 LLM 응답 캐시 (프로세스당 1개)"""
+    return LLMCache(
+        LLM_CACHE_PATH,
+        max_memory_entries=LLM_CACHE_MAX_MEMORY_ENTRIES,
+        max_disk_entries=LLM_CACHE_MAX_DISK_ENTRIES,
+        ttl_seconds=LLM_CACHE_TTL_SECONDS
+    )
+
+
+def format_llm_cache_stats():
+    """캐시 적중/미스 카운터를 디버깅 표시용 문자열로 변환"""
+    stats = get_llm_cache().stats()
+    hits = stats["memory_hits"] + stats["disk_hits"] + stats["coalesced"]
+    requests = hits + stats["misses"]
+    hit_rate = hits / requests * 100 if requests else 0.0
+    return (f"적중 {hits}회 (메모리 {stats['memory_hits']} / 디스크 {stats['disk_hits']} / 동시요청 합류 {stats['coalesced']})"
+            f" · 미스 {stats['misses']}회 · 적중률 {hit_rate:.1f}%\n"
+            f"저장 항목: 메모리 {stats['memory_entries']}개 / 디스크 {stats['disk_entries']}개 · 제거 {stats['memory_evictions'] + stats['disk_evictions']}회")
+
+
+# 단계별 지연시간 집계 설정 (환경 변수로 파일 내보내기 경로 지정)
+METRICS_WINDOW = 1000
+METRICS_JSONL_PATH = os.environ.get("METRICS_JSONL_PATH")
+METRICS_PROMETHEUS_PATH = os.environ.get("METRICS_PROMETHEUS_PATH")
+
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_registry():
+    """모든 세션이 공유하는 단계별 지연시간 집계 (프로세스당 1개)"""
+    return MetricsRegistry(window=METRICS_WINDOW, jsonl_path=METRICS_JSONL_PATH)
+
+
+# 프로세스 공용 스케줄러: 동시에 보내는 요청 수, 모든 세션이 나눠 쓰는 초당 요청 수(0이면 제한 없음)와 몰아 보낼 수 있는 수,
+# 전체/세션당 대기열 한도 (넘으면 기다리지 않고 바로 거절)
+LLM_MAX_CONCURRENT = int(os.environ.get("LLM_MAX_CONCURRENT", "16"))
+LLM_RATE_LIMIT = float(os.environ.get("LLM_RATE_LIMIT", "8"))
+LLM_RATE_BURST = 16
+STT_MAX_CONCURRENT = int(os.environ.get("STT_MAX_CONCURRENT", "4"))
+STT_RATE_LIMIT = float(os.environ.get("STT_RATE_LIMIT", "0"))
+SCHEDULER_MAX_QUEUE = 200
+SCHEDULER_MAX_QUEUE_PER_SESSION = 32
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_scheduler():
+    """모든 세션의 LLM 요청이 슬롯을 받는 스케줄러 (프로세스당 1개)"""
+    return FairScheduler("LLM", LLM_MAX_CONCURRENT, rate=LLM_RATE_LIMIT or None, burst=LLM_RATE_BURST,
+                         max_queue=SCHEDULER_MAX_QUEUE, max_queue_per_session=SCHEDULER_MAX_QUEUE_PER_SESSION,
+                         window=METRICS_WINDOW)
+
+
+@st.cache_resource(show_spinner=False)
+def get_stt_scheduler():
+    """모든 세션의 음성 인식 요청이 슬롯을 받는 스케줄러 (프로세스당 1개)"""
+    return FairScheduler("STT", STT_MAX_CONCURRENT, rate=STT_RATE_LIMIT or None,
+                         max_queue=SCHEDULER_MAX_QUEUE, max_queue_per_session=SCHEDULER_MAX_QUEUE_PER_SESSION,
+                         window=METRICS_WINDOW)
+
+
+def get_session_id():
+    """스케줄러가 공정하게 나눌 단위인 Streamlit 세션 ID (스크립트 컨텍스트를 붙인 작업 스레드에서도 동작)"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "local"
+
+
+def export_prometheus_metrics():
+    """단계별 지연시간과 스케줄러 대기열 지표를 합친 Prometheus 텍스트"""
+    return (get_metrics_registry().export_prometheus()
+            + export_scheduler_prometheus([get_llm_scheduler(), get_stt_scheduler()]))
+
+
+# LLM 요청 정책: 단계별 마감 시간(초, 재시도·헤징 포함), 재시도 횟수, 헤징 지연 하한과 p95를 믿을 최소 표본 수
+STAGE_DEADLINES = {"llm_correction": 20.0, "translation": 20.0, "fused": 30.0}
+REQUEST_MAX_RETRIES = 2
+HEDGE_MIN_DELAY = 0.3
+HEDGE_MIN_SAMPLES = 20
+# 요청 정책 보고에 스케줄러 대기를 따로 알릴 최소 대기 시간(초)
+QUEUE_WAIT_REPORT_MIN = 0.05
+
+
+def get_request_policy(stage):
+    """단계별 요청 정책 (헤징을 켰으면 최근 p95가 지나도 응답이 없을 때 같은 요청을 하나 더 보냄)
+
+    요청은 모두 공용 LLM 스케줄러에서 이 세션 몫의 슬롯을 받은 뒤에 나간다.
+    """
+    hedge_delay = None
+    if st.session_state.get('request_hedging', False):
+        values = get_metrics_registry().stage_percentiles().get(stage)
+        if values and values["count"] >= HEDGE_MIN_SAMPLES:
+            hedge_delay = max(HEDGE_MIN_DELAY, values["p95"])
+    return RequestPolicy(deadline=STAGE_DEADLINES.get(stage), max_retries=REQUEST_MAX_RETRIES, hedge_delay=hedge_delay,
+                         admission=get_llm_scheduler().for_session(get_session_id()))
+
+
+def record_request_error(action, error, timing=None):
+    """LLM 요청 실패를 timing(dict)에 기록 (작업 스레드에서 불리므로 화면에는 처리가 끝난 뒤 결과와 함께 표시)"""
+    if timing is None:
+        return
+    timing["error"] = type(error).__name__
+    if isinstance(error, (DeadlineExceeded, QueueTimeout)):
+        timing["error_message"] = f"⏱️ {action} 시간 초과: {error}"
+    elif isinstance(error, SchedulerOverloaded):
+        timing["error_message"] = f"🚦 요청이 많아 {action}을(를) 처리하지 못했습니다. 잠시 후 다시 시도해 주세요."
+    else:
+        timing["error_message"] = f"{action} 실패: {error}"
+
+
+def request_error_messages(trace):
+    return [span.attributes["error_message"] for span in trace.spans if span.attributes.get("error_message")]
+
+
+def format_request_policy_report(trace):
+    """재시도·헤징·시간 초과·스케줄러 대기가 있었던 요청 수 (없으면 None)"""
+    spans = [span for span in trace.spans if span.stage in STAGE_DEADLINES]
+    retries = sum(span.attributes.get("retries") or 0 for span in spans)
+    hedged = sum(1 for span in spans if span.attributes.get("hedged"))
+    hedge_won = sum(1 for span in spans if span.attributes.get("hedge_won"))
+    errors = sum(1 for span in spans if span.attributes.get("error"))
+    queue_wait = sum(span.attributes.get("queue_wait") or 0.0 for span in spans)
+    if not (retries or hedged or errors or queue_wait >= QUEUE_WAIT_REPORT_MIN):
+        return None
+    return (f"재시도 {retries}회 · 헤징 {hedged}회 (중복 요청이 먼저 응답 {hedge_won}회) · 실패/시간 초과 {errors}회"
+            f" · 대기열 대기 {queue_wait:.2f}초")
+
+
+def record_trace(trace):
+    """끝난 요청의 Trace를 집계에 반영하고, 설정돼 있으면 Prometheus 텍스트 파일 갱신"""
+    registry = get_metrics_registry()
+    registry.record(trace)
+    if METRICS_PROMETHEUS_PATH:
+        # node_exporter textfile 수집기가 쓰다 만 파일을 읽지 않도록 바꿔치기
+        temp_path = METRICS_PROMETHEUS_PATH + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(export_prometheus_metrics())
+        os.replace(temp_path, METRICS_PROMETHEUS_PATH)
+
+
+# 음성 인식 엔진 기본값 ("google", 오프라인 "whisper" 또는 테스트용 "stub")
+STT_BACKEND = os.environ.get("STT_BACKEND", "google")
+STT_BACKEND_LABELS = {"google": "Google (온라인)", "whisper": "Whisper (오프라인 CPU)", "stub": "테스트용 stub"}
+# 네트워크 없이 로컬에서 인식하는 엔진 (업로드가 없으므로 FLAC 인코딩을 생략)
+OFFLINE_STT_BACKENDS = ("whisper", "stub")
+# 엔진별 생성 옵션
+STT_BACKEND_OPTIONS = {
+    "whisper": {
+        "model_size": os.environ.get("STT_WHISPER_MODEL", "small"),
+        "compute_type": os.environ.get("STT_WHISPER_COMPUTE_TYPE", "int8"),
+        "cpu_threads": int(os.environ.get("STT_WHISPER_THREADS", "0")),
+    },
+}
+STT_MODES = ["일괄", "스트리밍"]
+
+# 인식 전 오디오 전처리 (16kHz 모노 16bit로 낮추고 앞뒤 무음을 잘라 FLAC으로 한 번만 인코딩)
+AUDIO_PREPROCESSOR = AudioPreprocessor()
+OFFLINE_AUDIO_PREPROCESSOR = AudioPreprocessor(encode=False)
+
+
+def get_stt_backends():
+    """화면에서 고를 수 있는 음성 인식 엔진 (설치되지 않은 엔진과, 기본값이 아닌 stub은 제외)"""
+    return [name for name in STT_BACKEND_LABELS
+            if recognizer_available(name) and (name != "stub" or STT_BACKEND == "stub")]
+
+
+def get_stt_backend():
+    """이 세션에서 고른 음성 인식 엔진 이름"""
+    backends = get_stt_backends()
+    backend = st.session_state.get('stt_backend', STT_BACKEND)
+    return backend if backend in backends else backends[0]
+
+
+@st.cache_resource(show_spinner="음성 인식 엔진을 불러오는 중입니다...")
+def get_speech_recognizer(backend_name):
+    """음성 인식 엔진 (프로세스당 1개, 오프라인 모델도 한 번만 불러와 계속 씀)"""
+    return create_recognizer(backend_name, **STT_BACKEND_OPTIONS.get(backend_name, {}))
+
+
+@st.cache_resource
+def get_noise_calibration_cache():
+    """입력 장치별 주변 소음 보정값 캐시 (프로세스당 1개)"""
+    return NoiseCalibrationCache(ttl_seconds=300)
+
+
+def get_recording_controller():
+    """현재 세션의 녹음 컨트롤러 (세션마다 따로 두어 다른 사용자의 녹음과 섞이지 않음)"""
+    if 'recording_controller' not in st.session_state:
+        st.session_state.recording_controller = RecordingController(
+            get_speech_recognizer(get_stt_backend()), get_noise_calibration_cache())
+    return st.session_state.recording_controller
+
+
+def make_segment_consumer(active_tm, live_results, trace):
+    """녹음 작업 스레드에서 인식 구간마다 검수 → TM → 번역을 진행하는 함수
+
+    작업 스레드에는 지금(스크립트 스레드)의 스크립트 컨텍스트를 붙여 번역 요청 정책 등 세션 값을 읽게 하고,
+    검수에 쓰는 값은 미리 꺼내 둔다.
+    진행 중인 구간 결과는 live_results(dict)에, 단계별 지연시간은 trace에 기록한다.
+    """
+    system_prompt = st.session_state.saved_system_prompt
+    user_prompt_template = st.session_state.saved_user_prompt_template
+    fuzzy_distance = get_fuzzy_distance()
+    llm_cache = get_llm_cache()
+    routing = get_routing_policy()
+    correction_policy = get_request_policy("llm_correction")
+    extra_languages = get_extra_languages()
+    attach_context = script_thread_initializer()
     
-    # 백그라운드에서 녹음 시작
-    listen_thread = threading.Thread(target=listen_in_background)
-    listen_thread.daemon = True
-    listen_thread.start()
+    def correct(segment):
+        with trace.span("llm_correction") as span:
+            try:
+                messages = build_correction_messages(fill_glossary_prompt(system_prompt, active_tm, segment, span),
+                                                     build_user_prompt(user_prompt_template, segment))
+                max_tokens = adaptive_max_tokens(segment)
+                if routing is None:
+                    result = chat_completion(client, messages, max_tokens=max_tokens, cache=llm_cache,
+                                             policy=correction_policy)
+                else:
+                    result, decision = route_correction(
+                        client, messages, segment, routing, resolve_with_tm(segment, active_tm, fuzzy_distance),
+                        max_tokens=max_tokens, cache=llm_cache, request_policy=correction_policy)
+                    span.attributes.update(decision.attributes(), route_summary=decision.describe())
+                span.attributes.update(result.timing())
+                return result.text
+            except Exception as e:
+                record_request_error("프롬프트 처리", e, span.attributes)
+                return None
     
-    # 녹음 완료 대기 (non-blocking으로 변경)
-    max_wait_time = 35  # 최대 대기 시간 (초)
-    wait_start = time.time()
+    def translate(text):
+        with trace.span("translation") as span:
+            return translate_text(text, DEFAULT_TRANSLATION_LANGUAGE, timing=span.attributes, routing=routing)
     
-    while listen_thread.is_alive() and not stop_recording and (time.time() - wait_start < max_wait_time):
-        time.sleep(0.1)  # 짧은 간격으로 체크
+    def translate_extra(text):
+        return translate_to_languages(text, extra_languages, trace, routing=routing)
     
-    if listen_thread.is_alive():
-        # 스레드가 아직 실행 중이면 강제 종료 시그널
-        stop_recording = True
-        listen_thread.join(timeout=1)
+    def apply_tm(text):
+        with trace.span("tm") as span:
+            return apply_active_tm(text, active_tm, fuzzy_distance, span)
     
-    if recording_audio and not stop_recording:
+    def consume(texts):
+        # 녹음 작업 스레드는 이 녹음만 쓰므로 끝난 뒤 컨텍스트를 떼어 냄
+        detach_context = attach_context()
         try:
-            text = recognizer.recognize_google(recording_audio, language='ko-KR')
-            return text
-        except sr.UnknownValueError:
-            return "음성을 인식할 수 없습니다."
-        except sr.RequestError as e:
-            return f"Google Speech Recognition 서비스에 접근할 수 없습니다: {e}"
-    else:
-        return "녹음이 중단되었습니다."
+            return run_pipelined(texts, correct, translate, apply_tm=apply_tm, thread_initializer=attach_context,
+                                 on_segment=lambda index, result: live_results.__setitem__(index, result),
+                                 translate_extra=translate_extra if extra_languages else None)
+        finally:
+            detach_context()
+    
+    return consume
+
 
+def correct_transcription_with_prompt(user_input, system_prompt, user_prompt, on_delta=None, timing=None,
+                                     routing=None, resolved_text=None):
+    """프롬프트를 사용하여 텍스트 교정
 
-def correct_transcription_with_prompt(user_input, system_prompt, user_prompt):
-    """프롬프트를 사용하여 텍스트 교정"""
+    on_delta를 넘기면 스트리밍으로 받아 부분 결과를 전달하고, timing(dict)에는 첫 토큰/전체 시간을 기록한다.
+    routing(RoutingPolicy)이 주어지면 입력에 맞는 모델을 고르고, resolved_text(TM 용어가 전부 덮는 입력)가 있으면
+    LLM을 부르지 않는다. 라우팅 결정도 timing에 함께 기록한다.
+    요청에는 검수 단계의 요청 정책(마감 시간·재시도·헤징)을 적용한다.
+    """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=100,
-            temperature=0.3
+        messages = build_correction_messages(system_prompt, user_prompt)
+        request_policy = get_request_policy("llm_correction")
+        if routing is None:
+            result = chat_completion(
+                client,
+                messages,
+                max_tokens=adaptive_max_tokens(user_input),
+                on_delta=on_delta,
+                cache=get_llm_cache(),
+                policy=request_policy,
+                context=script_thread_initializer()
+            )
+        else:
+            result, decision = route_correction(client, messages, user_input, routing, resolved_text,
+                                                max_tokens=adaptive_max_tokens(user_input), on_delta=on_delta,
+                                                cache=get_llm_cache(), request_policy=request_policy,
+                                                context=script_thread_initializer())
+            if timing is not None:
+                timing.update(decision.attributes(), route_summary=decision.describe())
+        if timing is not None:
+            timing.update(result.timing())
+        return result.text
+    except Exception as e:
+        record_request_error("프롬프트 처리", e, timing)
+        return None
+
+
+def correct_and_translate(user_input, system_prompt, user_prompt, term_pairs=(), timing=None):
+    """검수와 영어 번역을 한 번의 요청(JSON 응답)으로 처리 (통합 모드)
+
+    term_pairs((입력 표기, 교정 표기))는 요청에 용어 제약으로 넣는다. (검수, 번역)을 반환하고 실패하면 (None, None).
+    """
+    try:
+        result = chat_completion(
+            client,
+            build_fused_messages(system_prompt, user_prompt, term_pairs),
+            max_tokens=adaptive_max_tokens(user_input, FUSED_TOKEN_RATIO),
+            cache=get_llm_cache(),
+            response_format=JSON_RESPONSE_FORMAT,
+            policy=get_request_policy("fused"),
+            context=script_thread_initializer()
         )
-        result = response.choices[0].message.content.strip()
-        return result
+        if timing is not None:
+            timing.update(result.timing())
+        return parse_fused_reply(result.text)
     except Exception as e:
-        st.write(f"프롬프트 처리 실패: {e}")
+        record_request_error("통합 처리", e, timing)
+        return None, None
+
+
+def fill_glossary_prompt(system_prompt, active_tm, text, span=None):
+    """System Prompt의 {{고유단어리스트}} 자리에 입력과 관련 있는 TM 용어만 넣음
+
+    TM이 없으면 프롬프트를 그대로 쓴다. span이 주어지면 선택 용어 수와 System Prompt 토큰(추정)을 기록한다.
+    """
+    glossary = active_tm.glossary if active_tm is not None else None
+    filled, report = fill_glossary(system_prompt, glossary, text)
+    if report is not None and span is not None:
+        span.attributes.update({
+            "glossary_terms": report["terms"],
+            "glossary_total_terms": report["total_terms"],
+            "system_prompt_tokens": report["tokens"],
+            "system_prompt_tokens_full_glossary": report["full_tokens"],
+        })
+    return filled
+
+
+def format_glossary_report(trace):
+    """검수 요청들의 고유명사 선택 결과와 System Prompt 토큰 변화 (없으면 None)"""
+    spans = [span for span in trace.spans
+             if span.stage in ("llm_correction", "fused") and "glossary_terms" in span.attributes]
+    if not spans:
         return None
+    selected = sum(span.attributes["glossary_terms"] for span in spans)
+    full_tokens = sum(span.attributes["system_prompt_tokens_full_glossary"] for span in spans)
+    tokens = sum(span.attributes["system_prompt_tokens"] for span in spans)
+    return (f"선택 {selected}개 / 전체 {spans[0].attributes['glossary_total_terms']}개 (검수 요청 {len(spans)}회 합계)\n"
+            f"System Prompt 토큰(추정): 전체 목록 {full_tokens:,} → 관련 용어만 {tokens:,} "
+            f"({(1 - tokens / full_tokens) * 100 if full_tokens else 0:.1f}% 감소)")
+
 
+def apply_tm_corrections(text, tm_df, tm_matcher=None, fuzzy_matcher=None, fuzzy_distance=None, report=None):
+    """TM 데이터를 활용하여 텍스트 교정
 
-def apply_tm_corrections(text, tm_df):
-    """TM 데이터를 활용하여 텍스트 교정"""
-    if tm_df is None or tm_df.empty:
+    fuzzy_matcher와 fuzzy_distance(자모 편집 거리)가 주어지면 정확히 일치하지 않는 오인식 표기도 교정한다.
+    report(dict)에는 정확 일치/근사 일치 교정 건수를 기록한다.
+    """
+    if not text:
         return text
     
-    corrected_text = text
-    
-    # TM 데이터의 각 행을 순회하며 교정 적용
-    for idx, row in tm_df.iterrows():
-        # 컬럼명이 다를 수 있으므로 첫 번째와 두 번째 컬럼 사용
-        if len(row) >= 2:
-            source_text = str(row.iloc[0]).strip()  # 원본 텍스트
-            target_text = str(row.iloc[1]).strip()  # 교정된 텍스트
-            
-            # 빈 값이 아닌 경우에만 교정 적용
-            if source_text and target_text and source_text != 'nan' and target_text != 'nan':
-                corrected_text = corrected_text.replace(source_text, target_text)
+    # 미리 색인해 둔 매처가 없으면 이번 요청용으로 생성
+    if tm_matcher is None:
+        if tm_df is None or tm_df.empty:
+            return text
+        tm_matcher = TMMatcher.from_dataframe(tm_df)
     
-    return corrected_text
+    # 가장 왼쪽·가장 긴 용어(정확 일치)와, 그 밖의 구간 중 TM 원본 표기와 발음이 비슷한 구간(근사 일치)을
+    # 원문에서 함께 찾아 한 번에 치환 (이미 교정 표기인 구간은 그대로 둠)
+    text, matches, fuzzy_matches = correct_with_tm(text, tm_matcher, fuzzy_matcher, fuzzy_distance)
+    if report is not None:
+        report["exact_matches"] = len(matches)
+        if fuzzy_matcher is not None and fuzzy_distance is not None:
+            report["fuzzy_matches"] = len(fuzzy_matches)
+            report["fuzzy_corrections"] = [f"{source} → {target}" for _, _, source, target, _ in fuzzy_matches]
+    return text
+
+
+def apply_active_tm(text, active_tm, fuzzy_distance, span=None):
+    """현재 TM으로 교정 (TM이 없으면 그대로). span이 주어지면 교정 건수를 기록"""
+    if active_tm is None:
+        return text
+    return apply_tm_corrections(text, None, active_tm.tm_matcher, active_tm.fuzzy_matcher, fuzzy_distance,
+                                report=span.attributes if span is not None else None)
 
 
-def translate_to_english(text):
+def get_fuzzy_distance():
+    """세션에서 고른 근사 일치 허용 거리 (끄면 None)"""
+    value = st.session_state.get('tm_fuzzy_distance', FUZZY_TM_DEFAULT_DISTANCE)
+    return None if value == FUZZY_TM_OFF else value
+
+
+def format_tm_report(trace):
+    """TM 단계들의 정확/근사 일치 교정 건수"""
+    spans = [span for span in trace.spans if span.stage == "tm"]
+    exact = sum(span.attributes.get("exact_matches", 0) for span in spans)
+    fuzzy = sum(span.attributes.get("fuzzy_matches", 0) for span in spans)
+    corrections = [item for span in spans for item in span.attributes.get("fuzzy_corrections", [])]
+    report = f"정확 일치 {exact}건 · 근사 일치 {fuzzy}건"
+    constraints = sum(span.attributes.get("term_constraints", 0) for span in trace.spans if span.stage == "fused")
+    if constraints:
+        report += f" · 통합 요청 용어 제약 {constraints}건"
+    if corrections:
+        report += f" ({', '.join(corrections)})"
+    return report
+
+
+def translate_to_english(text, on_delta=None, timing=None, routing=None):
     """검수된 텍스트를 영어로 번역"""
+    return translate_text(text, DEFAULT_TRANSLATION_LANGUAGE, on_delta=on_delta, timing=timing, routing=routing)
+
+
+def translate_text(text, language, on_delta=None, timing=None, routing=None):
+    """검수된 텍스트를 language(TRANSLATION_LANGUAGES 코드)로 번역
+
+    routing(RoutingPolicy)이 주어지면 짧은 입력은 빠른 모델로 번역하고, 결과가 검사(check_translation)를
+    통과하지 못하면 큰 모델로 다시 요청한다.
+    """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a translator. Translate Korean text to English. Return ONLY the English translation, no explanations, no quotes, no additional text."},
-                {"role": "user", "content": f"Translate the following text to English: {text}"}
-            ],
-            max_tokens=100,
-            temperature=0.3
+        model, reason = routing.choose_model(text) if routing is not None else (DEFAULT_MODEL, None)
+        request_policy = get_request_policy("translation")
+        request = lambda model: chat_completion(
+            client,
+            build_translation_messages(text, language),
+            model=model,
+            max_tokens=adaptive_max_tokens(text, TRANSLATION_TOKEN_RATIO),
+            on_delta=on_delta,
+            cache=get_llm_cache(),
+            policy=request_policy,
+            context=script_thread_initializer()
         )
-        result = response.choices[0].message.content.strip()
-        return result
+        result = request(model)
+        if routing is not None and model != routing.strong_model:
+            problem = routing.check_translation(text, result.text)
+            if problem:
+                model, reason = routing.strong_model, f"{reason} → {problem}"
+                result = request(model)
+        if timing is not None:
+            timing.update(result.timing())
+            if routing is not None:
+                timing.update(model=model, route_reason=reason)
+        return result.text
     except Exception as e:
-        st.write(f"번역 처리 실패: {e}")
+        record_request_error("번역 처리", e, timing)
         return None
 
 
-def process_text_input(user_input, input_type="음성"):
-    """텍스트 입력을 처리하는 공통 함수"""
-    if not user_input:
-        return
+EXECUTION_MODES = ["순차", "파이프라인", "병렬", "통합"]
+
+# 영어 외에 함께 번역할 수 있는 언어 수와 동시 번역 요청 수
+MAX_EXTRA_LANGUAGES = 7
+MAX_CONCURRENT_TRANSLATIONS = 8
+
+# 병렬 모드: 문장을 이 글자 수까지 묶은 구간을 최대 MAX_CONCURRENT_CHUNKS개씩 동시에 처리
+CHUNK_MAX_CHARS = 200
+MAX_CONCURRENT_CHUNKS = 4
+
+
+def script_thread_initializer():
+    """작업 스레드에서도 st 호출(오류 표시 등)이 현재 세션에 붙도록 스크립트 컨텍스트 전달
+
+    반환한 함수는 컨텍스트를 떼어 내는 함수를 돌려준다 (여러 세션이 같이 쓰는 스레드에서 작업이 끝난 뒤 호출).
+    """
+    ctx = get_script_run_ctx()
+
+    def attach():
+        thread = add_script_run_ctx(threading.current_thread(), ctx)
+        return lambda: setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+
+    return attach
+
+
+# 모델 라우팅 (짧은 입력은 빠른 모델, TM이 전부 덮으면 검수 LLM 생략)
+MODEL_ROUTING_POLICY = RoutingPolicy()
+
+
+def get_routing_policy():
+    """세션에서 모델 자동 선택을 켰으면 라우팅 규칙, 껐으면 None (항상 기본 모델)"""
+    return MODEL_ROUTING_POLICY if st.session_state.get('model_routing', True) else None
+
+
+def resolve_with_tm(text, active_tm, fuzzy_distance):
+    """TM 용어가 입력 전체를 덮으면 입력 그대로, 아니면 None (검수 LLM 생략용)
+
+    TM 교정은 다음 TM 단계에서 한 번만 적용한다. 여기서 미리 교정하면 교정 표기가 원본을 포함하는 항목
+    (삼성 → 삼성전자)이 TM 단계에서 한 번 더 치환된다.
+    """
+    if active_tm is None or not tm_resolves(text, active_tm.tm_matcher, active_tm.fuzzy_matcher, fuzzy_distance):
+        return None
+    return text
+
+
+def format_routing_report(trace):
+    """요청들의 라우팅 결정 (라우팅을 껐으면 None)"""
+    spans = [span for span in trace.spans if span.stage == "llm_correction" and "route" in span.attributes]
+    if not spans:
+        return None
+    skipped = sum(1 for span in spans if span.attributes["route"] != "llm")
+    fallbacks = sum(1 for span in spans if span.attributes.get("route_fallback"))
+    lines = [f"검수 {len(spans)}회 · LLM 생략(TM/캐시) {skipped}회 · 큰 모델 대체 {fallbacks}회"]
+    for index, span in enumerate(sorted(spans, key=lambda s: s.start), 1):
+        lines.append(f"검수 {index}: {span.attributes['route_summary']}")
+    models = [span.attributes["model"] for span in trace.spans
+              if span.stage == "translation" and span.attributes.get("model")]
+    if models:
+        lines.append("번역: " + ", ".join(f"{model} ×{models.count(model)}" for model in dict.fromkeys(models)))
+    return "\n".join(lines)
+
+
+def get_extra_languages():
+    """세션에서 고른 추가 번역 언어 코드 목록 (영어는 항상 번역하므로 제외)"""
+    return [language for language in st.session_state.get('extra_languages', [])
+            if language != DEFAULT_TRANSLATION_LANGUAGE]
+
+
+def language_label(language):
+    return TRANSLATION_LANGUAGES[language][0]
+
+
+def translate_to_languages(text, languages, trace, on_update=None, streaming=False, routing=None):
+    """텍스트를 여러 언어로 동시에 번역해 {언어 코드: 번역}을 languages 순서대로 반환
+
+    언어마다 요청이 따로이므로 LLM 캐시도 언어별로 저장되고, 전체 지연시간은 가장 느린 언어 수준이다.
+    on_update(언어 코드, 텍스트)가 주어지면 언어별 결과를 끝나는 대로 (streaming=True면 토큰 단위로) 넘긴다.
+    """
+    def translate(language):
+        on_delta = (lambda partial: on_update(language, partial)) if streaming and on_update is not None else None
+        with trace.span("translation") as span:
+            span.attributes["language"] = language
+            return translate_text(text, language, on_delta=on_delta, timing=span.attributes, routing=routing)
+    
+    def on_result(language, translated):
+        if on_update is not None and translated:
+            on_update(language, translated)
+    
+    return fan_out(languages, translate, max_workers=MAX_CONCURRENT_TRANSLATIONS,
+                   thread_initializer=script_thread_initializer(), on_result=on_result)
+
+
+def translation_separators(separators):
+    """번역문을 이어 붙일 구분자 (원문에 띄어쓰기 없이 붙어 있던 문장도 번역문에서는 띄어 씀)"""
+    return [separator or " " for separator in separators] if separators is not None else None
+
+
+def summarize_segment_results(results, separators=None):
+    """구간 결과를 (입력, 검수, TM 교정, 번역) 전체 텍스트로 이어 붙임 (separators는 구간 사이 원래 구분자)"""
+    recognized_text = join_segments((r.source for r in results), separators) or None
+    corrected_text = join_segments((r.corrected for r in results), separators) or None
+    tm_corrected_text = join_segments((r.tm_corrected for r in results), separators) or None
+    translated_text = join_segments((r.translated for r in results), translation_separators(separators)) or None
+    return recognized_text, corrected_text, tm_corrected_text, translated_text
+
+
+def join_segment_translations(results, languages):
+    """구간별 추가 언어 번역을 언어마다 이어 붙여 {언어 코드: 번역} 반환 (번역이 없는 언어는 빠짐)"""
+    translations = {}
+    for language in languages:
+        text = join_segments(r.translations.get(language) for r in results)
+        if text:
+            translations[language] = text
+    return translations
+
+
+def run_pipelined_stages(segments, active_tm, trace, on_correction=None, on_translation=None, concurrent=False,
+                         separators=None):
+    """구간 단위로 검수와 번역을 겹쳐 실행하고 (입력, 검수, TM 교정, 번역) 전체 텍스트 반환
+
+    concurrent=True면 구간마다 검수 → TM → 번역을 동시에 처리한다 (병렬 모드).
+    separators(구간 사이 원래 구분자)가 주어지면 결과를 원래 띄어쓰기·줄바꿈대로 이어 붙인다.
+    on_correction/on_translation(텍스트)이 주어지면 구간이 끝날 때마다 지금까지의 결과를 순서대로 넘긴다.
+    """
+    system_prompt = st.session_state.saved_system_prompt
+    user_prompt_template = st.session_state.saved_user_prompt_template
+    fuzzy_distance = get_fuzzy_distance()
+    routing = get_routing_policy()
+    
+    def correct(segment):
+        user_prompt = build_user_prompt(user_prompt_template, segment)
+        with trace.span("llm_correction") as span:
+            segment_system_prompt = fill_glossary_prompt(system_prompt, active_tm, segment, span)
+            resolved_text = resolve_with_tm(segment, active_tm, fuzzy_distance) if routing is not None else None
+            return correct_transcription_with_prompt(segment, segment_system_prompt, user_prompt, timing=span.attributes,
+                                                     routing=routing, resolved_text=resolved_text)
+    
+    def apply_tm(text):
+        with trace.span("tm") as span:
+            return apply_active_tm(text, active_tm, fuzzy_distance, span)
     
-    # 입력 시간 기록
-    input_completed_time = time.strftime("%H:%M:%S", time.localtime())
+    def translate(text):
+        with trace.span("translation") as span:
+            return translate_to_english(text, timing=span.attributes, routing=routing)
     
-    st.session_state.recognized_text = user_input
+    segment_results = {}
     
-    # 1단계: LLM 교정 적용 (원본 텍스트 사용)
-    user_prompt = st.session_state.saved_user_prompt_template.replace("{transcription}", user_input)
+    def on_segment(index, result):
+        segment_results[index] = result
+        indices = sorted(segment_results)
+        ordered = [segment_results[i] for i in indices]
+        ordered_separators = [separators[i] for i in indices] if separators is not None else None
+        partial_correction = join_segments((r.tm_corrected for r in ordered), ordered_separators)
+        partial_translation = join_segments((r.translated for r in ordered), translation_separators(ordered_separators))
+        if on_correction is not None and partial_correction:
+            on_correction(partial_correction)
+        if on_translation is not None and partial_translation:
+            on_translation(partial_translation)
     
-    corrected_text = correct_transcription_with_prompt(user_input, st.session_state.saved_system_prompt, user_prompt)
-    correction_completed_time = time.strftime("%H:%M:%S", time.localtime())
-    st.session_state.corrected_text = corrected_text
+    if concurrent:
+        results = run_concurrent(segments, correct, translate, apply_tm=apply_tm, max_workers=MAX_CONCURRENT_CHUNKS,
+                                 thread_initializer=script_thread_initializer(), on_segment=on_segment)
+    else:
+        results = run_pipelined(segments, correct, translate, apply_tm=apply_tm,
+                                thread_initializer=script_thread_initializer(), on_segment=on_segment)
+    
+    return summarize_segment_results(results, separators)
+
+
+def process_text_input(user_input, input_type="음성", streaming=False, execution_mode="순차", segment_results=None,
+                       trace=None, live=None):
+    """텍스트 입력을 처리하는 공통 함수 (start_processing이 작업 스레드에서 실행하므로 화면에는 직접 그리지 않음)
+
+    streaming=True면 검수/번역 결과를 토큰이 도착하는 대로 live(ProcessingJob)에 넘겨 화면에 먼저 보여준다.
+    execution_mode="파이프라인"이면 문장 단위로 검수와 번역을 겹쳐 실행하고,
+    "병렬"이면 문장을 묶은 구간들을 동시에 처리한다 (긴 입력의 지연시간이 가장 느린 구간 수준으로 줄어듦).
+    "통합"이면 검수와 번역을 한 번의 요청으로 받고, TM 치환은 검수 결과에 그대로 적용한다.
+    segment_results(스트리밍 녹음 중 이미 처리된 구간 결과)가 주어지면 그 결과를 그대로 저장한다.
+    추가 번역 언어를 골랐으면 TM 교정된 텍스트를 그 언어들로 동시에 번역한다 (순차 모드는 영어도 함께).
+    trace(녹음·인식 구간이 이미 기록된 Trace)가 주어지면 이어서 단계별 지연시간을 기록한다.
+    처리한 입력 텍스트를 반환한다 (입력이 없으면 None).
+    """
+    if not user_input and not segment_results:
+        return None
     
-    # 2단계: TM 교정 적용 (검수된 텍스트 사용)
-    tm_corrected_text = apply_tm_corrections(corrected_text, st.session_state.get('tm_df'))
-    tm_completed_time = time.strftime("%H:%M:%S", time.localtime())
-    st.session_state.tm_corrected_text = tm_corrected_text
+    if trace is None:
+        trace = Trace(input_type)
     
-    # 3단계: 번역 (TM 교정된 텍스트 사용)
-    if tm_corrected_text:
-        translated_text = translate_to_english(tm_corrected_text)
-        translation_completed_time = time.strftime("%H:%M:%S", time.localtime())
+    # 스트리밍 중 부분 결과를 넘길 곳 (추가 번역 언어는 끝나는 대로 넘김)
+    correction_delta = translation_delta = language_update = None
+    if segment_results is not None:
+        execution_mode = "파이프라인"
+    elif streaming and live is not None:
+        correction_delta = lambda partial: live.update("correction", partial)
+        translation_delta = lambda partial: live.update("translation", partial)
+    if live is not None:
+        language_update = live.update
+    
+    extra_languages = get_extra_languages()
+    st.session_state.extra_translations = {}
+    
+    active_tm = get_active_tm()
+    routing = get_routing_policy()
+    trace.attributes.update({"input_type": input_type, "execution_mode": execution_mode, "streaming": streaming})
+    
+    if execution_mode in ("파이프라인", "병렬"):
+        # 검수 → TM → 번역을 구간 단위로 겹쳐(파이프라인) 또는 동시에(병렬) 실행
+        if segment_results is not None:
+            user_input, corrected_text, tm_corrected_text, translated_text = summarize_segment_results(segment_results)
+            # 추가 언어도 녹음 중에 구간마다 번역해 두었으므로 이어 붙이고,
+            # 구간 번역이 없는 언어(녹음 중에 새로 고른 언어 등)만 아래에서 번역
+            st.session_state.extra_translations = join_segment_translations(segment_results, extra_languages)
+            extra_languages = [language for language in extra_languages
+                               if language not in st.session_state.extra_translations]
+        elif execution_mode == "병렬":
+            segments, separators = chunk_sentences(user_input, CHUNK_MAX_CHARS, with_separators=True)
+            _, corrected_text, tm_corrected_text, translated_text = run_pipelined_stages(
+                segments, active_tm, trace, correction_delta, translation_delta, concurrent=True, separators=separators)
+        else:
+            segments, separators = split_sentences(user_input, with_separators=True)
+            _, corrected_text, tm_corrected_text, translated_text = run_pipelined_stages(
+                segments, active_tm, trace, correction_delta, translation_delta, separators=separators)
+        st.session_state.recognized_text = user_input
+        user_prompt = build_user_prompt(st.session_state.saved_user_prompt_template, user_input)
+        # 구간마다 고유명사 목록이 다르므로 템플릿 그대로 표시
+        system_prompt = st.session_state.saved_system_prompt
+        st.session_state.corrected_text = corrected_text
+        st.session_state.tm_corrected_text = tm_corrected_text
+        if translated_text:
+            st.session_state.translated_text = translated_text
+    elif execution_mode == "통합":
+        st.session_state.recognized_text = user_input
+        fuzzy_distance = get_fuzzy_distance()
         
+        # 1단계: 검수 + 번역 한 번에 (입력에 나온 TM 용어는 제약으로 전달)
+        user_prompt = build_user_prompt(st.session_state.saved_user_prompt_template, user_input)
+        with trace.span("fused") as span:
+            system_prompt = fill_glossary_prompt(st.session_state.saved_system_prompt, active_tm, user_input, span)
+            term_pairs = []
+            if active_tm is not None:
+                term_pairs = term_constraints(user_input, active_tm.tm_matcher, active_tm.fuzzy_matcher, fuzzy_distance)
+            span.attributes["term_constraints"] = len(term_pairs)
+            corrected_text, translated_text = correct_and_translate(user_input, system_prompt, user_prompt, term_pairs,
+                                                                    timing=span.attributes)
+        st.session_state.corrected_text = corrected_text
+        
+        # 2단계: TM 교정 적용 (검수된 텍스트 사용)
+        with trace.span("tm") as span:
+            tm_corrected_text = apply_active_tm(corrected_text, active_tm, fuzzy_distance, span)
+        st.session_state.tm_corrected_text = tm_corrected_text
+        if correction_delta is not None and tm_corrected_text:
+            correction_delta(tm_corrected_text)
         if translated_text:
             st.session_state.translated_text = translated_text
+            if translation_delta is not None:
+                translation_delta(translated_text)
+    else:
+        st.session_state.recognized_text = user_input
+        
+        # 1단계: LLM 교정 적용 (원본 텍스트 사용, TM이 입력 전체를 덮으면 생략)
+        user_prompt = build_user_prompt(st.session_state.saved_user_prompt_template, user_input)
+        with trace.span("llm_correction") as span:
+            system_prompt = fill_glossary_prompt(st.session_state.saved_system_prompt, active_tm, user_input, span)
+            resolved_text = None
+            if routing is not None:
+                resolved_text = resolve_with_tm(user_input, active_tm, get_fuzzy_distance())
+            corrected_text = correct_transcription_with_prompt(user_input, system_prompt, user_prompt,
+                                                               on_delta=correction_delta, timing=span.attributes,
+                                                               routing=routing, resolved_text=resolved_text)
+        st.session_state.corrected_text = corrected_text
+        
+        # 2단계: TM 교정 적용 (검수된 텍스트 사용)
+        with trace.span("tm") as span:
+            tm_corrected_text = apply_active_tm(corrected_text, active_tm, get_fuzzy_distance(), span)
+        st.session_state.tm_corrected_text = tm_corrected_text
+        
+        # 3단계: 번역 (TM 교정된 텍스트 사용)
+        if tm_corrected_text and extra_languages:
+            # 영어와 추가 언어를 한꺼번에 번역
+            # 영어 결과는 "translation" 자리에 표시
+            on_update = None
+            if language_update is not None:
+                on_update = lambda language, text: language_update(
+                    "translation" if language == DEFAULT_TRANSLATION_LANGUAGE else language, text)
+            translations = translate_to_languages(
+                tm_corrected_text, [DEFAULT_TRANSLATION_LANGUAGE] + extra_languages, trace, on_update, streaming,
+                routing)
+            translated_text = translations.pop(DEFAULT_TRANSLATION_LANGUAGE)
+            st.session_state.extra_translations = translations
+            extra_languages = []
+        elif tm_corrected_text:
+            with trace.span("translation") as span:
+                translated_text = translate_to_english(tm_corrected_text, on_delta=translation_delta,
+                                                       timing=span.attributes, routing=routing)
+        
+        if tm_corrected_text and translated_text:
+            st.session_state.translated_text = translated_text
+    
+    # 다른 모드는 영어 번역이 이미 끝났으므로 추가 언어만 동시에 번역
+    if extra_languages and tm_corrected_text:
+        st.session_state.extra_translations.update(translate_to_languages(tm_corrected_text, extra_languages, trace,
+                                                                          language_update, streaming, routing))
+    
+    record_trace(trace)
+    st.session_state.request_errors = request_error_messages(trace)
     
     # 디버깅 정보를 세션 상태에 저장
+    response_mode = "구간별" if segment_results is not None else ("스트리밍" if streaming else "일괄")
     debug_info = {
-        "처리 완료 시간": f"""📝 {input_type} 입력 완료 시간: {input_completed_time}
-🔍 검수 LLM 처리 완료 시간: {correction_completed_time}
-📊 TM 교정 완료 시간: {tm_completed_time}""",
-        "System Prompt": st.session_state.saved_system_prompt,
+        "단계별 지연시간": format_trace_breakdown(trace),
+        "실행 모드": f"{input_type} 입력 · {execution_mode} ({response_mode} 응답)",
+        "최근 지연시간 분포": format_stage_percentiles(get_metrics_registry()),
+        "System Prompt": system_prompt,
         "User Prompt": user_prompt
     }
     
-    # 번역 시간 추가 (있는 경우)
-    if 'translation_completed_time' in locals():
-        debug_info["처리 완료 시간"] += f"\n🌐 번역 LLM 처리 완료 시간: {translation_completed_time}"
+    preprocess_report = format_preprocess_report(
+        [span.attributes for span in trace.spans if span.stage == "audio_preprocess"])
+    if preprocess_report:
+        debug_info["오디오 전처리"] = preprocess_report
+    
+    routing_report = format_routing_report(trace)
+    if routing_report:
+        debug_info["모델 라우팅"] = routing_report
+    
+    request_policy_report = format_request_policy_report(trace)
+    if request_policy_report:
+        debug_info["요청 정책"] = request_policy_report
+    
+    glossary_report = format_glossary_report(trace)
+    if glossary_report:
+        debug_info["고유명사 목록"] = glossary_report
+    
+    debug_info["LLM 캐시"] = format_llm_cache_stats()
+    debug_info["요청 대기열"] = format_scheduler_stats([get_llm_scheduler(), get_stt_scheduler()])
+    debug_info["연결 재사용"] = format_connection_stats()
     
     # TM 정보 추가
-    if st.session_state.get('tm_df') is not None:
+    if active_tm is not None:
         tm_status = "✅ TM 교정 적용됨" if corrected_text != tm_corrected_text else "➖ TM 교정 변경사항 없음"
-        debug_info["TM 정보"] = f"📊 TM 항목 수: {len(st.session_state.tm_df)}개\n{tm_status}"
+        debug_info["TM 정보"] = f"📊 TM 항목 수: {len(active_tm)}개\n{tm_status}\n{format_tm_report(trace)}"
     
     st.session_state.debug_info = debug_info
+    return user_input
 
 
 @st.dialog("System Prompt", width="large")
@@ -312,10 +1010,382 @@ def show_user_prompt_json():
                 label_visibility="collapsed"
             )
 
-def main():
-    st.title("STT 교정 테스트")
+# 상태·결과 영역을 다시 그리는 간격 (초). 작업이 끝나면 늦어도 이만큼 뒤에 결과 카드만 다시 그림
+ACTIVE_REFRESH_INTERVAL = 0.3
+
+
+def get_processing_job():
+    """현재 세션의 검수/번역 작업 (녹음 컨트롤러처럼 세션마다 따로 둠)"""
+    if 'processing_job' not in st.session_state:
+        st.session_state.processing_job = ProcessingJob()
+    return st.session_state.processing_job
+
 
-    # 사이드바에 탭 기능 추가
+def get_script_run_stats():
+    """현재 세션의 스크립트 실행 횟수·시간"""
+    if 'script_run_stats' not in st.session_state:
+        st.session_state.script_run_stats = ScriptRunStats()
+    return st.session_state.script_run_stats
+
+
+@contextmanager
+def timed_script_run(kind):
+    """스크립트 전체(kind="app") 또는 fragment 실행 한 번의 시간을 기록
+
+    전체 실행 중에 함께 그려지는 fragment는 전체 실행에 포함되므로 따로 세지 않는다.
+    fragment만 다시 실행된 것이면 True를 넘긴다.
+    """
+    if kind != "app" and st.session_state.get('script_run_kind') is not None:
+        yield False
+        return
+    st.session_state.script_run_kind = kind
+    start = time.perf_counter()
+    try:
+        yield kind != "app"
+    finally:
+        st.session_state.script_run_kind = None
+        get_script_run_stats().record(kind, time.perf_counter() - start)
+
+
+def begin_interaction():
+    """상호작용(처리하기·마이크 버튼) 시작 시점의 실행 횟수를 남겨 두고 이전 녹음 안내를 지움"""
+    st.session_state.interaction_mark = get_script_run_stats().mark()
+    st.session_state.recording_notice = None
+
+
+def report_script_runs(job):
+    """끝난 작업의 디버깅 정보에 이번 상호작용의 스크립트 실행 횟수·시간과 상호작용당 분포를 한 번만 추가"""
+    if job.is_active or job.run_id == st.session_state.get('reported_run_id'):
+        return
+    st.session_state.reported_run_id = job.run_id
+    mark = st.session_state.get('interaction_mark')
+    if mark is None or job.error is not None or not st.session_state.get('debug_info'):
+        return
+    stats = get_script_run_stats()
+    runs = stats.finish_interaction(mark)
+    st.session_state.debug_info["스크립트 실행"] = (f"이번 상호작용: {format_script_runs(runs)}\n"
+                                                   f"{format_script_run_percentiles(stats)}")
+
+
+def start_processing(user_input, input_type, streaming=False, execution_mode="순차", segment_results=None,
+                     trace=None):
+    """process_text_input을 작업 스레드에서 시작 (스크립트는 기다리지 않고 작업 영역만 다시 그림)
+
+    이미 처리 중이면 시작하지 않고 False를 반환한다.
+    """
+    def work(job):
+        return process_text_input(user_input, input_type, streaming=streaming, execution_mode=execution_mode,
+                                  segment_results=segment_results, trace=trace, live=job)
+    
+    return get_processing_job().start(work, initializer=script_thread_initializer())
+
+
+def show_recording_status(controller):
+    """녹음 중 상태와 부분 결과"""
+    if st.button("🔴 녹음 중 (클릭하여 종료)", key='mic_stop_button', type="secondary"):
+        controller.stop()
+    
+    if controller.stop_requested:
+        st.caption("⏹️ 녹음을 종료하고 인식을 마무리하는 중...")
+    elif controller.streaming:
+        st.caption("🎤 음성을 인식하는 중... (말이 멈출 때마다 바로 인식, 1.5초 멈추면 자동 종료)")
+    else:
+        st.caption("🎤 음성을 인식하는 중... (1.5초 멈추면 자동 종료)")
+    if controller.admission is not None:
+        show_queue_position(controller.admission, "음성 인식")
+    
+    if controller.transcripts:
+        st.markdown("**🔤 입력받은 내용:**")
+        st.info(controller.transcript)
+    
+    live_results = st.session_state.get('live_segment_results') or {}
+    ordered = [live_results[i] for i in sorted(live_results)]
+    partial_correction = join_segments(r.tm_corrected for r in ordered)
+    partial_translation = join_segments(r.translated for r in ordered)
+    if partial_correction:
+        st.markdown("**🔍 검수:**")
+        st.success(partial_correction)
+    if partial_translation:
+        st.markdown("**🌐 번역:**")
+        st.success(partial_translation)
+    for language, translated in join_segment_translations(ordered, get_extra_languages()).items():
+        st.markdown(f"**🌐 {language_label(language)}:**")
+        st.success(translated)
+
+
+def show_queue_position(admission, action):
+    """이 세션의 요청이 공용 스케줄러에서 기다리는 중이면 대기 순서 표시"""
+    position = admission.position()
+    if position:
+        stats = admission.scheduler.stats()
+        st.caption(f"🚦 요청이 많아 {action} 대기 중입니다 ({position}번째 차례 · 전체 대기 {stats['queued']}건)")
+
+
+def show_processing_status(job):
+    """처리 중 상태와 지금까지 도착한 결과"""
+    _, partials = job.snapshot()
+    st.caption(f"⏳ 검수/번역 중... ({job.seconds:.1f}초)")
+    show_queue_position(get_llm_scheduler().for_session(get_session_id()), "검수/번역")
+    if partials.get("correction"):
+        st.markdown("**🔍 검수:**")
+        st.success(partials["correction"])
+    if partials.get("translation"):
+        st.markdown("**🌐 번역:**")
+        st.success(partials["translation"])
+    for language in get_extra_languages():
+        if partials.get(language):
+            st.markdown(f"**🌐 {language_label(language)}:**")
+            st.success(partials[language])
+
+
+def recording_trace(controller):
+    """녹음·인식 구간을 기록한 Trace (스트리밍 녹음이면 구간별 검수/번역 기록이 이미 들어 있음)"""
+    trace = st.session_state.get('recording_trace') or Trace("음성")
+    st.session_state.recording_trace = None
+    if controller.capture_seconds is not None:
+        trace.add_span("audio_capture", controller.capture_seconds, end=controller.capture_ended_at)
+    for start, end, report in controller.preprocess_spans:
+        trace.add_span("audio_preprocess", end - start, end=end, **report)
+    for (start, end), waited in zip(controller.recognition_spans, controller.queue_waits):
+        trace.add_span("stt", end - start, end=end, queue_wait=waited)
+    return trace
+
+
+def handle_recording_result(controller, streaming, execution_mode):
+    """끝난 녹음의 인식 결과를 검수/번역 작업으로 넘김
+
+    넘길 결과가 없으면 안내를 세션 상태(recording_notice)에 남긴다. 상태 영역을 다시 그릴 때마다 보이도록
+    여기서 그리지 않고 show_recording_notice가 그린다.
+    """
+    if isinstance(controller.error, sr.RequestError):
+        st.session_state.recording_notice = ("warning", f"⚠️ 음성 인식 서비스에 접근할 수 없습니다: {controller.error}")
+        return
+    if isinstance(controller.error, SchedulerOverloaded):
+        st.session_state.recording_notice = ("warning", "🚦 음성 인식 요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해 주세요.")
+        return
+    if controller.error is not None:
+        st.session_state.recording_notice = ("warning", f"⚠️ 음성 인식 실패: {controller.error}")
+        return
+    
+    if controller.streaming and controller.output:
+        # 스트리밍 녹음은 구간별 검수/번역이 이미 끝나 있음
+        start_processing(None, "음성", segment_results=controller.output, trace=recording_trace(controller))
+    elif controller.transcript:
+        start_processing(controller.transcript, "음성", streaming=streaming, execution_mode=execution_mode,
+                         trace=recording_trace(controller))
+    elif controller.stop_requested:
+        st.session_state.recording_notice = ("info", "🔴 녹음이 중단되었습니다.")
+    else:
+        st.session_state.recording_notice = ("warning", "⚠️ 음성을 인식할 수 없습니다.")
+
+
+def show_recording_notice():
+    """직전 녹음에서 검수/번역으로 넘길 결과가 없었던 이유"""
+    notice = st.session_state.get('recording_notice')
+    if notice:
+        kind, message = notice
+        getattr(st, kind)(message)
+
+
+def show_results(job):
+    """디버깅 정보와 결과 카드 (처리가 끝난 뒤)"""
+    if job.error is not None:
+        st.error(f"처리 실패: {job.error}")
+    for message in st.session_state.get('request_errors') or []:
+        st.warning(message)
+    
+    # 디버깅 정보 표시 (처리하기 버튼 바로 아래)
+    if st.session_state.get('debug_info'):
+        with st.expander("🔍 디버깅 정보"):
+            for key, value in st.session_state.debug_info.items():
+                st.write(f"**{key}:**")
+                if key in ["System Prompt", "User Prompt", "단계별 지연시간", "최근 지연시간 분포", "스크립트 실행",
+                           "요청 대기열"]:
+                    st.code(value, language="text")
+                else:
+                    st.write(value)
+            
+            # 최근 요청의 단계별 기록 내보내기
+            registry = get_metrics_registry()
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("📥 JSONL", registry.export_jsonl(), file_name="traces.jsonl",
+                                   mime="application/jsonl", use_container_width=True)
+            with col2:
+                st.download_button("📥 Prometheus", export_prometheus_metrics(), file_name="metrics.prom",
+                                   mime="text/plain", use_container_width=True)
+
+    # 결과 표시
+    if st.session_state.get('recognized_text'):
+        st.markdown("---")
+        st.subheader("📋 처리 결과")
+        
+        # 결과를 카드 형태로 표시
+        with st.container():
+            st.markdown("**🔤 입력받은 내용:**")
+            st.info(st.session_state.recognized_text)
+                
+        if st.session_state.get('corrected_text'):
+            with st.container():
+                st.markdown("**🔍 검수:**")
+                st.success(st.session_state.corrected_text)
+            
+        if st.session_state.get('tm_corrected_text'):
+            with st.container():
+                if st.session_state.corrected_text != st.session_state.tm_corrected_text:
+                    # TM이 적용된 경우
+                    st.markdown("**📊 TM 교정:**")
+                    st.success(st.session_state.tm_corrected_text)
+                else:
+                    # TM이 적용되지 않은 경우
+                    st.markdown("**📊 TM 교정: TM 적용되지 않음**")
+                    st.success(st.session_state.corrected_text)
+                
+        if st.session_state.get('translated_text'):
+            with st.container():
+                st.markdown("**🌐 번역:**")
+                st.success(st.session_state.translated_text)
+        
+        for language, translated in st.session_state.get('extra_translations', {}).items():
+            if translated:
+                with st.container():
+                    st.markdown(f"**🌐 {language_label(language)}:**")
+                    st.success(translated)
+
+
+def is_busy():
+    """녹음 중이거나, 끝난 녹음을 아직 넘기지 않았거나, 처리 중인지"""
+    return (get_recording_controller().is_active or st.session_state.get('is_recording', False)
+            or get_processing_job().is_active)
+
+
+@st.fragment
+def show_options():
+    """처리 옵션 (바꾸면 이 영역만 다시 실행되고, 작업 영역은 다음 실행 때 세션 상태에서 읽음)"""
+    with timed_script_run("options"):
+        # 검수/번역 결과를 토큰 단위로 먼저 보여줄지 여부
+        st.toggle("⚡ 스트리밍 출력", value=True, key="streaming_enabled",
+                  help="검수/번역 결과를 토큰이 도착하는 대로 표시합니다")
+        st.radio("실행 모드", EXECUTION_MODES, horizontal=True, key="execution_mode",
+                 help="파이프라인: 문장 단위로 검수와 번역을 겹쳐 실행합니다 (순서 유지)\n\n"
+                      "병렬: 긴 입력을 문장 묶음으로 나눠 동시에 처리합니다 (순서 유지)\n\n"
+                      "통합: 검수와 번역을 한 번의 요청으로 받습니다 (TM 용어는 제약으로 전달)")
+        st.toggle("🧭 모델 자동 선택", value=True, key="model_routing",
+                  help=f"짧은 입력은 {MODEL_ROUTING_POLICY.fast_model}로 처리하고 결과가 이상하면 "
+                       f"{MODEL_ROUTING_POLICY.strong_model}로 다시 요청합니다. TM이 입력 전체를 덮으면 검수 LLM을 생략합니다")
+        st.toggle("🛡️ 요청 헤징", value=False, key="request_hedging",
+                  help=f"LLM 응답이 최근 p95 지연시간(표본 {HEDGE_MIN_SAMPLES}개 이상)을 넘기면 같은 요청을 하나 더 보내 "
+                       "먼저 온 응답을 씁니다. 느린 요청의 꼬리 지연을 줄이는 대신 요청 수가 조금 늘어납니다")
+        st.multiselect("추가 번역 언어", [code for code in TRANSLATION_LANGUAGES if code != DEFAULT_TRANSLATION_LANGUAGE],
+                       key="extra_languages", format_func=language_label, max_selections=MAX_EXTRA_LANGUAGES,
+                       help="영어와 함께 고른 언어로도 동시에 번역합니다 (언어별로 끝나는 대로 표시)")
+        backends = get_stt_backends()
+        st.radio("음성 인식 엔진", backends, horizontal=True, key="stt_backend", format_func=STT_BACKEND_LABELS.get,
+                 index=backends.index(get_stt_backend()),
+                 help="Whisper는 네트워크 없이 이 서버의 CPU에서 인식합니다 (모델은 처음 한 번만 불러옴)")
+        st.radio("음성 인식 방식", STT_MODES, horizontal=True, key="stt_mode",
+                 help="스트리밍: 말이 잠깐 멈출 때마다 구간을 잘라 녹음 중에 바로 인식하고 처리합니다")
+        st.toggle("🎛️ 오디오 전처리", value=True, key="audio_preprocess",
+                  help="인식 전에 16kHz 모노로 낮추고 앞뒤 무음을 잘라 업로드 크기를 줄입니다")
+
+
+def show_workspace():
+    """음성·텍스트 입력 영역과 녹음·처리 상태·결과 영역
+
+    입력 영역은 버튼을 누를 때만 다시 실행되고, 상태·결과 영역은 ACTIVE_REFRESH_INTERVAL마다 스스로 다시 실행되어
+    진행 상황과 끝난 결과를 그린다. 작업이 시작되거나 끝나도 스크립트 전체나 입력 영역은 다시 실행하지 않고,
+    스크립트 스레드에서 작업을 기다리지도 않는다.
+    """
+    st.fragment(input_fragment)()
+    st.fragment(status_fragment, run_every=ACTIVE_REFRESH_INTERVAL)()
+
+
+def input_fragment():
+    """show_workspace가 fragment로 그리는 입력 영역 (마이크·처리하기 버튼)"""
+    with timed_script_run("input"):
+        streaming = st.session_state.get('streaming_enabled', True)
+        execution_mode = st.session_state.get('execution_mode', EXECUTION_MODES[0])
+        stt_mode = st.session_state.get('stt_mode', STT_MODES[0])
+        
+        # 음성 입력 부분
+        st.markdown("#### 🎤 음성으로 입력하기")
+        
+        # 고른 엔진을 미리 불러 둠 (오프라인 모델은 처음 한 번만 불러오고 이후에는 캐시된 것을 씀)
+        backend = get_stt_backend()
+        try:
+            recognizer = get_speech_recognizer(backend)
+        except Exception as e:
+            recognizer = None
+            st.warning(f"⚠️ 음성 인식 엔진({STT_BACKEND_LABELS[backend]})을 불러오지 못했습니다: {e}")
+        
+        # 마이크 버튼 (녹음 중 상태와 종료 버튼은 상태 영역에 표시)
+        if st.button("🎤 마이크 시작", key='mic_button', type="primary", disabled=recognizer is None):
+            if is_busy():
+                st.warning("⚠️ 진행 중인 녹음이나 검수/번역이 끝난 뒤에 시작하세요.")
+            else:
+                begin_interaction()
+                controller = get_recording_controller()
+                live_results = {}
+                trace = Trace("음성")
+                segment_consumer = None
+                if stt_mode == "스트리밍":
+                    # 인식된 구간은 녹음 작업 스레드에서 바로 검수/번역까지 진행
+                    segment_consumer = make_segment_consumer(get_active_tm(), live_results, trace)
+                st.session_state.live_segment_results = live_results
+                st.session_state.recording_trace = trace
+                controller.recognizer = recognizer
+                preprocessor = None
+                if st.session_state.get('audio_preprocess', True):
+                    preprocessor = OFFLINE_AUDIO_PREPROCESSOR if backend in OFFLINE_STT_BACKENDS else AUDIO_PREPROCESSOR
+                controller.start(streaming=stt_mode == "스트리밍", segment_consumer=segment_consumer,
+                                 preprocessor=preprocessor,
+                                 admission=get_stt_scheduler().for_session(get_session_id()))
+                st.session_state.is_recording = True
+
+        # 텍스트 입력 부분 (음성 입력 아래에 추가)
+        st.markdown("#### 텍스트로 직접 입력하기")
+        
+        # 텍스트 입력 필드
+        text_input = st.text_area("텍스트를 입력하세요:", 
+                                   height=100,
+                                   key="text_input",
+                                   placeholder="ex. 안녕하세요")
+        
+        # 처리하기 버튼 (작업 스레드에서 처리하고 진행 상황은 상태 영역이 그림)
+        if st.button("🔄 처리하기", key="text_input_button", use_container_width=True):
+            if not text_input.strip():
+                st.warning("텍스트를 입력해주세요!")
+            elif get_processing_job().is_active:
+                st.warning("⚠️ 이전 검수/번역이 끝난 뒤에 다시 처리하세요.")
+            else:
+                begin_interaction()
+                start_processing(text_input.strip(), "텍스트", streaming=streaming, execution_mode=execution_mode)
+
+
+def status_fragment():
+    """show_workspace가 fragment로 그리는 녹음·처리 상태와 결과 (ACTIVE_REFRESH_INTERVAL마다 다시 실행)"""
+    controller = get_recording_controller()
+    job = get_processing_job()
+    with timed_script_run("status"):
+        if controller.is_active:
+            show_recording_status(controller)
+        else:
+            if st.session_state.is_recording:
+                # 직전 녹음이 끝났으면 결과를 작업 스레드로 넘김
+                st.session_state.is_recording = False
+                handle_recording_result(controller, st.session_state.get('streaming_enabled', True),
+                                        st.session_state.get('execution_mode', EXECUTION_MODES[0]))
+            show_recording_notice()
+        
+        if job.is_active:
+            show_processing_status(job)
+        else:
+            report_script_runs(job)
+            show_results(job)
+
+
+def show_sidebar():
+    """프롬프트·TM 설정 (전체 실행 때만 다시 그림)"""
     with st.sidebar:
         st.markdown("### ⚙️ 설정")
         
@@ -324,9 +1394,9 @@ def main():
         
         # 세션 상태 초기화
         if 'saved_system_prompt' not in st.session_state:
-            st.session_state.saved_system_prompt = "You are a **meticulous proofreader** working for the **{{주제}}**.\n\n## ROLE\nYour task is to correct transcription errors in text produced by a speech-to-text (STT) system. Your most important duty is to detect and correct misrecognized words related to {{주제}}, including both proper nouns and common nouns.\n\n## CORRECTION RULES\n- Correct spelling, spacing, capitalization, and punctuation errors.\n- Always produce corrections in **the same language as the original input**. For example:\n    - If the text is in Korean, correct it in Korean.\n    - If the text is in English, correct it in English.\n    - If the text is in Chinese, correct it in Chinese.\n- For all words, including proper nouns and general vocabulary, fix typos or misrecognized words.\n- For proper nouns, perform fuzzy matching:\n    - If a transcription contains a word similar in spelling or pronunciation to any proper noun in the list below, replace it with the correct spelling, converted to the script or phonetic transcription used in the output language.\n\n- For Korean proper nouns:\n    - Always correct proper nouns to the standard spelling, then transcribe them using the script or phonetic convention typically used in the output language for foreign names, unless there is an official or widely accepted translation.\n    - Never leave proper nouns in Hangul in non-Korean texts.\n    - Examples:\n        - Use Latin letters (romanization) in English, Spanish, French, German, Italian, Portuguese, Indonesian, Dutch, Finnish, Croatian, Czech, Slovak, Polish, Hungarian, Swedish, Malay, Turkish, Tagalog, Swahili, Uzbek.\n        - Use Katakana in Japanese (e.g. ハンサンド).\n        - Use Hanzi (Chinese characters) or pinyin in Chinese (Simplified, Traditional, Cantonese) if widely accepted.\n        - Use local phonetic script in languages such as Thai, Arabic, Russian, Greek, Hebrew, Hindi, Mongolian, Persian, Ukrainian.\n        - Use Hangul in Korean.\n- Do NOT answer any questions.\n- Do NOT explain corrections.\n- Do NOT rephrase or simplify sentences.\n- Only perform necessary corrections as defined above.\n\n## PROPER NOUN LIST (STANDARD FORMS ONLY)\n{{고유단어리스트}}"
+            st.session_state.saved_system_prompt = DEFAULT_SYSTEM_PROMPT
         if 'saved_user_prompt_template' not in st.session_state:
-            st.session_state.saved_user_prompt_template = "You are a meticulous proofreader for {{주제}}.\n\n## TASK\nYour only task is to correct spelling, transcription, spacing, punctuation, or typographical errors in the given text.\n\n- The input text may contain Korean, English, Chinese, Japanese, or other languages, or a mixture of them.\n- Keep the text in its original language. Do NOT translate the entire text into another language.\n- However, for Korean proper nouns:\n    - Correct them to their official spelling from the provided proper noun list.\n    - Then transcribe them using the writing system or phonetic convention typically used in the output language for foreign names, unless there is an official or widely accepted translation.\n    - Never leave proper nouns in Hangul in non-Korean texts.\n- For all other words, correct only obvious spelling or transcription mistakes.\n- Do NOT answer questions or explain corrections.\n- Do NOT paraphrase or simplify sentences.\n\n## Origin Transcription:\n{transcription}\n\n## Corrected Transcription:"
+            st.session_state.saved_user_prompt_template = DEFAULT_USER_PROMPT_TEMPLATE
         
         # 프롬프트 설정 탭
         with tab1:
@@ -371,8 +1441,8 @@ def main():
             
             with col2:
                 if st.button("예시", key="reset_prompt", use_container_width=True):
-                    st.session_state.saved_system_prompt = "You are a **meticulous proofreader** working for the **{{주제}}**.\n\n## ROLE\nYour task is to correct transcription errors in text produced by a speech-to-text (STT) system. Your most important duty is to detect and correct misrecognized words related to {{주제}}, including both proper nouns and common nouns.\n\n## CORRECTION RULES\n- Correct spelling, spacing, capitalization, and punctuation errors.\n- Always produce corrections in **the same language as the original input**. For example:\n    - If the text is in Korean, correct it in Korean.\n    - If the text is in English, correct it in English.\n    - If the text is in Chinese, correct it in Chinese.\n- For all words, including proper nouns and general vocabulary, fix typos or misrecognized words.\n- For proper nouns, perform fuzzy matching:\n    - If a transcription contains a word similar in spelling or pronunciation to any proper noun in the list below, replace it with the correct spelling, converted to the script or phonetic transcription used in the output language.\n\n- For Korean proper nouns:\n    - Always correct proper nouns to the standard spelling, then transcribe them using the script or phonetic convention typically used in the output language for foreign names, unless there is an official or widely accepted translation.\n    - Never leave proper nouns in Hangul in non-Korean texts.\n    - Examples:\n        - Use Latin letters (romanization) in English, Spanish, French, German, Italian, Portuguese, Indonesian, Dutch, Finnish, Croatian, Czech, Slovak, Polish, Hungarian, Swedish, Malay, Turkish, Tagalog, Swahili, Uzbek.\n        - Use Katakana in Japanese (e.g. ハンサンド).\n        - Use Hanzi (Chinese characters) or pinyin in Chinese (Simplified, Traditional, Cantonese) if widely accepted.\n        - Use local phonetic script in languages such as Thai, Arabic, Russian, Greek, Hebrew, Hindi, Mongolian, Persian, Ukrainian.\n        - Use Hangul in Korean.\n- Do NOT answer any questions.\n- Do NOT explain corrections.\n- Do NOT rephrase or simplify sentences.\n- Only perform necessary corrections as defined above.\n\n## PROPER NOUN LIST (STANDARD FORMS ONLY)\n{{고유단어리스트}}"
-                    st.session_state.saved_user_prompt_template = "You are a meticulous proofreader for {{주제}}.\n\n## TASK\nYour only task is to correct spelling, transcription, spacing, punctuation, or typographical errors in the given text.\n\n- The input text may contain Korean, English, Chinese, Japanese, or other languages, or a mixture of them.\n- Keep the text in its original language. Do NOT translate the entire text into another language.\n- However, for Korean proper nouns:\n    - Correct them to their official spelling from the provided proper noun list.\n    - Then transcribe them using the writing system or phonetic convention typically used in the output language for foreign names, unless there is an official or widely accepted translation.\n    - Never leave proper nouns in Hangul in non-Korean texts.\n- For all other words, correct only obvious spelling or transcription mistakes.\n- Do NOT answer questions or explain corrections.\n- Do NOT paraphrase or simplify sentences.\n\n## Origin Transcription:\n{transcription}\n\n## Corrected Transcription:"
+                    st.session_state.saved_system_prompt = DEFAULT_SYSTEM_PROMPT
+                    st.session_state.saved_user_prompt_template = DEFAULT_USER_PROMPT_TEMPLATE
                     st.rerun()
             
             # 현재 프롬프트 미리보기
@@ -404,176 +1474,185 @@ def main():
         with tab2:
             st.markdown("#### 📊 TM")
             
-            # TM 파일 업로드
+            library = get_tm_library()
+            
+            # 새 TM 모음 만들기 (만든 모음을 바로 이 세션에서 고름)
+            with st.expander("➕ 새 TM 모음"):
+                with st.form("tm_create_form", clear_on_submit=True):
+                    new_name = st.text_input("모음 이름", key="tm_new_name", placeholder="예: 회의록 용어")
+                    create = st.form_submit_button("만들기", use_container_width=True)
+                if create:
+                    try:
+                        st.session_state.tm_collection = library.create(new_name).name
+                    except ValueError as e:
+                        st.warning(str(e))
+            
+            # 세션에는 고른 모음의 이름만 저장 (다른 세션이 같은 모음을 고르면 같은 항목을 같이 씀)
+            names = library.names()
+            if st.session_state.get('tm_collection') not in names:
+                st.session_state.pop('tm_collection', None)
+            collection = st.selectbox(
+                "TM 모음",
+                names,
+                index=None,
+                key="tm_collection",
+                placeholder="모음을 고르세요",
+                help="가져오기·편집·삭제는 고른 모음에만 적용됩니다"
+            )
+            store = library.get(collection) if collection is not None else None
+            
+            if store is None:
+                st.info("📝 사용할 TM 모음을 고르거나 새로 만드세요")
+                st.markdown("**TM 파일 형식 안내:**")
+                st.markdown("- Excel (.xlsx) 또는 CSV 파일")
+                return
+            
+            # TM 파일 가져오기 (같은 파일은 한 번만, 바뀐 행만 이 모음의 저장소와 색인에 반영)
             uploaded_tm_file = st.file_uploader(
-                "TM 파일 업로드", 
+                "TM 파일 가져오기", 
                 type=['xlsx', 'csv'],
-                help="번역 메모리 파일을 업로드하세요. 첫 번째 컬럼은 원본 텍스트, 두 번째 컬럼은 교정된 텍스트여야 합니다."
+                help="번역 메모리 파일을 업로드하세요. 첫 번째 컬럼은 원본 텍스트, 두 번째 컬럼은 교정된 텍스트여야 합니다. "
+                     "가져온 항목은 고른 모음에 들어가고 저장소에 계속 남습니다."
+            )
+            import_mode = st.radio(
+                "가져오기 방식",
+                TM_IMPORT_MODES,
+                horizontal=True,
+                key="tm_import_mode",
+                help="병합: 기존 항목에 더함 (같은 원본은 덮어씀) · 교체: 파일에 없는 기존 항목은 지움"
             )
             
-            # TM 데이터 처리
             if uploaded_tm_file is not None:
-                try:
-                    if uploaded_tm_file.name.endswith('.xlsx'):
-                        tm_df = pd.read_excel(uploaded_tm_file, dtype=str)
+                import_id = (collection, uploaded_tm_file.file_id, import_mode)
+                if st.session_state.get('tm_import_id') != import_id:
+                    try:
+                        st.session_state.tm_import_result = store.import_file(
+                            uploaded_tm_file.getvalue(), uploaded_tm_file.name, replace=import_mode == TM_IMPORT_REPLACE)
+                        st.session_state.tm_import_id = import_id
+                    except Exception as e:
+                        st.error(f"TM 파일 가져오기 실패: {e}")
+                        st.session_state.tm_import_result = None
+                        st.session_state.tm_import_id = None
+                result = st.session_state.get('tm_import_result')
+                if result and st.session_state.get('tm_import_id') == import_id:
+                    st.success(f"✅ TM 파일 가져오기 완료! ({result['rows']}개 항목: 추가 {result['added']} · "
+                               f"수정 {result['updated']} · 삭제 {result['deleted']} · 변경 없음 {result['unchanged']})")
+            
+            # 항목 하나씩 추가/수정/삭제 (파일을 다시 올리지 않고 바로 반영)
+            with st.expander("✏️ TM 항목 편집"):
+                with st.form("tm_edit_form", clear_on_submit=True):
+                    source_text = st.text_input("원본", key="tm_edit_source")
+                    target_text = st.text_input("교정", key="tm_edit_target", help="삭제할 때는 비워 둬도 됩니다")
+                    col1, col2 = st.columns(2)
+                    save = col1.form_submit_button("💾 저장", use_container_width=True)
+                    remove = col2.form_submit_button("🗑️ 삭제", use_container_width=True)
+                if save:
+                    try:
+                        outcome = store.upsert(source_text, target_text)
+                        st.success({"added": "추가했습니다", "updated": "수정했습니다",
+                                    "unchanged": "이미 같은 항목이 있습니다"}[outcome])
+                    except ValueError as e:
+                        st.warning(str(e))
+                if remove:
+                    if store.delete(source_text):
+                        st.success("삭제했습니다")
                     else:
-                        tm_df = pd.read_csv(uploaded_tm_file, dtype=str)
-                    
-                    # 세션 상태에 TM 데이터 저장
-                    st.session_state.tm_df = tm_df
-                    
-                    st.success(f"✅ TM 파일 로드 완료! ({len(tm_df)}개 항목)")
-                    
-                    # TM 데이터 미리보기
-                    with st.expander("TM 데이터 미리보기"):
-                        st.dataframe(tm_df.head(10))
-                        
-                except Exception as e:
-                    st.error(f"TM 파일 로드 실패: {e}")
-                    st.session_state.tm_df = None
-            else:
-                # TM 파일이 없으면 세션 상태 초기화
-                if 'tm_df' not in st.session_state:
-                    st.session_state.tm_df = None
+                        st.warning("TM에 없는 원본입니다")
+                
+                query = st.text_input("검색", key="tm_search", placeholder="원본 또는 교정 표기")
+                if query.strip():
+                    st.dataframe(store.search(query), hide_index=True)
             
             # 현재 TM 상태 표시
-            if st.session_state.get('tm_df') is not None:
-                st.info(f"🔄 현재 TM: {len(st.session_state.tm_df)}개 항목 활성화됨")
+            if len(store):
+                st.info(f"🔄 현재 TM: {collection} ({len(store)}개 항목) 활성화됨")
+                
+                st.toggle("TM 교정 사용", value=True, key="tm_enabled", help="끄면 이 세션에서만 TM 없이 처리합니다")
                 
+                st.selectbox(
+                    "근사 일치 허용 거리",
+                    FUZZY_TM_DISTANCES,
+                    index=FUZZY_TM_DISTANCES.index(FUZZY_TM_DEFAULT_DISTANCE),
+                    key="tm_fuzzy_distance",
+                    help="TM 원본 표기와 자모가 이만큼 달라도 교정합니다 (0: 발음이 같은 표기만, 클수록 더 많이 교정하지만 잘못 고칠 수 있음)"
+                )
+                
+                # TM 데이터 미리보기
+                with st.expander("TM 데이터 미리보기"):
+                    st.dataframe(store.preview(10))
+            else:
+                st.info(f"📝 {collection} 모음에 저장된 TM이 없습니다")
+                st.markdown("**TM 파일 형식 안내:**")
+                st.markdown("- Excel (.xlsx) 또는 CSV 파일")
+            
+            if len(store):
                 # TM 관리 버튼들
                 st.markdown("---")
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("🗑️ TM 삭제", key="clear_tm", use_container_width=True):
-                        st.session_state.tm_df = None
-                        st.success("TM 데이터가 삭제되었습니다!")
-                        st.rerun()
+                        st.session_state.confirm_clear_tm = True
                 
                 with col2:
-                    if st.button("📊 TM 통계", key="tm_stats", use_container_width=True):
-                        with st.expander("TM 통계 정보", expanded=True):
-                            st.write(f"**총 항목 수:** {len(st.session_state.tm_df)}")
-                            st.write(f"**컬럼 수:** {len(st.session_state.tm_df.columns)}")
-                            st.write(f"**컬럼명:** {', '.join(st.session_state.tm_df.columns.tolist())}")
-            else:
-                st.info("📝 TM 파일이 업로드되지 않았습니다")
-                st.markdown("---")
-                st.markdown("**TM 파일 형식 안내:**")
-                st.markdown("- Excel (.xlsx) 또는 CSV 파일")
+                    show_tm_stats = st.button("📊 TM 통계", key="tm_stats", use_container_width=True)
+                
+                # 같은 모음을 고른 다른 세션에도 적용되므로 한 번 더 확인
+                if st.session_state.get('confirm_clear_tm'):
+                    st.warning(f"{collection} 모음의 TM {len(store)}개 항목을 모두 지웁니다 (이 모음을 쓰는 모든 세션에 적용, "
+                               f"다른 모음은 그대로).")
+                    col1, col2 = st.columns(2)
+                    if col1.button("삭제", key="confirm_clear_tm_yes", type="primary", use_container_width=True):
+                        store.clear()
+                        st.session_state.confirm_clear_tm = False
+                        st.session_state.tm_import_id = None
+                        st.session_state.tm_import_result = None
+                        st.rerun()
+                    if col2.button("취소", key="confirm_clear_tm_no", use_container_width=True):
+                        st.session_state.confirm_clear_tm = False
+                        st.rerun()
+                
+                if show_tm_stats:
+                    # 전체 행을 다시 세지 않고 저장소가 유지하는 카운터를 보여줌
+                    stats = store.stats()
+                    with st.expander("TM 통계 정보", expanded=True):
+                        st.write(f"**총 항목 수:** {stats['entries']}")
+                        st.write(f"**교정 표기 수:** {stats['terms']} · **근사 일치 표기 수:** {stats['fuzzy_forms']}")
+                        st.write(f"**변경 (프로세스에서 이 모음을 연 뒤):** 추가 {stats['added']} · 수정 {stats['updated']} · "
+                                 f"삭제 {stats['deleted']} · 파일 가져오기 {stats['imports']}회")
+                        last_import = stats['last_import']
+                        if last_import:
+                            st.write(f"**마지막 가져오기:** {last_import['filename']} ({last_import['rows']}개 항목, "
+                                     f"{last_import['seconds'] * 1000:.0f}ms)")
+                        size = f"{stats['file_bytes'] / (1024 * 1024):.1f}MB" if stats['file_bytes'] is not None else "메모리"
+                        st.write(f"**저장소 (모든 모음):** {size} · 이 모음 색인 {stats['load_seconds']:.2f}초")
 
-    # 음성 및 텍스트 입력
-    st.subheader("음성 및 텍스트 입력")
-    
-    # 세션 상태 초기화
-    if 'recognized_text' not in st.session_state:
-        st.session_state.recognized_text = None
-    if 'tm_corrected_text' not in st.session_state:
-        st.session_state.tm_corrected_text = None
-    if 'corrected_text' not in st.session_state:
-        st.session_state.corrected_text = None
-    if 'translated_text' not in st.session_state:
-        st.session_state.translated_text = None
-    if 'is_recording' not in st.session_state:
-        st.session_state.is_recording = False
-
-    # 음성 입력 부분
-    st.markdown("#### 🎤 음성으로 입력하기")
-    
-    # 마이크 버튼
-    if st.session_state.is_recording:
-        button_text = "🔴 녹음 중 (클릭하여 종료)"
-        button_type = "secondary"
-    else:
-        button_text = "🎤 마이크 시작"
-        button_type = "primary"
-
-    if st.button(button_text, key='mic_button', type=button_type):
-        if not st.session_state.is_recording:
-            # 녹음 시작
-            st.session_state.is_recording = True
-            st.rerun()  # 버튼 상태를 즉시 업데이트
-        else:
-            # 녹음 종료
-            st.session_state.is_recording = False
-            global stop_recording
-            stop_recording = True
-            st.rerun()  # 버튼 상태를 즉시 업데이트
-
-    # 녹음 중일 때 음성 인식 실행
-    if st.session_state.is_recording:
-        with st.spinner("🎤 음성을 인식하는 중... (1.5초 멈추면 자동 종료)"):
-            user_input = recognize_speech_with_interrupt()
-            
-        # 녹음 완료 후 처리
-        st.session_state.is_recording = False
-        
-        if user_input and "중단되었습니다" not in user_input and "인식할 수 없습니다" not in user_input:
-            process_text_input(user_input, "음성")
-            st.rerun()
-        elif user_input:
-            if "중단되었습니다" in user_input:
-                st.info("🔴 녹음이 중단되었습니다.")
-            else:
-                st.warning(f"⚠️ {user_input}")
+def main():
+    with timed_script_run("app"):
+        st.title("STT 교정 테스트")
         
-        st.rerun()  # 버튼 상태 업데이트
+        # 사이드바에 탭 기능 추가 (설정은 바꿀 때만 전체 실행)
+        show_sidebar()
 
-    # 텍스트 입력 부분 (음성 입력 아래에 추가)
-    st.markdown("#### 텍스트로 직접 입력하기")
-    
-    # 텍스트 입력 필드
-    text_input = st.text_area("텍스트를 입력하세요:", 
-                               height=100,
-                               placeholder="ex. 안녕하세요")
-    
-    # 처리하기 버튼
-    if st.button("🔄 처리하기", key="text_input_button", use_container_width=True):
-        if text_input.strip():
-            process_text_input(text_input.strip(), "텍스트")
-            st.rerun()
-        else:
-            st.warning("텍스트를 입력해주세요!")
-
-    # 디버깅 정보 표시 (처리하기 버튼 바로 아래)
-    if st.session_state.get('debug_info'):
-        with st.expander("🔍 디버깅 정보"):
-            for key, value in st.session_state.debug_info.items():
-                st.write(f"**{key}:**")
-                if key in ["System Prompt", "User Prompt"]:
-                    st.code(value, language="text")
-                else:
-                    st.write(value)
-
-    # 결과 표시
-    if st.session_state.get('recognized_text'):
-        st.markdown("---")
-        st.subheader("📋 처리 결과")
+        # 음성 및 텍스트 입력
+        st.subheader("음성 및 텍스트 입력")
         
-        # 결과를 카드 형태로 표시
-        with st.container():
-            st.markdown("**🔤 입력받은 내용:**")
-            st.info(st.session_state.recognized_text)
-                
-        if st.session_state.get('corrected_text'):
-            with st.container():
-                st.markdown("**🔍 검수:**")
-                st.success(st.session_state.corrected_text)
-            
-        if st.session_state.get('tm_corrected_text'):
-            with st.container():
-                if st.session_state.corrected_text != st.session_state.tm_corrected_text:
-                    # TM이 적용된 경우
-                    st.markdown("**📊 TM 교정:**")
-                    st.success(st.session_state.tm_corrected_text)
-                else:
-                    # TM이 적용되지 않은 경우
-                    st.markdown("**📊 TM 교정: TM 적용되지 않음**")
-                    st.success(st.session_state.corrected_text)
-                
-        if st.session_state.get('translated_text'):
-            with st.container():
-                st.markdown("**🌐 번역:**")
-                st.success(st.session_state.translated_text)
+        # 세션 상태 초기화
+        if 'recognized_text' not in st.session_state:
+            st.session_state.recognized_text = None
+        if 'tm_corrected_text' not in st.session_state:
+            st.session_state.tm_corrected_text = None
+        if 'corrected_text' not in st.session_state:
+            st.session_state.corrected_text = None
+        if 'translated_text' not in st.session_state:
+            st.session_state.translated_text = None
+        if 'extra_translations' not in st.session_state:
+            st.session_state.extra_translations = {}
+        if 'is_recording' not in st.session_state:
+            st.session_state.is_recording = False
+
+        # 옵션과 작업 영역은 각각 fragment로 그려, 버튼·옵션 조작과 처리 완료 때 해당 영역만 다시 실행
+        show_options()
+        show_workspace()
 
 
 if __name__ == "__main__":
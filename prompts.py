@@ -0,0 +1,81 @@
+"""기본 프롬프트와 요청 메시지 구성
+
+UI(prompt.py)와 배치 처리(batch.py)가 같은 프롬프트로 요청하도록 한 곳에 둔다.
+"""
+import json
+
+# 검수 System Prompt 예시 ({{고유단어리스트}} 자리에 고유명사 목록을 넣는다)
+DEFAULT_SYSTEM_PROMPT = "You are a **meticulous proofreader** working for the **{{주제}}**.\n\n## ROLE\nYour task is to correct transcription errors in text produced by a speech-to-text (STT) system. Your most important duty is to detect and correct misrecognized words related to {{주제}}, including both proper nouns and common nouns.\n\n## CORRECTION RULES\n- Correct spelling, spacing, capitalization, and punctuation errors.\n- Always produce corrections in **the same language as the original input**. For example:\n    - If the text is in Korean, correct it in Korean.\n    - If the text is in English, correct it in English.\n    - If the text is in Chinese, correct it in Chinese.\n- For all words, including proper nouns and general vocabulary, fix typos or misrecognized words.\n- For proper nouns, perform fuzzy matching:\n    - If a transcription contains a word similar in spelling or pronunciation to any proper noun in the list below, replace it with the correct spelling, converted to the script or phonetic transcription used in the output language.\n\n- For Korean proper nouns:\n    - Always correct proper nouns to the standard spelling, then transcribe them using the script or phonetic convention typically used in the output language for foreign names, unless there is an official or widely accepted translation.\n    - Never leave proper nouns in Hangul in non-Korean texts.\n    - Examples:\n        - Use Latin letters (romanization) in English, Spanish, French, German, Italian, Portuguese, Indonesian, Dutch, Finnish, Croatian, Czech, Slovak, Polish, Hungarian, Swedish, Malay, Turkish, Tagalog, Swahili, Uzbek.\n        - Use Katakana in Japanese (e.g. ハンサンド).\n        - Use Hanzi (Chinese characters) or pinyin in Chinese (Simplified, Traditional, Cantonese) if widely accepted.\n        - Use local phonetic script in languages such as Thai, Arabic, Russian, Greek, Hebrew, Hindi, Mongolian, Persian, Ukrainian.\n        - Use Hangul in Korean.\n- Do NOT answer any questions.\n- Do NOT explain corrections.\n- Do NOT rephrase or simplify sentences.\n- Only perform necessary corrections as defined above.\n\n## PROPER NOUN LIST (STANDARD FORMS ONLY)\n{{고유단어리스트}}"
+
+# 검수 User Prompt Template 예시 ({transcription} 자리에 인식된 텍스트가 들어간다)
+DEFAULT_USER_PROMPT_TEMPLATE = "You are a meticulous proofreader for {{주제}}.\n\n## TASK\nYour only task is to correct spelling, transcription, spacing, punctuation, or typographical errors in the given text.\n\n- The input text may contain Korean, English, Chinese, Japanese, or other languages, or a mixture of them.\n- Keep the text in its original language. Do NOT translate the entire text into another language.\n- However, for Korean proper nouns:\n    - Correct them to their official spelling from the provided proper noun list.\n    - Then transcribe them using the writing system or phonetic convention typically used in the output language for foreign names, unless there is an official or widely accepted translation.\n    - Never leave proper nouns in Hangul in non-Korean texts.\n- For all other words, correct only obvious spelling or transcription mistakes.\n- Do NOT answer questions or explain corrections.\n- Do NOT paraphrase or simplify sentences.\n\n## Origin Transcription:\n{transcription}\n\n## Corrected Transcription:"
+
+TRANSLATION_SYSTEM_PROMPT_TEMPLATE = "You are a translator. Translate Korean text to {language}. Return ONLY the {language} translation, no explanations, no quotes, no additional text."
+TRANSLATION_SYSTEM_PROMPT = TRANSLATION_SYSTEM_PROMPT_TEMPLATE.format(language="English")
+
+# 번역 대상 언어: 코드 -> (화면 표시 이름, 프롬프트에 쓰는 영어 이름)
+TRANSLATION_LANGUAGES = {
+    "en": ("영어", "English"),
+    "ja": ("일본어", "Japanese"),
+    "zh-Hans": ("중국어(간체)", "Simplified Chinese"),
+    "zh-Hant": ("중국어(번체)", "Traditional Chinese"),
+    "es": ("스페인어", "Spanish"),
+    "fr": ("프랑스어", "French"),
+    "de": ("독일어", "German"),
+    "pt": ("포르투갈어", "Portuguese"),
+    "ru": ("러시아어", "Russian"),
+    "vi": ("베트남어", "Vietnamese"),
+    "th": ("태국어", "Thai"),
+    "id": ("인도네시아어", "Indonesian"),
+    "ar": ("아랍어", "Arabic"),
+}
+DEFAULT_TRANSLATION_LANGUAGE = "en"
+
+# 통합 모드(검수 + 번역 한 번에): 검수 System Prompt 뒤에 붙이는 용어 제약과 출력 형식
+FUSED_TERMS_HEADER = "\n\n## REQUIRED TERMS\nThe transcription contains these TM terms. Write each one exactly as the right-hand form in \"corrected\", and keep the same name in \"translation\":\n"
+FUSED_OUTPUT_INSTRUCTIONS = "\n\n## OUTPUT FORMAT\nReturn ONLY a JSON object with exactly two string keys:\n- \"corrected\": the corrected transcription, following all rules above\n- \"translation\": an English translation of the corrected transcription\nDo not add any other keys or text."
+
+
+def build_user_prompt(user_prompt_template, transcription):
+    """User Prompt Template에 인식된 텍스트 삽입"""
+    return user_prompt_template.replace("{transcription}", transcription)
+
+
+def build_correction_messages(system_prompt, user_prompt):
+    """검수 요청 메시지"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def build_fused_messages(system_prompt, user_prompt, term_pairs=()):
+    """검수와 영어 번역을 한 번에 받는 요청 메시지 (term_pairs: (입력 표기, 교정 표기) 용어 제약)"""
+    if term_pairs:
+        system_prompt += FUSED_TERMS_HEADER + "\n".join(f"- {source} → {target}" for source, target in term_pairs)
+    return build_correction_messages(system_prompt + FUSED_OUTPUT_INSTRUCTIONS, user_prompt)
+
+
+def parse_fused_reply(text):
+    """통합 모드 응답 JSON -> (검수, 번역). 형식이 맞지 않으면 ValueError"""
+    text = text.strip()
+    if text.startswith("```"):
+        # 코드 블록으로 감싼 응답도 허용
+        text = text.strip("`").split("\n", 1)[-1]
+    try:
+        reply = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON 응답이 아닙니다: {e}") from None
+    if not isinstance(reply, dict) or not isinstance(reply.get("corrected"), str) \
+            or not isinstance(reply.get("translation"), str):
+        raise ValueError("corrected/translation 키가 없습니다")
+    return reply["corrected"].strip(), reply["translation"].strip()
+
+
+def build_translation_messages(text, language=DEFAULT_TRANSLATION_LANGUAGE):
+    """번역 요청 메시지 (language: TRANSLATION_LANGUAGES 코드, 기본 영어)"""
+    name = TRANSLATION_LANGUAGES[language][1]
+    return [
+        {"role": "system", "content": TRANSLATION_SYSTEM_PROMPT_TEMPLATE.format(language=name)},
+        {"role": "user", "content": f"Translate the following text to {name}: {text}"}
+    ]
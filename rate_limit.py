@@ -0,0 +1,47 @@
+"""토큰 버킷 요청 속도 제한
+
+초당 rate개씩 토큰이 차고 최대 capacity개까지 쌓인다. 요청 하나가 토큰 하나를 쓴다.
+스레드(acquire)와 asyncio(acquire_async) 양쪽에서 같은 버킷을 공유할 수 있다.
+"""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """초당 rate개, 최대 capacity개까지 허용하는 토큰 버킷"""
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate는 0보다 커야 합니다")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """토큰을 선점하고, 실제로 쓸 수 있을 때까지 기다려야 할 시간(초) 반환"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            # 모자란 만큼은 앞으로 채워질 토큰에서 미리 빌려 씀 (대기 순서가 곧 사용 순서)
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """토큰을 얻을 때까지 현재 스레드에서 대기"""
+        wait_seconds = self._reserve(tokens)
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+        return wait_seconds
+
+    async def acquire_async(self, tokens=1):
+        """토큰을 얻을 때까지 이벤트 루프를 막지 않고 대기"""
+        wait_seconds = self._reserve(tokens)
+        if wait_seconds > 0:
+            await asyncio.sleep(wait_seconds)
+        return wait_seconds
@@ -0,0 +1,216 @@
+"""세션별 녹음 컨트롤러
+
+녹음과 인식은 백그라운드 작업 스레드에서 진행하고, 종료 요청과 완료 통지는 threading.Event로 주고받는다.
+스크립트 스레드는 녹음을 시작만 하고 바로 돌아가므로, 종료 버튼은 오디오 청크 하나(수십 ms) 안에 반영된다.
+주변 소음 보정값은 입력 장치별로 캐시해 녹음마다 1초씩 보정하지 않는다.
+"""
+import threading
+import time
+
+import speech_recognition as sr
+
+from stt import SpeechSegmenter, StreamingTranscriber
+
+
+class NoiseCalibrationCache:
+    """입력 장치별 말소리 판단 임계값 캐시 (프로세스 공용)"""
+
+    def __init__(self, ttl_seconds=300.0, duration=1.0, default_threshold=300):
+        self.ttl_seconds = ttl_seconds
+        self.duration = duration
+        self.default_threshold = default_threshold
+        self._thresholds = {}  # 장치 -> (임계값, 보정 시각)
+        self._lock = threading.Lock()
+
+    def get_threshold(self, device_index, source):
+        """캐시된 임계값을 쓰고, 없거나 오래됐으면 source로 다시 보정"""
+        with self._lock:
+            cached = self._thresholds.get(device_index)
+            if cached is not None and time.monotonic() - cached[1] < self.ttl_seconds:
+                return cached[0]
+
+        calibration = sr.Recognizer()
+        calibration.energy_threshold = self.default_threshold
+        calibration.adjust_for_ambient_noise(source, duration=self.duration)
+        with self._lock:
+            self._thresholds[device_index] = (calibration.energy_threshold, time.monotonic())
+        return calibration.energy_threshold
+
+    def invalidate(self, device_index=None):
+        with self._lock:
+            self._thresholds.pop(device_index, None)
+
+
+class _TimedRecognizer:
+    """인식 호출마다 (시작, 끝) perf_counter 시각을 기록하는 래퍼
+
+    preprocessor(AudioPreprocessor)가 있으면 인식 직전에 오디오를 전처리하고 (시작, 끝, 보고)를 따로 남긴다.
+    energy_threshold는 녹음 때 보정한 임계값을 돌려주는 함수다.
+    admission(scheduler.SessionAdmission)이 있으면 공용 스케줄러의 슬롯을 받은 뒤 인식하고,
+    기다린 시간(초)을 queue_waits에 (spans와 같은 순서로) 남긴다.
+    """
+
+    def __init__(self, recognizer, spans, lock, preprocessor=None, preprocess_spans=None, energy_threshold=None,
+                 admission=None, queue_waits=None):
+        self.recognizer = recognizer
+        self.spans = spans
+        self.lock = lock
+        self.preprocessor = preprocessor
+        self.preprocess_spans = preprocess_spans
+        self.energy_threshold = energy_threshold or (lambda: None)
+        self.admission = admission
+        self.queue_waits = queue_waits
+
+    def recognize(self, audio_data):
+        if self.preprocessor is not None:
+            start = time.perf_counter()
+            audio_data, report = self.preprocessor.process(audio_data, self.energy_threshold())
+            with self.lock:
+                self.preprocess_spans.append((start, time.perf_counter(), report))
+        if self.admission is None:
+            return self._recognize(audio_data, None)
+        with self.admission.slot() as waited:
+            return self._recognize(audio_data, waited)
+
+    def _recognize(self, audio_data, waited):
+        start = time.perf_counter()
+        try:
+            return self.recognizer.recognize(audio_data)
+        finally:
+            with self.lock:
+                self.spans.append((start, time.perf_counter()))
+                if self.queue_waits is not None:
+                    self.queue_waits.append(waited)
+
+
+class RecordingController:
+    """세션 하나의 녹음 상태
+
+    start()는 작업 스레드를 띄우고 바로 반환한다. stop()은 종료 이벤트만 세우며,
+    작업 스레드는 다음 오디오 청크에서 녹음을 멈추고 그때까지 들어온 음성을 인식한다.
+
+    streaming=True면 발화 구간마다 바로 인식하고, segment_consumer(인식 텍스트 제너레이터)가 주어지면
+    같은 작업 스레드에서 그 결과를 넘겨 후속 처리(검수/번역 등)까지 진행한다.
+    preprocessor(AudioPreprocessor)가 주어지면 구간마다 인식 전에 리샘플링·무음 자르기·FLAC 인코딩을 거친다.
+    admission(scheduler.SessionAdmission)이 주어지면 인식 요청마다 공용 스케줄러의 슬롯을 받는다.
+    """
+
+    def __init__(self, recognizer, calibration_cache, device_index=None, segmenter_factory=None,
+                 source_factory=None):
+        self.recognizer = recognizer
+        self.calibration_cache = calibration_cache
+        self.device_index = device_index
+        self.segmenter_factory = segmenter_factory or (
+            lambda: SpeechSegmenter(split_pause=0.5, end_pause=1.5, speech_timeout=30, max_total_seconds=60))
+        # 테스트에서는 sr.AudioFile 등으로 바꿔 끼울 수 있음
+        self.source_factory = source_factory or (lambda: sr.Microphone(device_index=self.device_index))
+        self._stop_event = threading.Event()
+        self._done_event = threading.Event()
+        self._done_event.set()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.streaming = False
+        self.transcripts = []  # 인식된 구간 텍스트 (발화 순서)
+        self.output = None  # segment_consumer의 반환값
+        self.error = None
+        self.started_at = None
+        self.capture_ended_at = None
+        self.recognition_spans = []  # 인식 호출별 (시작, 끝) perf_counter 시각
+        self.preprocess_spans = []  # 전처리별 (시작, 끝, 보고)
+        self.queue_waits = []  # 인식 호출별 스케줄러 대기 시간(초, 스케줄러가 없으면 None; recognition_spans와 같은 순서)
+        self.admission = None  # 이번 녹음의 인식 요청이 슬롯을 받을 스케줄러
+        self.energy_threshold = None  # 이번 녹음에 쓴 말소리 판단 임계값
+        self.finished_at = None
+
+    @property
+    def capture_seconds(self):
+        """녹음 시작 ~ 녹음 종료 (초)"""
+        if self.started_at is None or self.capture_ended_at is None:
+            return None
+        return self.capture_ended_at - self.started_at
+
+    @property
+    def is_active(self):
+        return not self._done_event.is_set()
+
+    @property
+    def stop_requested(self):
+        return self._stop_event.is_set()
+
+    @property
+    def transcript(self):
+        """지금까지 인식된 전체 텍스트"""
+        with self._lock:
+            return " ".join(self.transcripts)
+
+    def start(self, streaming=False, segment_consumer=None, preprocessor=None, admission=None):
+        """녹음 시작 (이미 녹음 중이면 무시). 호출한 스레드는 기다리지 않는다."""
+        with self._lock:
+            if self.is_active:
+                return False
+            self._reset()
+            self.streaming = streaming
+            self.admission = admission
+            self.started_at = time.perf_counter()
+            self._stop_event.clear()
+            self._done_event.clear()
+            self._thread = threading.Thread(target=self._run, args=(streaming, segment_consumer, preprocessor),
+                                            daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """녹음 종료 요청 (즉시 반환)"""
+        self._stop_event.set()
+
+    def wait(self, timeout=None):
+        """녹음과 인식이 끝날 때까지 대기. 끝났으면 True"""
+        return self._done_event.wait(timeout)
+
+    def _segments(self):
+        """소스를 열고 발화 구간을 생성 (녹음 스레드에서 실행)"""
+        segmenter = self.segmenter_factory()
+        with self.source_factory() as source:
+            segmenter.energy_threshold = self.calibration_cache.get_threshold(self.device_index, source)
+            self.energy_threshold = segmenter.energy_threshold
+            yield from segmenter.segments(source, should_stop=self._stop_event.is_set)
+        self.capture_ended_at = time.perf_counter()
+
+    def _track(self, texts):
+        for text in texts:
+            with self._lock:
+                self.transcripts.append(text)
+            yield text
+
+    def _run(self, streaming, segment_consumer, preprocessor):
+        recognizer = _TimedRecognizer(self.recognizer, self.recognition_spans, self._lock, preprocessor,
+                                      self.preprocess_spans, lambda: self.energy_threshold, self.admission,
+                                      self.queue_waits)
+        try:
+            if streaming:
+                texts = self._track(StreamingTranscriber(recognizer).transcribe(self._segments))
+                if segment_consumer is not None:
+                    self.output = segment_consumer(texts)
+                else:
+                    for _ in texts:
+                        pass
+            else:
+                # 한 번에 인식: 구간을 모두 이어 붙여 한 번만 요청
+                audio_segments = list(self._segments())
+                if audio_segments:
+                    first = audio_segments[0]
+                    audio_data = sr.AudioData(b"".join(a.frame_data for a in audio_segments),
+                                              first.sample_rate, first.sample_width)
+                    text = recognizer.recognize(audio_data)
+                    if text:
+                        with self._lock:
+                            self.transcripts.append(text)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished_at = time.perf_counter()
+            self._done_event.set()
+
@@ -0,0 +1,150 @@
+"""LLM 요청 정책: 단계별 마감 시간, 지터 지수 백오프 재시도, 헤징
+
+응답이 느린 요청 하나가 전체 흐름을 붙잡지 않도록 OpenAI 호출을 감싼다.
+
+- 마감 시간(deadline): 재시도·헤징을 포함한 한 단계의 전체 시간 한도. 넘으면 DeadlineExceeded.
+- 재시도: 재시도 가능한 오류(속도 제한, 연결 오류, 서버 오류)는 전체 지터를 넣은 지수 백오프 뒤 다시 요청한다.
+- 헤징(hedge_delay): 첫 요청이 그 시간 안에 끝나지 않으면 같은 요청을 하나 더 보내고 먼저 끝난 쪽을 쓴다.
+  보통 해당 단계의 최근 p95를 쓰므로 추가 요청은 느린 5% 정도에만 나간다.
+- 실행 슬롯(admission): 프로세스 공용 스케줄러(scheduler.SessionAdmission)의 슬롯을 받은 뒤에 요청을 보낸다.
+  대기열에서 기다린 시간도 마감 시간에 포함된다.
+
+OpenAI 클라이언트에 의존하는 부분은 request 함수 하나뿐이라 배치·UI 어디서든 쓸 수 있다.
+"""
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import openai
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# 마감 시간·헤징이 있는 요청을 실행하는 공용 스레드 (요청마다 스레드를 만들지 않음)
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-request")
+
+
+class DeadlineExceeded(TimeoutError):
+    """단계 마감 시간 초과"""
+
+
+def backoff_delay(attempt, base=0.25, maximum=4.0):
+    """attempt번째 재시도 전 대기 시간 (지수 백오프 + 전체 지터)"""
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+class RequestPolicy:
+    """요청 하나(한 단계)에 적용할 마감 시간·재시도·헤징 설정"""
+
+    def __init__(self, deadline=None, max_retries=2, backoff_base=0.25, backoff_max=4.0, hedge_delay=None,
+                 admission=None):
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_delay = hedge_delay
+        # 요청마다 실행 슬롯을 받을 스케줄러 (None이면 바로 요청)
+        self.admission = admission
+
+
+class _Attempt:
+    """진행 중인 요청 하나 (진 쪽은 cancelled가 켜져 스트리밍을 멈추고 부분 결과를 내보내지 않음)"""
+
+    def __init__(self, hedge):
+        self.hedge = hedge
+        self.cancelled = threading.Event()
+
+
+def run_with_policy(request, policy, report=None, context=None):
+    """request(timeout, attempt)를 정책에 따라 실행하고 먼저 성공한 결과를 반환
+
+    request에는 남은 시간(초, 마감이 없으면 None)과 _Attempt가 넘어간다. attempt.hedge가 참이면 헤징용 중복
+    요청이므로 부분 결과를 화면에 내보내지 않아야 하고, attempt.cancelled가 켜지면 스트리밍을 멈추면 된다.
+    응답을 기다리며 막혀 있는 요청은 남은 시간을 요청 타임아웃으로 걸어 마감을 넘기지 않게 한다.
+    report(dict)에는 재시도 횟수, 헤징 여부, 헤징 요청이 이겼는지를 기록한다.
+    context는 작업 스레드에서 요청 전에 부르는 함수다 (예: Streamlit 스크립트 컨텍스트 연결).
+    context가 함수를 반환하면 요청이 끝난 뒤 같은 스레드에서 불러 정리한다 (공용 스레드를 다음 요청에 깨끗이 돌려줌).
+    """
+    report = report if report is not None else {}
+    report.setdefault("retries", 0)
+    deadline_at = time.perf_counter() + policy.deadline if policy.deadline is not None else None
+    attempt = 0
+    while True:
+        try:
+            return _run_attempt(request, policy, deadline_at, report, context)
+        except RETRYABLE_ERRORS as e:
+            if attempt >= policy.max_retries:
+                raise
+            delay = backoff_delay(attempt, policy.backoff_base, policy.backoff_max)
+            if deadline_at is not None and time.perf_counter() + delay >= deadline_at:
+                report["deadline_exceeded"] = True
+                raise DeadlineExceeded(f"{policy.deadline:.1f}초 안에 응답을 받지 못했습니다 ({e})") from e
+            attempt += 1
+            report["retries"] = attempt
+            time.sleep(delay)
+
+
+def _remaining(deadline_at):
+    return None if deadline_at is None else deadline_at - time.perf_counter()
+
+
+def _run_attempt(request, policy, deadline_at, report, context):
+    if deadline_at is None and policy.hedge_delay is None:
+        # 마감도 헤징도 없으면 호출한 스레드에서 바로 실행
+        return request(None, _Attempt(hedge=False))
+
+    def task(timeout, attempt):
+        cleanup = context() if context is not None else None
+        try:
+            return request(timeout, attempt)
+        finally:
+            # 공용 스레드는 다른 세션의 요청도 실행하므로 붙였던 컨텍스트를 떼어 냄
+            if cleanup is not None:
+                cleanup()
+
+    def submit(hedge):
+        attempt = _Attempt(hedge)
+        future = _executor.submit(task, _remaining(deadline_at), attempt)
+        attempts[future] = attempt
+        return future
+
+    attempts = {}
+    hedge_at = time.perf_counter() + policy.hedge_delay if policy.hedge_delay is not None else None
+    pending = {submit(hedge=False)}
+    error = None
+    while pending:
+        timeout = _remaining(deadline_at)
+        if hedge_at is not None:
+            until_hedge = hedge_at - time.perf_counter()
+            timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+        done, pending = wait(pending, timeout=max(0.0, timeout) if timeout is not None else None,
+                             return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            # 먼저 끝난 요청을 쓰고 나머지는 멈추게 함
+            for other in pending:
+                attempts[other].cancelled.set()
+            report["hedge_won"] = attempts[future].hedge
+            return result
+        if not pending and (hedge_at is None or error is not None):
+            # 모든 요청이 실패 (헤징 전에 실패했으면 재시도 루프로)
+            raise error
+        remaining = _remaining(deadline_at)
+        if remaining is not None and remaining <= 0:
+            for other in pending:
+                attempts[other].cancelled.set()
+            report["deadline_exceeded"] = True
+            raise DeadlineExceeded(f"{policy.deadline:.1f}초 안에 응답을 받지 못했습니다")
+        if hedge_at is not None and time.perf_counter() >= hedge_at:
+            hedge_at = None
+            report["hedged"] = True
+            pending.add(submit(hedge=True))
+    raise error
@@ -0,0 +1,217 @@
+"""입력별 모델 선택과 LLM 생략 (검수 요청 라우팅)
+
+모든 요청을 큰 모델로 보내면 TM이 전부 덮는 두 단어짜리 발화도 같은 지연시간을 낸다.
+검수 요청마다 다음 순서로 경로를 정한다.
+
+1. TM 용어가 입력 전체를 덮으면 LLM을 부르지 않는다 (교정은 뒤이은 TM 단계가 한 번만 한다).
+2. 같은 요청의 응답이 캐시에 있으면 그대로 쓴다 (큰 모델 응답 먼저, 빠른 모델 응답은 검사를 통과할 때만).
+3. 짧고 단순한 입력은 빠른 모델로 보내고, 결과가 간단한 검사를 통과하지 못하면 큰 모델로 다시 요청한다.
+
+결정 내용은 RouteDecision에 남겨 Span 속성과 디버깅 정보로 보여준다.
+"""
+import difflib
+import re
+
+from hangul import is_hangul_syllable, is_ignored, normalize_text
+from llm import (DEFAULT_MAX_TOKENS, DEFAULT_MODEL, DEFAULT_TEMPERATURE, ChatResult, chat_completion,
+                 chat_completion_async)
+from llm_cache import make_cache_key
+from pipeline import split_sentences
+
+FAST_MODEL = "gpt-4o-mini"
+
+# 모델이 지시문을 따라 쓰거나 설명을 붙인 흔적
+_LEAK_PATTERN = re.compile(r"##|corrected transcription|origin transcription|proofreader", re.IGNORECASE)
+
+
+class RoutingPolicy:
+    """검수 모델 선택 규칙
+
+    fast_max_chars 글자(공백·문장 부호 제외) 이하의 한 문장이고 숫자가 없으면 빠른 모델을 쓴다.
+    숫자·단위는 인식 오류를 고치기 까다로워 큰 모델에 맡긴다.
+    """
+
+    def __init__(self, fast_model=FAST_MODEL, strong_model=DEFAULT_MODEL, fast_max_chars=30, fast_max_sentences=1,
+                 min_similarity=0.5, max_length_ratio=1.8):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.fast_max_chars = fast_max_chars
+        self.fast_max_sentences = fast_max_sentences
+        self.min_similarity = min_similarity
+        self.max_length_ratio = max_length_ratio
+
+    def choose_model(self, text):
+        """(모델, 이유)"""
+        length = len(normalize_text(text))
+        if length > self.fast_max_chars:
+            return self.strong_model, f"긴 입력 {length}자"
+        sentences = len(split_sentences(text))
+        if sentences > self.fast_max_sentences:
+            return self.strong_model, f"{sentences}문장"
+        if any(char.isdigit() for char in text):
+            return self.strong_model, "숫자 포함"
+        return self.fast_model, f"짧은 입력 {length}자"
+
+    def check_correction(self, source, corrected):
+        """빠른 모델 검수 결과의 간단한 검사 (문제가 있으면 이유, 없으면 None)
+
+        검수는 고쳐 쓰기가 아니므로 길이와 글자 구성이 원문과 크게 달라지면 실패로 본다.
+        """
+        if not corrected:
+            return "빈 응답"
+        if _LEAK_PATTERN.search(corrected):
+            return "지시문 노출"
+        source_key = normalize_text(source)
+        corrected_key = normalize_text(corrected)
+        if not source_key:
+            return None
+        ratio = len(corrected_key) / len(source_key)
+        if ratio > self.max_length_ratio or ratio < 1 / self.max_length_ratio:
+            return f"길이 비율 {ratio:.2f}"
+        if any(is_hangul_syllable(char) for char in source_key) and \
+                not any(is_hangul_syllable(char) for char in corrected_key):
+            return "한글 없음"
+        similarity = difflib.SequenceMatcher(None, source_key, corrected_key).ratio()
+        if similarity < self.min_similarity:
+            return f"원문 유사도 {similarity:.2f}"
+        return None
+
+    def check_translation(self, source, translated):
+        """빠른 모델 번역 결과의 간단한 검사 (문제가 있으면 이유, 없으면 None)
+
+        번역은 길이와 글자 구성이 원문과 달라지는 것이 정상이므로 빈 응답, 지시문 노출, 원문 그대로만 본다.
+        """
+        if not translated:
+            return "빈 응답"
+        if _LEAK_PATTERN.search(translated):
+            return "지시문 노출"
+        if normalize_text(source) and normalize_text(translated) == normalize_text(source):
+            return "번역 안 됨"
+        return None
+
+
+def tm_resolves(text, tm_matcher, fuzzy_matcher=None, fuzzy_distance=None):
+    """TM 용어(정확 일치, 근사 일치)가 입력의 모든 글자(공백·문장 부호 제외)를 덮는지"""
+    if not text or tm_matcher is None:
+        return False
+    covered = [is_ignored(char) for char in text]
+    for start, end, _, _ in tm_matcher.find_matches(text):
+        covered[start:end] = [True] * (end - start)
+    if not all(covered) and fuzzy_matcher is not None and fuzzy_distance is not None:
+        for start, end, _, _, _ in fuzzy_matcher.find_matches(text, fuzzy_distance):
+            covered[start:end] = [True] * (end - start)
+    return all(covered)
+
+
+class RouteDecision:
+    """검수 요청 하나의 라우팅 결과"""
+
+    def __init__(self):
+        self.path = None  # "tm" / "cache" / "llm"
+        self.model = None  # 최종 결과를 낸 모델
+        self.first_model = None  # 처음 고른 모델 (대체 요청이 없으면 model과 같음)
+        self.reason = None
+        self.fallback_reason = None  # 빠른 모델 결과가 검사에 실패한 이유
+
+    def choose(self, path, model, reason):
+        self.path = path
+        self.model = self.first_model = model
+        self.reason = reason
+
+    def fall_back(self, model, reason):
+        self.model = model
+        self.fallback_reason = reason
+
+    def attributes(self):
+        """Span 속성으로 남길 값"""
+        return {"route": self.path, "model": self.model, "route_reason": self.reason,
+                "route_fallback": self.fallback_reason}
+
+    def describe(self):
+        if self.path == "tm":
+            return "TM으로 해결 (LLM 생략)"
+        text = f"{self.first_model} ({self.reason})"
+        if self.path == "cache":
+            text = f"캐시 · {text}"
+        if self.fallback_reason:
+            text += f" → 검사 실패({self.fallback_reason}) → {self.model}"
+        return text
+
+
+def _cached(policy, cache, messages, source, max_tokens, temperature):
+    """캐시에 있는 검수 응답 (큰 모델 것 먼저). (ChatResult, 모델) 또는 (None, None)"""
+    if cache is None:
+        return None, None
+    for model in (policy.strong_model, policy.fast_model):
+        text, cache_source = cache.lookup(make_cache_key(model, messages, max_tokens, temperature))
+        if text is None:
+            continue
+        if model == policy.fast_model and policy.check_correction(source, text):
+            continue
+        return ChatResult(text, 0.0, 0.0, cache_source=cache_source), model
+    return None, None
+
+
+def route_correction(client, messages, source, policy, resolved_text=None, max_tokens=DEFAULT_MAX_TOKENS,
+                     temperature=DEFAULT_TEMPERATURE, on_delta=None, cache=None, request_policy=None, context=None):
+    """라우팅을 거친 검수 요청. (ChatResult, RouteDecision)
+
+    resolved_text(TM 용어가 전부 덮는 입력)가 주어지면 LLM을 부르지 않고 그 텍스트를 그대로 돌려준다.
+    TM 교정은 호출하는 쪽의 TM 단계가 하므로 여기서 TM을 적용하지 않는다 (두 번 치환하지 않도록).
+    request_policy(RequestPolicy)와 context는 chat_completion에 그대로 넘긴다.
+    """
+    decision = RouteDecision()
+    if resolved_text is not None:
+        decision.choose("tm", None, "TM 전체 일치")
+        if on_delta is not None and resolved_text:
+            on_delta(resolved_text)
+        return ChatResult(resolved_text, 0.0, 0.0), decision
+
+    result, model = _cached(policy, cache, messages, source, max_tokens, temperature)
+    if result is not None:
+        decision.choose("cache", model, "같은 요청")
+        if on_delta is not None and result.text:
+            on_delta(result.text)
+        return result, decision
+
+    decision.choose("llm", *policy.choose_model(source))
+    result = chat_completion(client, messages, decision.model, max_tokens, temperature, on_delta=on_delta, cache=cache,
+                             policy=request_policy, context=context)
+    if decision.model != policy.strong_model:
+        problem = policy.check_correction(source, result.text)
+        if problem:
+            decision.fall_back(policy.strong_model, problem)
+            result = chat_completion(client, messages, policy.strong_model, max_tokens, temperature,
+                                     on_delta=on_delta, cache=cache, policy=request_policy, context=context)
+    return result, decision
+
+
+async def route_correction_async(client, messages, source, policy, resolved_text=None, max_tokens=DEFAULT_MAX_TOKENS,
+                                 temperature=DEFAULT_TEMPERATURE, cache=None, call=None):
+    """route_correction의 AsyncOpenAI 버전 (배치 처리용)
+
+    call(messages, model)을 넘기면 속도 제한·재시도를 거친 호출(텍스트 반환)로 요청한다.
+    """
+    if call is None:
+        async def call(messages, model):
+            result = await chat_completion_async(client, messages, model, max_tokens, temperature, cache=cache)
+            return result.text
+
+    decision = RouteDecision()
+    if resolved_text is not None:
+        decision.choose("tm", None, "TM 전체 일치")
+        return resolved_text, decision
+
+    result, model = _cached(policy, cache, messages, source, max_tokens, temperature)
+    if result is not None:
+        decision.choose("cache", model, "같은 요청")
+        return result.text, decision
+
+    decision.choose("llm", *policy.choose_model(source))
+    text = await call(messages, decision.model)
+    if decision.model != policy.strong_model:
+        problem = policy.check_correction(source, text)
+        if problem:
+            decision.fall_back(policy.strong_model, problem)
+            text = await call(messages, policy.strong_model)
+    return text, decision
@@ -0,0 +1,225 @@
+"""프로세스 공용 요청 스케줄러 (세션 간 공정 대기열 + 동시 실행 한도 + 공용 속도 제한)
+
+세션마다 작업 스레드가 따로 돌기 때문에 그대로 두면 접속자 수만큼 OpenAI·음성 인식 요청이 동시에 나가고,
+요청을 많이 보내는 세션 하나가 다른 세션을 밀어내거나 API 속도 제한에 걸리게 만든다.
+FairScheduler는 요청을 보내기 직전에 실행 슬롯을 받게 한다.
+
+- 동시 실행 한도(max_concurrent): 슬롯이 다 차면 다음 요청은 대기열에서 기다린다.
+- 세션별 공정 대기열: 세션마다 FIFO 대기열을 두고, 슬롯이 비면 세션을 돌아가며 하나씩 준다 (라운드 로빈).
+  요청을 여러 개 한꺼번에 넣은 세션도 한 바퀴에 하나씩만 받으므로 다른 세션이 뒤로 밀리지 않는다.
+- 공용 속도 제한(rate): 슬롯을 받은 요청은 모든 세션이 같이 쓰는 토큰 버킷에서 토큰을 하나 얻은 뒤 나간다.
+- 역압(backpressure): 전체 대기열이 max_queue(세션당 max_queue_per_session)를 넘으면 기다리지 않고
+  SchedulerOverloaded로 바로 거절한다. 기다리는 동안은 position()으로 대기 순서를 화면에 보여 줄 수 있다.
+
+슬롯은 요청을 보내는 스레드가 직접 기다린다 (작업을 다른 스레드로 옮기지 않으므로 마감 시간·헤징은 그대로 동작).
+"""
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import MetricsRegistry, percentile
+from rate_limit import TokenBucket
+
+
+class SchedulerOverloaded(RuntimeError):
+    """대기열이 가득 차 요청을 받지 않음"""
+
+
+class QueueTimeout(TimeoutError):
+    """대기열에서 기다리다 시간 초과 또는 취소"""
+
+
+class _Ticket:
+    """대기열에 선 요청 하나"""
+
+    __slots__ = ("session_id", "granted")
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.granted = threading.Event()
+
+
+class FairScheduler:
+    """세션별 라운드 로빈으로 실행 슬롯을 나눠 주는 스케줄러 (스레드 안전, 프로세스 공용)
+
+    rate가 있으면 초당 rate개(최대 burst개 몰아서)까지만 요청을 내보낸다.
+    대기 시간은 최근 window건을 모아 분위수로 보여 준다.
+    """
+
+    POLL_SECONDS = 0.05
+
+    def __init__(self, name, max_concurrent, rate=None, burst=None, max_queue=None, max_queue_per_session=None,
+                 window=1000):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent는 1 이상이어야 합니다")
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_queue = max_queue
+        self.max_queue_per_session = max_queue_per_session
+        self.window = window
+        self._lock = threading.Lock()
+        self._queues = collections.OrderedDict()  # 세션 -> deque[_Ticket] (순서가 곧 다음 차례)
+        self._queued = 0
+        self._active = 0
+        self._waits = collections.deque(maxlen=window)
+        self._wait_sum = 0.0
+        self._wait_count = 0
+        self.counters = {"granted": 0, "rejected": 0, "cancelled": 0}
+
+    def for_session(self, session_id):
+        """세션 하나의 요청에 쓸 SessionAdmission"""
+        return SessionAdmission(self, session_id)
+
+    @contextmanager
+    def slot(self, session_id, timeout=None, cancelled=None):
+        """실행 슬롯을 얻을 때까지 기다렸다가 블록을 실행 (기다린 시간(초)을 넘겨 줌)
+
+        timeout(초)이 지나거나 cancelled(threading.Event)가 켜지면 대기열에서 빠지고 QueueTimeout을 낸다.
+        """
+        waited = self._acquire(session_id, timeout, cancelled)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    def _acquire(self, session_id, timeout, cancelled):
+        started = time.perf_counter()
+        ticket = _Ticket(session_id)
+        with self._lock:
+            queue = self._queues.get(session_id)
+            if (self.max_queue is not None and self._queued >= self.max_queue) or (
+                    self.max_queue_per_session is not None and queue
+                    and len(queue) >= self.max_queue_per_session):
+                self.counters["rejected"] += 1
+                raise SchedulerOverloaded(f"{self.name} 대기열이 가득 찼습니다 (대기 {self._queued}건)")
+            if queue is None:
+                queue = self._queues[session_id] = collections.deque()
+            queue.append(ticket)
+            self._queued += 1
+            self._dispatch_locked()
+
+        deadline_at = started + timeout if timeout is not None else None
+        poll = self.POLL_SECONDS if (cancelled is not None or deadline_at is not None) else None
+        while not ticket.granted.wait(poll):
+            expired = deadline_at is not None and time.perf_counter() >= deadline_at
+            if expired or (cancelled is not None and cancelled.is_set()):
+                with self._lock:
+                    # 그 사이에 슬롯을 받았으면 그대로 진행
+                    if not ticket.granted.is_set():
+                        self._remove_locked(ticket)
+                        self.counters["cancelled"] += 1
+                        reason = "시간 초과" if expired else "취소"
+                        waited = time.perf_counter() - started
+                        raise QueueTimeout(f"{self.name} 대기열에서 {waited:.1f}초 기다리다 {reason}")
+
+        if self.bucket is not None:
+            self.bucket.acquire()
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._waits.append(waited)
+            self._wait_sum += waited
+            self._wait_count += 1
+        return waited
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch_locked()
+
+    def _dispatch_locked(self):
+        """빈 슬롯을 다음 차례 세션의 맨 앞 요청에 하나씩 줌"""
+        while self._active < self.max_concurrent and self._queues:
+            session_id, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            if queue:
+                self._queues.move_to_end(session_id)  # 남은 요청은 다른 세션들 뒤로
+            else:
+                del self._queues[session_id]
+            self._queued -= 1
+            self._active += 1
+            self.counters["granted"] += 1
+            ticket.granted.set()
+
+    def _remove_locked(self, ticket):
+        queue = self._queues[ticket.session_id]
+        queue.remove(ticket)
+        if not queue:
+            del self._queues[ticket.session_id]
+        self._queued -= 1
+
+    def position(self, session_id):
+        """세션의 다음 요청이 몇 번째 차례인지 (기다리는 요청이 없으면 0)"""
+        with self._lock:
+            for index, waiting_session in enumerate(self._queues):
+                if waiting_session == session_id:
+                    return index + 1
+            return 0
+
+    def stats(self):
+        """{"active", "max_concurrent", "queued", "sessions", "granted", "rejected", "cancelled",
+        "wait_count", "wait_sum", "p50", "p95", "p99"} (대기 시간은 초)"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update(active=self._active, max_concurrent=self.max_concurrent, queued=self._queued,
+                         sessions=len(self._queues), wait_count=self._wait_count, wait_sum=self._wait_sum)
+            waits = sorted(self._waits)
+        for quantile in MetricsRegistry.QUANTILES:
+            stats[f"p{int(quantile * 100)}"] = percentile(waits, quantile)
+        return stats
+
+
+class SessionAdmission:
+    """세션 하나에 묶인 FairScheduler (요청 정책·인식 래퍼에 넘기는 객체)"""
+
+    def __init__(self, scheduler, session_id):
+        self.scheduler = scheduler
+        self.session_id = session_id
+
+    def slot(self, timeout=None, cancelled=None):
+        return self.scheduler.slot(self.session_id, timeout, cancelled)
+
+    def position(self):
+        return self.scheduler.position(self.session_id)
+
+
+def format_scheduler_stats(schedulers):
+    """스케줄러별 상태를 디버깅 표시용 여러 줄로"""
+    lines = []
+    for scheduler in schedulers:
+        stats = scheduler.stats()
+        line = (f"{scheduler.name}: 실행 {stats['active']}/{stats['max_concurrent']} · 대기 {stats['queued']}건 "
+                f"({stats['sessions']}개 세션) · 거절 {stats['rejected']}건")
+        if stats["p50"] is not None:
+            line += f" · 대기 시간 p50 {stats['p50'] * 1000:.0f}ms / p95 {stats['p95'] * 1000:.0f}ms"
+        if scheduler.rate:
+            line += f" · 초당 {scheduler.rate:g}건 제한"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def export_scheduler_prometheus(schedulers, prefix="stt_pipeline"):
+    """대기열 길이·실행 중 요청 수·대기 시간·거절 수를 Prometheus 텍스트 노출 형식으로"""
+    snapshot = [(scheduler.name, scheduler.stats()) for scheduler in schedulers]
+    lines = []
+    for metric, kind, key, description in (
+            ("queue_depth", "gauge", "queued", "슬롯을 기다리는 요청 수"),
+            ("active", "gauge", "active", "실행 중인 요청 수"),
+            ("rejected_total", "counter", "rejected", "대기열이 가득 차 거절한 요청 수")):
+        lines.append(f"# HELP {prefix}_scheduler_{metric} {description}")
+        lines.append(f"# TYPE {prefix}_scheduler_{metric} {kind}")
+        for name, stats in snapshot:
+            lines.append(f'{prefix}_scheduler_{metric}{{scheduler="{name}"}} {stats[key]}')
+
+    lines.append(f"# HELP {prefix}_scheduler_wait_seconds 슬롯을 받기까지 기다린 시간 (최근 요청 기준 분위수)")
+    lines.append(f"# TYPE {prefix}_scheduler_wait_seconds summary")
+    for name, stats in snapshot:
+        for quantile in MetricsRegistry.QUANTILES:
+            value = stats[f"p{int(quantile * 100)}"]
+            if value is not None:
+                lines.append(f'{prefix}_scheduler_wait_seconds{{scheduler="{name}",quantile="{quantile}"}} {value:.6f}')
+        lines.append(f'{prefix}_scheduler_wait_seconds_sum{{scheduler="{name}"}} {stats["wait_sum"]:.6f}')
+        lines.append(f'{prefix}_scheduler_wait_seconds_count{{scheduler="{name}"}} {stats["wait_count"]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,250 @@
+"""스트리밍 음성 인식
+
+녹음을 끝까지 기다렸다가 한 번에 인식하는 대신, 말이 잠깐 멈출 때마다(음성 활동 감지) 구간을 잘라
+녹음이 계속되는 동안 구간별로 동시에 인식한다. 인식된 구간은 발화 순서대로 바로 넘겨준다.
+
+인식 엔진은 recognize(audio_data) -> str 메서드만 있으면 되며, 이름으로 등록해 골라 쓴다.
+Google(온라인) 외에 네트워크 없이 CPU에서 도는 Whisper(faster-whisper, 선택 의존성)도 쓸 수 있다.
+"""
+import audioop
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import speech_recognition as sr
+
+try:
+    import numpy as np
+    from faster_whisper import WhisperModel
+except ImportError:  # 선택 의존성: 없으면 whisper 엔진을 쓸 수 없음
+    WhisperModel = None
+
+
+class GoogleRecognizer:
+    """Google Web Speech API 인식 (speech_recognition 기본 엔진)"""
+
+    def __init__(self, language="ko-KR"):
+        self.language = language
+        self._recognizer = sr.Recognizer()
+
+    def recognize(self, audio_data):
+        """인식된 텍스트 (알아들을 수 없으면 빈 문자열, 서비스 오류는 sr.RequestError)"""
+        try:
+            return self._recognizer.recognize_google(audio_data, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+
+
+class WhisperRecognizer:
+    """faster-whisper(CTranslate2) 오프라인 CPU 인식
+
+    모델은 생성할 때 한 번 불러오고 짧은 묵음으로 한 번 돌려 두므로, 첫 발화부터 로컬 추론 시간만 걸린다.
+    여러 스레드에서 동시에 불러도 되며, 동시에 몇 개까지 추론할지는 num_workers로 정한다.
+    발화 구간은 이미 잘라서 넘기므로 Whisper의 VAD와 이전 문맥 조건은 끈다.
+    """
+
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model_size="small", language="ko", device="cpu", compute_type="int8", cpu_threads=0,
+                 num_workers=1, beam_size=1, warmup=True):
+        if WhisperModel is None:
+            raise RuntimeError("whisper 엔진을 쓰려면 faster-whisper를 설치하세요 (pip install faster-whisper)")
+        self.language = language
+        self.beam_size = beam_size
+        self._model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads,
+                                   num_workers=num_workers)
+        if warmup:
+            self._transcribe(np.zeros(self.SAMPLE_RATE, dtype=np.float32))
+
+    def _transcribe(self, samples):
+        segments, _ = self._model.transcribe(samples, language=self.language, beam_size=self.beam_size,
+                                             vad_filter=False, condition_on_previous_text=False,
+                                             without_timestamps=True)
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+    def recognize(self, audio_data):
+        """인식된 텍스트 (알아들을 수 없으면 빈 문자열)"""
+        raw = audio_data.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        if not raw:
+            return ""
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        return self._transcribe(samples)
+
+
+class StubRecognizer:
+    """테스트용 인식기: 정해진 문장을 순서대로 돌려주거나 구간 길이를 문자열로 돌려줌"""
+
+    def __init__(self, transcripts=None, delay=0.0):
+        self.transcripts = list(transcripts or [])
+        self.delay = delay
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def recognize(self, audio_data):
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            if self._index < len(self.transcripts):
+                text = self.transcripts[self._index]
+                self._index += 1
+                return text
+        seconds = len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width)
+        return f"[{seconds:.1f}초 구간]"
+
+
+# 이름 -> 인식기 생성 함수
+RECOGNIZER_BACKENDS = {
+    "google": GoogleRecognizer,
+    "whisper": WhisperRecognizer,
+    "stub": StubRecognizer,
+}
+
+
+def recognizer_available(name):
+    """이 환경에서 쓸 수 있는 엔진인지 (선택 의존성이 없는 엔진은 False)"""
+    if name == "whisper":
+        return WhisperModel is not None
+    return name in RECOGNIZER_BACKENDS
+
+
+def create_recognizer(name, **kwargs):
+    """등록된 이름으로 인식기 생성"""
+    try:
+        factory = RECOGNIZER_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"알 수 없는 음성 인식 엔진: {name} (사용 가능: {', '.join(RECOGNIZER_BACKENDS)})")
+    return factory(**kwargs)
+
+
+class SpeechSegmenter:
+    """에너지 기반 음성 활동 감지로 오디오 스트림을 발화 구간(AudioData)으로 자름
+
+    split_pause초 이상 조용하면 구간을 끊고, 말한 뒤 end_pause초 이상 조용하면 녹음을 끝낸다.
+    """
+
+    def __init__(self, energy_threshold=300, split_pause=0.5, end_pause=1.5, max_segment_seconds=15.0,
+                 min_speech_seconds=0.2, pre_roll_seconds=0.3, speech_timeout=30.0, max_total_seconds=60.0):
+        self.energy_threshold = energy_threshold
+        self.split_pause = split_pause
+        self.end_pause = end_pause
+        self.max_segment_seconds = max_segment_seconds
+        self.min_speech_seconds = min_speech_seconds
+        self.pre_roll_seconds = pre_roll_seconds
+        self.speech_timeout = speech_timeout
+        self.max_total_seconds = max_total_seconds
+
+    def segments(self, source, should_stop=None):
+        """source(sr.Microphone/sr.AudioFile 등 열린 소스)에서 발화 구간을 순서대로 생성"""
+        sample_rate = source.SAMPLE_RATE
+        sample_width = source.SAMPLE_WIDTH
+        chunk_frames = source.CHUNK
+        chunk_seconds = chunk_frames / sample_rate
+        pre_roll = collections.deque(maxlen=max(1, int(self.pre_roll_seconds / chunk_seconds)))
+
+        frames = []
+        in_speech = False
+        heard_speech = False
+        speech_seconds = 0.0
+        segment_seconds = 0.0
+        silence_seconds = 0.0
+        elapsed = 0.0
+
+        def flush():
+            data = b"".join(frames)
+            frames.clear()
+            return sr.AudioData(data, sample_rate, sample_width)
+
+        while True:
+            if should_stop is not None and should_stop():
+                break
+            buffer = source.stream.read(chunk_frames)
+            if not buffer:
+                break
+            elapsed += chunk_seconds
+            is_loud = audioop.rms(buffer, sample_width) > self.energy_threshold
+
+            if not in_speech:
+                pre_roll.append(buffer)
+                if is_loud:
+                    in_speech = heard_speech = True
+                    frames.extend(pre_roll)
+                    pre_roll.clear()
+                    speech_seconds = chunk_seconds
+                    segment_seconds = len(frames) * chunk_seconds
+                    silence_seconds = 0.0
+                else:
+                    silence_seconds += chunk_seconds
+                    if heard_speech and silence_seconds >= self.end_pause:
+                        break
+                    if not heard_speech and elapsed >= self.speech_timeout:
+                        break
+            else:
+                frames.append(buffer)
+                segment_seconds += chunk_seconds
+                if is_loud:
+                    speech_seconds += chunk_seconds
+                    silence_seconds = 0.0
+                else:
+                    silence_seconds += chunk_seconds
+
+                # 잠깐 멈췄거나 구간이 너무 길어지면 끊어서 인식으로 넘김
+                if silence_seconds >= self.split_pause or segment_seconds >= self.max_segment_seconds:
+                    if speech_seconds >= self.min_speech_seconds:
+                        yield flush()
+                    else:
+                        frames.clear()
+                    in_speech = False
+                    speech_seconds = segment_seconds = 0.0
+                    if silence_seconds >= self.end_pause:
+                        break
+
+            if elapsed >= self.max_total_seconds:
+                break
+
+        if in_speech and speech_seconds >= self.min_speech_seconds:
+            yield flush()
+
+
+class StreamingTranscriber:
+    """구간을 만드는 쪽(녹음)과 인식하는 쪽을 분리해 동시에 진행"""
+
+    _DONE = object()
+
+    def __init__(self, recognizer, max_workers=4):
+        self.recognizer = recognizer
+        self.max_workers = max_workers
+
+    def transcribe(self, segment_source):
+        """segment_source(): 발화 구간을 생성하는 제너레이터 함수. 녹음 스레드에서 실행된다.
+
+        인식된 텍스트를 발화 순서대로 내놓는 제너레이터를 반환한다 (빈 결과는 건너뜀).
+        """
+        pending = queue.Queue()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        def capture():
+            try:
+                for audio_data in segment_source():
+                    pending.put(executor.submit(self.recognizer.recognize, audio_data))
+            except Exception as e:
+                pending.put(e)
+            finally:
+                pending.put(self._DONE)
+
+        capture_thread = threading.Thread(target=capture, daemon=True)
+        capture_thread.start()
+
+        try:
+            while True:
+                item = pending.get()
+                if item is self._DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                text = item.result()
+                if text:
+                    yield text
+        finally:
+            executor.shutdown(wait=False)
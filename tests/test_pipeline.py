@@ -0,0 +1,28 @@
+"""문장 분리와 구간 결과 이어 붙이기"""
+from pipeline import chunk_sentences, join_segments, split_sentences
+
+
+def test_decimal_point_does_not_end_sentence():
+    assert split_sentences("예산은 3.5조원입니다. 다음 안건") == ["예산은 3.5조원입니다.", "다음 안건"]
+
+
+def test_punctuation_only_input_is_kept():
+    assert split_sentences("...") == ["..."]
+    assert split_sentences("?! 안녕") == ["?!", "안녕"]
+
+
+def test_original_separators_are_restored():
+    text = "첫 문장입니다.  둘째 줄\n셋째 문장!"
+    segments, separators = split_sentences(text, with_separators=True)
+    assert join_segments(segments, separators) == text
+
+
+def test_failed_segment_is_skipped():
+    assert join_segments(["가.", None, "다."], [" ", "\n", ""]) == "가. 다."
+    assert join_segments(["가.", None, "다."]) == "가. 다."
+
+
+def test_chunks_keep_separators():
+    chunks, separators = chunk_sentences("가나. 다라.\n마바. 사아.", 8, with_separators=True)
+    assert chunks == ["가나. 다라.", "마바. 사아."]
+    assert join_segments(chunks, separators) == "가나. 다라.\n마바. 사아."
@@ -0,0 +1,29 @@
+"""TM 정확 일치 + 근사 일치 교정이 한 번만 치환하는지"""
+from fuzzy_matcher import FuzzyTMMatcher
+from tm_matcher import TMMatcher, correct_with_tm
+
+
+def correct(pairs, text, fuzzy_distance=1):
+    return correct_with_tm(text, TMMatcher(pairs), FuzzyTMMatcher(pairs), fuzzy_distance)[0]
+
+
+def test_target_containing_source_is_replaced_once():
+    assert correct([("한국은행", "한국은행(BOK)")], "한국은행이") == "한국은행(BOK)이"
+
+
+def test_target_with_space_is_replaced_once():
+    assert correct([("이순신", "이순신 장군")], "이순신이") == "이순신 장군이"
+
+
+def test_fuzzy_leaves_longer_target_alone():
+    fuzzy_matcher = FuzzyTMMatcher([("한국은행", "한국은행(BOK)"), ("이순신", "이순신 장군")])
+    assert fuzzy_matcher.find_matches("한국은행(BOK)이", 1) == []
+    assert fuzzy_matcher.find_matches("이순신 장군이", 1) == []
+
+
+def test_exact_and_fuzzy_matches_are_merged():
+    pairs = [("이순신", "이순신 장군"), ("한산도", "한산도")]
+    corrected, matches, fuzzy_matches = correct_with_tm("이순신이 한산노에서", TMMatcher(pairs), FuzzyTMMatcher(pairs), 1)
+    assert corrected == "이순신 장군이 한산도에서"
+    assert len(matches) == 1
+    assert [source for _, _, source, _, _ in fuzzy_matches] == ["한산노"]
@@ -0,0 +1,173 @@
+"""TM 용어 일괄 치환 엔진
+
+TM을 한 번 색인해 두고, 텍스트를 한 번만 훑으면서 모든 용어를 치환한다.
+같은 위치에서 여러 용어가 겹치면 가장 왼쪽에서 시작하는 가장 긴 용어가 이긴다
+(leftmost-longest). 치환된 결과는 다시 검사하지 않으므로 TM 행 순서와 무관하다.
+"""
+
+
+def _is_valid_cell(value):
+    """비어 있거나 NaN인 셀 제외"""
+    if value is None:
+        return False
+    value = str(value).strip()
+    return bool(value) and value != 'nan'
+
+
+def tm_pairs(tm_df):
+    """TM DataFrame의 첫 번째 컬럼(원본)과 두 번째 컬럼(교정)을 (원본, 교정) 목록으로"""
+    if tm_df is None or tm_df.empty or len(tm_df.columns) < 2:
+        return []
+    sources = tm_df.iloc[:, 0].tolist()
+    targets = tm_df.iloc[:, 1].tolist()
+    return [
+        (str(source).strip(), str(target).strip())
+        for source, target in zip(sources, targets)
+        if _is_valid_cell(source) and _is_valid_cell(target)
+    ]
+
+
+class TMMatcher:
+    """leftmost-longest 다중 패턴 치환기
+
+    용어를 첫 글자별로 묶고, 각 묶음에 존재하는 용어 길이만 기억해 둔다.
+    텍스트의 각 위치에서는 그 글자로 시작하는 길이 후보만 긴 것부터 해시 조회하므로,
+    한 위치의 비용은 TM 크기가 아니라 서로 다른 용어 길이 수에만 비례한다.
+    """
+
+    def __init__(self, pairs=()):
+        self._replacements = {}
+        # 첫 글자 -> {용어 길이: 해당 길이의 용어 수}
+        self._length_counts = {}
+        # 첫 글자 -> 내림차순 길이 목록 (조회용 캐시)
+        self._lengths = {}
+        for source_text, target_text in pairs:
+            self.add(source_text, target_text)
+
+    @classmethod
+    def from_dataframe(cls, tm_df):
+        """첫 번째 컬럼(원본)과 두 번째 컬럼(교정)으로 매처 생성"""
+        return cls(tm_pairs(tm_df))
+
+    def __len__(self):
+        return len(self._replacements)
+
+    def __contains__(self, source_text):
+        return source_text in self._replacements
+
+    def add(self, source_text, target_text):
+        """용어 추가 (같은 원본이 이미 있으면 교정값만 갱신)"""
+        if not source_text:
+            return
+        if source_text not in self._replacements:
+            first_char = source_text[0]
+            counts = self._length_counts.setdefault(first_char, {})
+            counts[len(source_text)] = counts.get(len(source_text), 0) + 1
+            self._lengths[first_char] = sorted(counts, reverse=True)
+        self._replacements[source_text] = target_text
+
+    def remove(self, source_text):
+        """용어 삭제 (없으면 무시)"""
+        if source_text not in self._replacements:
+            return
+        del self._replacements[source_text]
+        first_char = source_text[0]
+        counts = self._length_counts[first_char]
+        counts[len(source_text)] -= 1
+        if counts[len(source_text)] == 0:
+            del counts[len(source_text)]
+        if counts:
+            self._lengths[first_char] = sorted(counts, reverse=True)
+        else:
+            del self._length_counts[first_char]
+            del self._lengths[first_char]
+
+    def find_matches(self, text):
+        """(시작, 끝, 원본, 교정) 목록을 겹치지 않게 왼쪽부터 반환"""
+        matches = []
+        if not text or not self._replacements:
+            return matches
+
+        replacements = self._replacements
+        lengths = self._lengths
+        text_length = len(text)
+        position = 0
+        while position < text_length:
+            candidate_lengths = lengths.get(text[position])
+            if candidate_lengths:
+                remaining = text_length - position
+                for length in candidate_lengths:
+                    if length > remaining:
+                        continue
+                    source_text = text[position:position + length]
+                    target_text = replacements.get(source_text)
+                    if target_text is not None:
+                        matches.append((position, position + length, source_text, target_text))
+                        position += length
+                        break
+                else:
+                    position += 1
+            else:
+                position += 1
+        return matches
+
+    def replace(self, text, matches=None):
+        """텍스트를 한 번 훑어 모든 용어 치환 (이미 구한 find_matches 결과를 넘기면 재사용)"""
+        if matches is None:
+            matches = self.find_matches(text)
+        if not matches:
+            return text
+
+        parts = []
+        last_end = 0
+        for start, end, _, target_text in matches:
+            parts.append(text[last_end:start])
+            parts.append(target_text)
+            last_end = end
+        parts.append(text[last_end:])
+        return "".join(parts)
+
+
+def correct_with_tm(text, tm_matcher, fuzzy_matcher=None, fuzzy_distance=None):
+    """정확 일치와 근사 일치를 모두 원문에서 찾아 한 번에 치환. (교정한 텍스트, 정확 일치 목록, 근사 일치 목록)
+
+    근사 일치는 정확 일치가 덮은 구간을 빼고 찾는다. 정확 일치로 치환한 결과에서 다시 찾으면 교정 표기가
+    원본을 포함하는 항목(한국은행 → 한국은행(BOK))이 거리 0으로 한 번 더 치환된다.
+    """
+    if not text:
+        return text, [], []
+    matches = tm_matcher.find_matches(text) if tm_matcher is not None else []
+    fuzzy_matches = []
+    if fuzzy_matcher is not None and fuzzy_distance is not None:
+        fuzzy_matches = fuzzy_matcher.find_matches(text, fuzzy_distance,
+                                                   exclude=[(start, end) for start, end, _, _ in matches])
+    spans = sorted([(start, end, target_text) for start, end, _, target_text in matches] +
+                   [(start, end, target_text) for start, end, _, target_text, _ in fuzzy_matches])
+    if not spans:
+        return text, matches, fuzzy_matches
+
+    parts = []
+    last_end = 0
+    for start, end, target_text in spans:
+        parts.append(text[last_end:start])
+        parts.append(target_text)
+        last_end = end
+    parts.append(text[last_end:])
+    return "".join(parts), matches, fuzzy_matches
+
+
+def term_constraints(text, tm_matcher, fuzzy_matcher=None, fuzzy_distance=None):
+    """입력에 나온 TM 용어의 (입력 표기, 교정 표기) 목록 (중복 제거, 나온 순서)
+
+    통합 모드에서 LLM에 "이 표기는 반드시 이렇게 쓸 것"이라는 제약으로 넘긴다.
+    """
+    if not text or tm_matcher is None:
+        return []
+    constraints = {}
+    _, matches, fuzzy_matches = correct_with_tm(text, tm_matcher, fuzzy_matcher, fuzzy_distance)
+    for _, _, source_text, target_text in matches:
+        constraints.setdefault(source_text, target_text)
+    for _, _, source_text, target_text, _ in fuzzy_matches:
+        constraints.setdefault(source_text, target_text)
+    return [(source_text, target_text) for source_text, target_text in constraints.items()
+            if source_text != target_text]
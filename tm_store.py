@@ -0,0 +1,267 @@
+"""SQLite에 보관하는 TM 모음 저장소
+
+TM은 이름 붙은 모음(collection) 단위로 나뉜다. 세션은 고른 모음의 이름만 들고 있고, 파일 가져오기·항목 편집·
+삭제는 그 모음에만 적용되므로 한 사용자의 작업이 다른 모음을 쓰는 세션에 영향을 주지 않는다.
+
+모음마다 (원본, 교정) 행을 SQLite 파일에 두고, 프로세스에서 처음 쓸 때 한 번만 읽어 치환 색인·근사 일치 색인·
+고유명사 검색 색인을 만든다. 이후 파일 가져오기나 항목 추가/수정/삭제는 바뀐 행만 DB와 그 모음의 색인에 반영하므로,
+용어 하나를 고치려고 TM 파일 전체를 다시 올리거나 색인을 다시 만들 필요가 없다.
+통계는 바뀔 때마다 갱신하는 카운터에서 바로 꺼낸다.
+
+색인은 모든 세션이 같이 읽는다. 쓰기는 잠금으로 한 번에 하나씩만 하고, 읽는 쪽은 잠금 없이
+색인을 보므로 색인 자료구조는 읽는 도중에 바뀌어도 예외가 나지 않게 고친다 (matcher 쪽 주석 참고).
+"""
+import io
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from fuzzy_matcher import FuzzyTMMatcher
+from glossary import GlossaryIndex
+from tm_matcher import TMMatcher, tm_pairs
+
+
+# 모음 구분 없이 쓰던 저장소의 행을 옮길 모음
+DEFAULT_COLLECTION = "기본"
+
+
+def parse_tm_file(data, filename):
+    """xlsx/csv 바이트를 문자열 DataFrame으로 파싱"""
+    if filename.endswith('.xlsx'):
+        return pd.read_excel(io.BytesIO(data), dtype=str)
+    return pd.read_csv(io.BytesIO(data), dtype=str)
+
+
+class TMLibrary:
+    """SQLite 파일 하나에 든 TM 모음들 (스레드 안전, 프로세스 공용)
+
+    path가 없으면 메모리 DB를 쓴다 (벤치마크·일회성 실행용).
+    모음의 색인은 get()으로 처음 꺼낼 때 만들고 이후에는 같은 TMStore를 돌려준다.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db_lock = threading.Lock()  # 연결 하나를 모든 모음이 같이 씀
+        self._lock = threading.Lock()
+        self._stores = {}  # 모음 이름 -> 색인을 만든 TMStore
+        # 같은 모음을 여러 세션이 동시에 처음 열어도 색인은 한 번만 만들도록 이름별 잠금
+        self._loading_locks = {}
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tm_collections (name TEXT PRIMARY KEY, created_at REAL NOT NULL)"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(tm_entries)")]
+            # 모음 구분이 없던 저장소는 기본 모음 하나로 옮김
+            migrate = bool(columns) and "collection" not in columns
+            if migrate:
+                self._db.execute("ALTER TABLE tm_entries RENAME TO tm_entries_single")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tm_entries ("
+                "collection TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (collection, source))"
+            )
+            if migrate:
+                self._db.execute("INSERT INTO tm_collections (name, created_at) VALUES (?, ?)",
+                                 (DEFAULT_COLLECTION, time.time()))
+                self._db.execute("INSERT INTO tm_entries (collection, source, target, updated_at) "
+                                 "SELECT ?, source, target, updated_at FROM tm_entries_single ORDER BY rowid",
+                                 (DEFAULT_COLLECTION,))
+                self._db.execute("DROP TABLE tm_entries_single")
+
+    def names(self):
+        """모음 이름 목록 (만든 순서)"""
+        with self._db_lock:
+            return [name for name, in self._db.execute("SELECT name FROM tm_collections ORDER BY created_at, name")]
+
+    def create(self, name):
+        """모음을 만들고 (이미 있으면 그대로) 그 TMStore를 반환"""
+        name = (name or "").strip()
+        if not name:
+            raise ValueError("TM 모음 이름을 입력하세요")
+        with self._db_lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO tm_collections (name, created_at) VALUES (?, ?)",
+                             (name, time.time()))
+        return self.get(name)
+
+    def get(self, name):
+        """모음의 TMStore (없는 모음이면 None). 처음 꺼낼 때 그 모음의 행만 읽어 색인을 만든다"""
+        with self._lock:
+            store = self._stores.get(name)
+            if store is not None:
+                return store
+            loading_lock = self._loading_locks.setdefault(name, threading.Lock())
+        # 색인을 만드는 동안 다른 모음은 그대로 꺼낼 수 있음
+        with loading_lock:
+            with self._lock:
+                store = self._stores.get(name)
+            if store is not None:
+                return store
+            with self._db_lock:
+                exists = self._db.execute("SELECT 1 FROM tm_collections WHERE name = ?", (name,)).fetchone()
+            if not exists:
+                return None
+            store = TMStore(self, name)
+            with self._lock:
+                self._stores[name] = store
+                self._loading_locks.pop(name, None)
+            return store
+
+    def file_bytes(self):
+        return os.path.getsize(self.path) if self.path and os.path.exists(self.path) else None
+
+
+class TMStore:
+    """TM 모음 하나와 그 색인 (스레드 안전, TMLibrary.get()/create()로 얻음)
+
+    tm_matcher / fuzzy_matcher / glossary는 이 모음에 지금 저장된 항목 그대로의 색인이다.
+    """
+
+    def __init__(self, library, name):
+        self.library = library
+        self.name = name
+        self._db = library._db
+        self._db_lock = library._db_lock
+        self._lock = threading.Lock()
+        self._entries = {}  # 원본 -> 교정 (DB와 같은 내용)
+        self.tm_matcher = TMMatcher()
+        self.fuzzy_matcher = FuzzyTMMatcher()
+        self.glossary = GlossaryIndex()
+        self.counters = {"added": 0, "updated": 0, "deleted": 0, "imports": 0}
+        self.last_import = None  # {"filename", "rows", "added", "updated", "deleted", "seconds", "at"}
+
+        started = time.perf_counter()
+        with self._db_lock:
+            rows = self._db.execute("SELECT source, target FROM tm_entries WHERE collection = ? ORDER BY rowid",
+                                    (name,)).fetchall()
+        for source_text, target_text in rows:
+            self._index_add(source_text, target_text)
+        self.load_seconds = time.perf_counter() - started
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, source_text):
+        """원본 표기의 교정 표기 (없으면 None)"""
+        return self._entries.get(source_text)
+
+    def _index_add(self, source_text, target_text):
+        self._entries[source_text] = target_text
+        self.tm_matcher.add(source_text, target_text)
+        self.fuzzy_matcher.add(source_text, target_text)
+        self.glossary.add(source_text, target_text)
+
+    def _index_remove(self, source_text):
+        target_text = self._entries.pop(source_text)
+        self.tm_matcher.remove(source_text)
+        self.fuzzy_matcher.remove(source_text)
+        self.glossary.remove(source_text, target_text)
+
+    def _apply_locked(self, upserts, deletes):
+        """바뀐 행만 DB(한 트랜잭션)와 색인에 반영. upserts는 (원본, 교정), deletes는 원본 목록"""
+        now = time.time()
+        with self._db_lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO tm_entries (collection, source, target, updated_at) VALUES (?, ?, ?, ?)",
+                [(self.name, source_text, target_text, now) for source_text, target_text in upserts])
+            self._db.executemany("DELETE FROM tm_entries WHERE collection = ? AND source = ?",
+                                 [(self.name, source_text) for source_text in deletes])
+        for source_text in deletes:
+            self._index_remove(source_text)
+        for source_text, target_text in upserts:
+            if source_text in self._entries:
+                self._index_remove(source_text)
+                self.counters["updated"] += 1
+            else:
+                self.counters["added"] += 1
+            self._index_add(source_text, target_text)
+        self.counters["deleted"] += len(deletes)
+
+    def upsert(self, source_text, target_text):
+        """항목 하나 추가 또는 수정. "added" / "updated" / "unchanged" 반환"""
+        source_text = (source_text or "").strip()
+        target_text = (target_text or "").strip()
+        if not source_text or not target_text:
+            raise ValueError("원본과 교정 표기를 모두 입력하세요")
+        with self._lock:
+            previous = self._entries.get(source_text)
+            if previous == target_text:
+                return "unchanged"
+            self._apply_locked([(source_text, target_text)], [])
+            return "added" if previous is None else "updated"
+
+    def delete(self, source_text):
+        """항목 하나 삭제. 있었으면 True"""
+        source_text = (source_text or "").strip()
+        with self._lock:
+            if source_text not in self._entries:
+                return False
+            self._apply_locked([], [source_text])
+            return True
+
+    def import_pairs(self, pairs, replace=False, filename=None):
+        """(원본, 교정) 목록 가져오기. replace=True면 목록에 없는 기존 항목은 지운다
+
+        같은 원본이 여러 번 나오면 마지막 행을 쓴다.
+        행 수 {"rows", "added", "updated", "deleted", "unchanged"}를 반환한다.
+        """
+        started = time.perf_counter()
+        latest = dict(pairs)
+        with self._lock:
+            upserts = [(source_text, target_text) for source_text, target_text in latest.items()
+                       if self._entries.get(source_text) != target_text]
+            deletes = [source_text for source_text in self._entries if source_text not in latest] if replace else []
+            added = sum(1 for source_text, _ in upserts if source_text not in self._entries)
+            self._apply_locked(upserts, deletes)
+            self.counters["imports"] += 1
+            result = {"rows": len(latest), "added": added, "updated": len(upserts) - added, "deleted": len(deletes),
+                      "unchanged": len(latest) - len(upserts)}
+            self.last_import = dict(result, filename=filename, seconds=time.perf_counter() - started, at=time.time())
+            return result
+
+    def import_file(self, data, filename, replace=False):
+        """xlsx/csv 파일(첫 번째 컬럼 원본, 두 번째 컬럼 교정) 가져오기"""
+        return self.import_pairs(tm_pairs(parse_tm_file(data, filename)), replace=replace, filename=filename)
+
+    def clear(self):
+        """이 모음의 모든 항목 삭제 (다른 모음은 그대로)"""
+        with self._lock:
+            self._apply_locked([], list(self._entries))
+
+    def search(self, query, limit=20):
+        """원본이나 교정 표기에 query가 들어 있는 항목 DataFrame (원본, 교정; 최근 수정 순)"""
+        pattern = f"%{query.strip()}%"
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT source, target FROM tm_entries WHERE collection = ? AND (source LIKE ? OR target LIKE ?) "
+                "ORDER BY updated_at DESC LIMIT ?", (self.name, pattern, pattern, limit)
+            ).fetchall()
+        return pd.DataFrame(rows, columns=["원본", "교정"])
+
+    def preview(self, limit=10):
+        """최근 수정한 항목 DataFrame (원본, 교정)"""
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT source, target FROM tm_entries WHERE collection = ? ORDER BY updated_at DESC LIMIT ?",
+                (self.name, limit)
+            ).fetchall()
+        return pd.DataFrame(rows, columns=["원본", "교정"])
+
+    def stats(self):
+        """카운터로 유지하는 통계 (전체 행을 다시 세지 않음)"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+            stats["terms"] = len(self.glossary)
+            stats["fuzzy_forms"] = len(self.fuzzy_matcher)
+            stats["load_seconds"] = self.load_seconds
+            stats["last_import"] = self.last_import
+            stats["file_bytes"] = self.library.file_bytes()
+            return stats